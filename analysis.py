@@ -0,0 +1,486 @@
+"""Analyses en flux des enregistrements de Symphony.
+
+Les analyses traitent l'audio bloc par bloc pour ne jamais charger une
+prise entière en mémoire.
+"""
+
+import io
+from collections import deque
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from scipy import signal
+
+
+try:
+    import soundfile as sf
+except (ImportError, OSError):
+    sf = None
+
+
+class PeakPyramid:
+    """Pyramide min/max/RMS multi-résolution d'une forme d'onde.
+
+    Le niveau 0 résume des paquets de `base_block` frames ; chaque niveau
+    suivant regroupe `factor` paquets du précédent.
+    """
+
+    # Paquets minimum par colonne de pixels (précision des bords de colonne)
+    MIN_BUCKETS_PER_COLUMN = 8
+
+    def __init__(self, base_block: int = 256, factor: int = 4, sample_rate: int = 44100):
+        self.base_block = base_block
+        self.factor = factor
+        self.sample_rate = sample_rate
+        self.frames = 0
+        self.levels: List[np.ndarray] = []
+        self._chunks: List[np.ndarray] = []
+        self._carry = np.zeros(0, dtype=np.float32)
+
+    # ------------------------------------------------------------------
+    # Construction en flux
+    # ------------------------------------------------------------------
+
+    def add_block(self, block: np.ndarray):
+        """Ajoute un bloc d'audio (mono ou multicanal, mixé en mono)."""
+        block = np.asarray(block, dtype=np.float32)
+        if block.ndim > 1:
+            block = block.mean(axis=1)
+        self.frames += len(block)
+        data = np.concatenate([self._carry, block]) if len(self._carry) else block
+        whole = len(data) // self.base_block * self.base_block
+        if whole:
+            self._chunks.append(self._summarize(data[:whole].reshape(-1, self.base_block)))
+        self._carry = data[whole:].copy()
+
+    @staticmethod
+    def _summarize(buckets: np.ndarray) -> np.ndarray:
+        return np.stack([
+            buckets.min(axis=1),
+            buckets.max(axis=1),
+            np.sqrt(np.mean(np.square(buckets), axis=1)),
+        ], axis=1).astype(np.float32)
+
+    def finish(self) -> "PeakPyramid":
+        """Termine la construction et calcule les niveaux grossiers."""
+        if len(self._carry):
+            self._chunks.append(self._summarize(self._carry[np.newaxis, :]))
+            self._carry = np.zeros(0, dtype=np.float32)
+        level = np.concatenate(self._chunks) if self._chunks else np.zeros((0, 3), dtype=np.float32)
+        self._chunks = []
+        self.levels = [level]
+        while len(level) > 1:
+            level = self._reduce(level, self.factor)
+            self.levels.append(level)
+        return self
+
+    @staticmethod
+    def _reduce(level: np.ndarray, factor: int) -> np.ndarray:
+        """Regroupe `factor` paquets consécutifs (le dernier peut être partiel)."""
+        n = len(level)
+        starts = np.arange(0, n, factor)
+        counts = np.minimum(factor, n - starts)
+        return np.stack([
+            np.minimum.reduceat(level[:, 0], starts),
+            np.maximum.reduceat(level[:, 1], starts),
+            np.sqrt(np.add.reduceat(np.square(level[:, 2]), starts) / counts),
+        ], axis=1).astype(np.float32)
+
+    @classmethod
+    def from_blocks(cls, blocks: Iterable[np.ndarray], sample_rate: int = 44100, **kwargs) -> "PeakPyramid":
+        """Construit la pyramide en une seule passe sur une suite de blocs."""
+        pyramid = cls(sample_rate=sample_rate, **kwargs)
+        for block in blocks:
+            pyramid.add_block(block)
+        return pyramid.finish()
+
+    @classmethod
+    def from_file(cls, path: str, block_frames: int = 65536, **kwargs) -> Optional["PeakPyramid"]:
+        """Construit la pyramide d'un fichier sans le charger entièrement."""
+        if sf is None:
+            return None
+        try:
+            with sf.SoundFile(path) as f:
+                return cls.from_blocks(f.blocks(block_frames, dtype="float32"), f.samplerate, **kwargs)
+        except Exception as e:
+            print(f"Erreur pyramide {path}: {e}")
+            return None
+
+    # ------------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------------
+
+    def block_size(self, level: int) -> int:
+        """Nombre de frames résumées par un paquet du niveau donné."""
+        return self.base_block * self.factor ** level
+
+    def query(self, start: int, end: int, columns: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Min/max/RMS de [start, end) sur `columns` colonnes de pixels.
+
+        Choisit le niveau le plus grossier qui garde au moins
+        `MIN_BUCKETS_PER_COLUMN` paquets par colonne : le coût ne dépend que
+        de la largeur affichée, pas de la durée de la prise.
+        """
+        empty = np.zeros(columns, dtype=np.float32)
+        if not self.levels or end <= start or columns <= 0 or len(self.levels[0]) == 0:
+            return empty, empty.copy(), empty.copy()
+
+        frames_per_column = (end - start) / columns
+        level = 0
+        while (level + 1 < len(self.levels)
+               and self.block_size(level + 1) * self.MIN_BUCKETS_PER_COLUMN <= frames_per_column):
+            level += 1
+        data = self.levels[level]
+        size = self.block_size(level)
+
+        edges = np.linspace(start, end, columns + 1) / size
+        lo = np.clip(np.floor(edges[:-1]).astype(np.int64), 0, len(data) - 1)
+        hi = np.clip(np.ceil(edges[1:]).astype(np.int64), lo + 1, len(data))
+        # Indices entrelacés [lo0, hi0, lo1, hi1...] : les positions paires
+        # de reduceat donnent exactement la réduction de [lo, hi)
+        padded = np.vstack([data, data[-1:]])
+        indices = np.empty(2 * columns, dtype=np.int64)
+        indices[0::2] = lo
+        indices[1::2] = hi
+        mins = np.minimum.reduceat(padded[:, 0], indices)[0::2]
+        maxs = np.maximum.reduceat(padded[:, 1], indices)[0::2]
+        power = np.add.reduceat(np.square(padded[:, 2]), indices)[0::2]
+        rms = np.sqrt(power / (hi - lo)).astype(np.float32)
+        return mins, maxs, rms
+
+    # ------------------------------------------------------------------
+    # Sérialisation (BLOB en base)
+    # ------------------------------------------------------------------
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        header = np.array([self.base_block, self.factor, self.sample_rate, self.frames], dtype=np.int64)
+        np.savez(buffer, header=header, **{f"level{i}": lvl for i, lvl in enumerate(self.levels)})
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> "PeakPyramid":
+        with np.load(io.BytesIO(blob)) as archive:
+            base_block, factor, sample_rate, frames = (int(v) for v in archive["header"])
+            pyramid = cls(base_block, factor, sample_rate)
+            pyramid.frames = frames
+            count = len([k for k in archive.files if k.startswith("level")])
+            pyramid.levels = [archive[f"level{i}"] for i in range(count)]
+        return pyramid
+
+
+class LogSpectrumMapper:
+    """Projection précalculée d'un spectre FFT sur des colonnes log-fréquence.
+
+    Pour une taille de FFT, une fréquence d'échantillonnage et un nombre de
+    colonnes donnés, les plages de bins de chaque colonne sont calculées une
+    fois ; la projection d'un spectre n'est ensuite qu'un `reduceat`.
+    Une colonne plus étroite qu'un bin reprend le bin le plus proche.
+    """
+
+    def __init__(self, n_fft: int, sample_rate: int, f_min: float, f_max: float,
+                 columns: int, db_floor: float = -60.0):
+        self.columns = columns
+        self.db_floor = db_floor
+        freqs = np.fft.rfftfreq(n_fft, 1 / sample_rate)
+        self.edges = np.geomspace(f_min, f_max, columns + 1)
+        lo = np.clip(np.searchsorted(freqs, self.edges[:-1]), 0, len(freqs) - 1)
+        hi = np.clip(np.searchsorted(freqs, self.edges[1:]), lo + 1, len(freqs))
+        self._count = len(freqs)
+        # Indices entrelacés [lo0, hi0, lo1, hi1...] (cf. PeakPyramid.query)
+        self._indices = np.empty(2 * columns, dtype=np.int64)
+        self._indices[0::2] = lo
+        self._indices[1::2] = hi
+
+    def __call__(self, magnitudes: np.ndarray, reference: Optional[float] = None) -> np.ndarray:
+        """Niveaux par colonne en dB, bornés à `db_floor`.
+
+        `magnitudes` est un spectre ou une pile de spectres (dernier axe =
+        bins). Sans `reference`, les niveaux sont relatifs au maximum de
+        chaque spectre ; sinon à cette magnitude (pleine échelle).
+        """
+        pad = np.zeros(magnitudes.shape[:-1] + (1,), dtype=magnitudes.dtype)
+        padded = np.concatenate([magnitudes, pad], axis=-1)
+        peaks = np.maximum.reduceat(padded, self._indices, axis=-1)[..., 0::2]
+        if reference is None:
+            reference = magnitudes.max(axis=-1, keepdims=True) if magnitudes.shape[-1] else 0.0
+        reference = np.maximum(reference, 1e-12)
+        levels = 20 * np.log10(np.maximum(peaks, 1e-12) / reference)
+        return np.maximum(levels, self.db_floor)
+
+
+def quantize_db(levels: np.ndarray, db_floor: float) -> np.ndarray:
+    """Niveaux dB [db_floor, 0] -> indices de palette uint8 [0, 255]."""
+    return np.clip((levels - db_floor) * (255.0 / -db_floor), 0, 255).astype(np.uint8)
+
+
+class StreamingSTFT:
+    """Transformée de Fourier à court terme en flux (fenêtre de Hann).
+
+    Les blocs peuvent avoir n'importe quelle taille ; le pas (`hop`) peut
+    dépasser la taille de FFT pour une vue d'ensemble d'une longue prise.
+    """
+
+    def __init__(self, n_fft: int = 1024, hop: int = 256):
+        self.n_fft = n_fft
+        self.hop = hop
+        self.window = np.hanning(n_fft).astype(np.float32)
+        # Magnitude d'une sinusoïde pleine échelle
+        self.full_scale = float(self.window.sum() / 2)
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._skip = 0  # Échantillons à ignorer avant la prochaine trame
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """Ajoute un bloc ; retourne les magnitudes des trames complètes (k, bins)."""
+        block = np.asarray(block, dtype=np.float32)
+        if block.ndim > 1:
+            block = block.mean(axis=1)
+        if self._skip:
+            dropped = min(self._skip, len(block))
+            block = block[dropped:]
+            self._skip -= dropped
+        data = np.concatenate([self._buffer, block]) if len(self._buffer) else block
+        if len(data) < self.n_fft:
+            self._buffer = data.copy()
+            return np.zeros((0, self.n_fft // 2 + 1), dtype=np.float32)
+
+        count = (len(data) - self.n_fft) // self.hop + 1
+        frames = np.lib.stride_tricks.sliding_window_view(data, self.n_fft)[::self.hop][:count]
+        magnitudes = np.abs(np.fft.rfft(frames * self.window, axis=1)).astype(np.float32)
+        consumed = count * self.hop
+        self._buffer = data[consumed:].copy()
+        self._skip = max(0, consumed - len(data))
+        return magnitudes
+
+
+class SpectrogramRing:
+    """Image de spectrogramme (uint8) en tampon circulaire de colonnes.
+
+    Une colonne par trame STFT ; la ligne 0 correspond aux aigus (haut de
+    l'image). Le tableau est préalloué et peut être enveloppé sans copie
+    par une image indexée 8 bits.
+    """
+
+    def __init__(self, rows: int, columns: int):
+        self.image = np.zeros((rows, columns), dtype=np.uint8)
+        self.position = 0  # Prochaine colonne écrite
+        self.total = 0     # Colonnes écrites depuis le début
+
+    @property
+    def rows(self) -> int:
+        return self.image.shape[0]
+
+    @property
+    def columns(self) -> int:
+        return self.image.shape[1]
+
+    def clear(self):
+        self.image[:] = 0
+        self.position = 0
+        self.total = 0
+
+    def push(self, columns: np.ndarray):
+        """Ajoute des colonnes (k, rows) d'indices de palette, graves en premier."""
+        columns = columns[-self.columns:]
+        count = len(columns)
+        if count == 0:
+            return
+        targets = (self.position + np.arange(count)) % self.columns
+        self.image[:, targets] = columns[:, ::-1].T
+        self.position = (self.position + count) % self.columns
+        self.total += count
+
+
+def spectrogram_columns(
+    path: str,
+    rows: int,
+    columns: int,
+    n_fft: int = 1024,
+    f_min: float = 50.0,
+    db_floor: float = -90.0,
+    block_frames: int = 65536
+) -> Iterator[np.ndarray]:
+    """Spectrogramme d'un fichier en flux, par paquets de colonnes uint8.
+
+    Le pas est choisi pour que toute la prise tienne dans `columns`
+    colonnes ; le fichier est lu bloc par bloc, jamais entièrement.
+    """
+    if sf is None:
+        return
+    with sf.SoundFile(path) as f:
+        hop = max(n_fft // 4, -(-f.frames // columns))
+        stft = StreamingSTFT(n_fft, hop)
+        mapper = LogSpectrumMapper(n_fft, f.samplerate, f_min, f.samplerate / 2, rows, db_floor)
+        for block in f.blocks(block_frames, dtype="float32"):
+            magnitudes = stft.process(block)
+            if len(magnitudes):
+                yield quantize_db(mapper(magnitudes, stft.full_scale), db_floor)
+
+
+# Sonie enregistrée pour une prise mesurée mais sans bloc au-dessus du seuil
+# absolu (silence, prise trop courte) : lue à gain unité
+SILENT_LOUDNESS = -100.0
+
+
+def k_weighting_sos(sample_rate: int) -> np.ndarray:
+    """Pondération K de l'ITU-R BS.1770 en sections biquadratiques.
+
+    Plateau aigu (+4 dB, effet de la tête) puis passe-haut (RLB). Les
+    coefficients publiés valent pour 48 kHz ; ils sont recalculés ici par
+    transformation bilinéaire pour toute fréquence d'échantillonnage.
+    """
+    # Plateau aigu : fréquence, gain (dB), facteur de qualité
+    k = np.tan(np.pi * 1681.974450955533 / sample_rate)
+    q = 0.7071752369554196
+    vh = 10 ** (3.999843853973347 / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf = [(vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0,
+             1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+    # Passe-haut du second ordre
+    k = np.tan(np.pi * 38.13547087602444 / sample_rate)
+    q = 0.5003270373238773
+    a0 = 1 + k / q + k * k
+    highpass = [1.0, -2.0, 1.0, 1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+    return np.array([shelf, highpass])
+
+
+def true_peak_phases(oversampling: int = 4, taps_per_phase: int = 12) -> np.ndarray:
+    """Filtre d'interpolation polyphase (taps x phases) pour la crête vraie."""
+    taps = signal.firwin(oversampling * taps_per_phase, 1.0 / oversampling) * oversampling
+    # Coefficients inversés : une fenêtre glissante fois la matrice donne les phases
+    return taps.reshape(taps_per_phase, oversampling)[::-1].astype(np.float32)
+
+
+class LoudnessMeter:
+    """Sonie intégrée (EBU R128 / ITU-R BS.1770) et crête vraie, en flux.
+
+    Le filtre de pondération garde son état d'un bloc à l'autre : le
+    résultat ne dépend pas du découpage. Seule l'énergie de chaque bloc
+    de mesure de 400 ms est conservée (10 valeurs par seconde).
+    """
+
+    ABSOLUTE_GATE = -70.0  # LUFS
+    RELATIVE_GATE = -10.0  # LU sous la sonie des blocs retenus
+    STEP_TIME = 0.1        # Blocs de 400 ms recouverts à 75 %
+    STEPS_PER_BLOCK = 4
+    OVERSAMPLING = 4       # Suréchantillonnage de la crête vraie
+
+    def __init__(self, sample_rate: int = 44100, channels: int = 1):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frames = 0
+        self.sos = k_weighting_sos(sample_rate)
+        self._zi = np.zeros((len(self.sos), 2, channels))
+        self._step = int(round(self.STEP_TIME * sample_rate))
+        self._steps = deque(maxlen=self.STEPS_PER_BLOCK)
+        self._energy = 0.0  # Énergie du pas en cours
+        self._count = 0     # Frames du pas en cours
+        self._blocks: List[float] = []  # Carré moyen de chaque bloc de 400 ms
+        self._phases = true_peak_phases(self.OVERSAMPLING)
+        self._history = np.zeros((len(self._phases) - 1, channels), dtype=np.float32)
+        self._peak = 0.0
+
+    def add_block(self, block: np.ndarray):
+        """Ajoute un bloc d'audio (frames, ou frames x canaux)."""
+        block = np.asarray(block, dtype=np.float32)
+        if block.ndim == 1:
+            block = block[:, None]
+        if not len(block):
+            return
+        self.frames += len(block)
+        self._add_true_peak(block)
+
+        weighted, self._zi = signal.sosfilt(self.sos, block, axis=0, zi=self._zi)
+        # Canaux avant (mono, stéréo) : poids 1
+        power = np.square(weighted).sum(axis=1)
+
+        if self._count:
+            n = min(self._step - self._count, len(power))
+            self._energy += float(power[:n].sum())
+            self._count += n
+            power = power[n:]
+            if self._count < self._step:
+                return
+            self._push_step(self._energy)
+        whole = len(power) // self._step * self._step
+        for energy in power[:whole].reshape(-1, self._step).sum(axis=1):
+            self._push_step(float(energy))
+        self._energy = float(power[whole:].sum())
+        self._count = len(power) - whole
+
+    def _push_step(self, energy: float):
+        self._steps.append(energy)
+        if len(self._steps) == self.STEPS_PER_BLOCK:
+            self._blocks.append(sum(self._steps) / (self.STEPS_PER_BLOCK * self._step))
+
+    def _add_true_peak(self, block: np.ndarray):
+        """Crête de l'audio suréchantillonné (échantillons interpolés compris)."""
+        data = np.concatenate([self._history, block])
+        self._history = data[len(data) - len(self._history):]
+        self._peak = max(self._peak, float(np.max(np.abs(block))))
+        for channel in range(data.shape[1]):
+            windows = np.lib.stride_tricks.sliding_window_view(data[:, channel], len(self._phases))
+            self._peak = max(self._peak, float(np.max(np.abs(windows @ self._phases))))
+
+    def finish(self) -> dict:
+        """Termine la mesure : sonie intégrée (LUFS) et crête vraie (dBTP).
+
+        Une prise silencieuse ou trop courte (aucun bloc de 400 ms au-dessus
+        du seuil absolu) reçoit la sonie SILENT_LOUDNESS : elle est marquée
+        comme mesurée et ne sera pas remesurée. La crête vraie d'une prise
+        entièrement nulle est None.
+        """
+        # Fin du signal : les dernières interpolations voient du silence
+        self._add_true_peak(np.zeros_like(self._history))
+        loudness = self.integrated_loudness()
+        return {
+            "loudness": SILENT_LOUDNESS if loudness is None else loudness,
+            "true_peak": float(20 * np.log10(self._peak)) if self._peak > 0 else None,
+        }
+
+    def integrated_loudness(self) -> Optional[float]:
+        """Sonie intégrée avec les seuils absolu et relatif de la norme."""
+        blocks = np.asarray(self._blocks)
+        if not len(blocks):
+            return None
+        with np.errstate(divide="ignore"):
+            loudness = -0.691 + 10 * np.log10(blocks)
+        gated = blocks[loudness > self.ABSOLUTE_GATE]
+        if not len(gated):
+            return None
+        relative = -0.691 + 10 * np.log10(gated.mean()) + self.RELATIVE_GATE
+        gated = blocks[loudness > max(relative, self.ABSOLUTE_GATE)]
+        return float(-0.691 + 10 * np.log10(gated.mean()))
+
+    @classmethod
+    def measure(cls, blocks: Iterable[np.ndarray], sample_rate: int = 44100, channels: int = 1) -> dict:
+        """Mesure en une seule passe sur une suite de blocs."""
+        meter = cls(sample_rate, channels)
+        for block in blocks:
+            meter.add_block(block)
+        return meter.finish()
+
+    @classmethod
+    def measure_file(cls, path: str, block_frames: int = 65536) -> Optional[dict]:
+        """Mesure un fichier sans le charger entièrement."""
+        if sf is None:
+            return None
+        try:
+            with sf.SoundFile(path) as f:
+                return cls.measure(f.blocks(block_frames, dtype="float32", always_2d=True),
+                                   f.samplerate, f.channels)
+        except Exception as e:
+            print(f"Erreur sonie {path}: {e}")
+            return None
+
+
+def normalization_gain(loudness: Optional[float], true_peak: Optional[float],
+                       target: float = -16.0, ceiling: float = -1.0) -> float:
+    """Gain linéaire amenant une prise à `target` LUFS sans dépasser `ceiling` dBTP."""
+    if loudness is None or loudness <= SILENT_LOUDNESS:
+        return 1.0
+    gain_db = target - loudness
+    if true_peak is not None:
+        gain_db = min(gain_db, ceiling - true_peak)
+    return float(10 ** (gain_db / 20))
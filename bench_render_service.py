@@ -0,0 +1,100 @@
+"""Test de charge local du service de rendu.
+
+Démarre le service dans le processus (base temporaire, utilisateur de
+test), puis des clients HTTP concurrents envoient de courtes partitions
+aléatoires sur des connexions keep-alive. Une fraction des partitions est
+répétée pour exercer le cache.
+
+    python bench_render_service.py --clients 32 --requests 20 --workers 4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from database import Database
+from render_service import RenderService, basic_auth, http_request
+
+
+def random_score(rng: np.random.Generator, notes: int) -> dict:
+    onsets = np.sort(rng.integers(0, 2000, notes))
+    return {
+        "scale": "pentatonic",
+        "format": "wav",
+        "notes": [
+            {"t": int(t), "key": int(rng.integers(22)), "velocity": int(rng.integers(40, 128))}
+            for t in onsets
+        ],
+    }
+
+
+async def run(clients: int, requests: int, workers: Optional[int], notes: int, repeat: float) -> dict:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = Database(os.path.join(tmpdir, "bench.db"))
+        db.create_user("bench", "bench")
+        service = RenderService(db, workers, prewarm_scales=("pentatonic",))
+        port = await service.start("127.0.0.1", 0)
+        auth = {"Authorization": basic_auth("bench", "bench"), "Content-Type": "application/json"}
+
+        rng = np.random.default_rng(0)
+        # Partitions répétées (même contenu -> même empreinte -> cache)
+        shared = [json.dumps(random_score(rng, notes)).encode() for _ in range(8)]
+        latencies: List[float] = []
+        statuses = []
+
+        async def client(seed: int):
+            local = np.random.default_rng(seed)
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            for _ in range(requests):
+                if local.random() < repeat:
+                    body = shared[int(local.integers(len(shared)))]
+                else:
+                    body = json.dumps(random_score(local, notes)).encode()
+                start = time.perf_counter()
+                status, _, _ = await http_request(reader, writer, "POST", "/render", body, auth)
+                latencies.append(time.perf_counter() - start)
+                statuses.append(status)
+            writer.close()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client(i + 1) for i in range(clients)))
+        elapsed = time.perf_counter() - start
+        stats = service.stats()
+        await service.close()
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "ok": statuses.count(200),
+        "requests_per_s": len(latencies) / elapsed,
+        "latency_p50_ms": float(np.percentile(latencies_ms, 50)),
+        "latency_p99_ms": float(np.percentile(latencies_ms, 99)),
+        "service": stats,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Test de charge local du service de rendu.")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=20, help="Requêtes par client")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--notes", type=int, default=8, help="Notes par partition")
+    parser.add_argument("--repeat", type=float, default=0.3, help="Part des partitions répétées")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args.clients, args.requests, args.workers, args.notes, args.repeat))
+    service = report["service"]
+    print(f"{report['ok']}/{report['requests']} requêtes OK, {report['requests_per_s']:.0f} requêtes/s")
+    print(f"latence p50 {report['latency_p50_ms']:.1f} ms, p99 {report['latency_p99_ms']:.1f} ms")
+    print(f"{service['renders']} rendus en {service['batches']} lots "
+          f"(moyenne {service['mean_batch']:.1f}), {service['cache_hits']} réponses du cache")
+
+
+if __name__ == "__main__":
+    main()
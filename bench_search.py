@@ -0,0 +1,68 @@
+"""Chronométrage local de la recherche paginée dans la bibliothèque.
+
+Remplit une base temporaire d'enregistrements factices (une prise sur dix
+étiquetée « gamme »), puis mesure la latence de recherches plein texte et
+par étiquette, sur la première page et plus loin dans les résultats.
+
+    python bench_search.py --recordings 50000 --queries 200
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from database import Database
+
+
+QUERIES = ["prise 42", "tag:gamme", "prise", ""]
+
+
+def run(recordings: int, queries: int, limit: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = Database(os.path.join(tmpdir, "bench.db"))
+        db.create_user("bench", "bench")
+        conn = db.get_connection()
+        with conn:
+            conn.executemany(
+                "INSERT INTO recordings (user_id, filename, duration, name, tags) VALUES (1, ?, 1.0, ?, ?)",
+                [(f"rec{i}.flac", f"Prise {i}", "gamme" if i % 10 == 0 else "")
+                 for i in range(recordings)]
+            )
+        conn.close()
+
+        report = {"fts": db.fts, "queries": {}}
+        for query in QUERIES:
+            for offset in (0, limit * 10):
+                latencies = []
+                for _ in range(queries):
+                    start = time.perf_counter()
+                    db.search_recordings(1, query, limit=limit, offset=offset)
+                    latencies.append(time.perf_counter() - start)
+                latencies_ms = np.array(latencies) * 1000
+                report["queries"][(query, offset)] = {
+                    "p50_ms": float(np.percentile(latencies_ms, 50)),
+                    "p99_ms": float(np.percentile(latencies_ms, 99)),
+                }
+    return report
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Chronométrage de la recherche paginée.")
+    parser.add_argument("--recordings", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=50, help="Répétitions par requête")
+    parser.add_argument("--limit", type=int, default=50, help="Taille d'une page")
+    args = parser.parse_args(argv)
+
+    report = run(args.recordings, args.queries, args.limit)
+    print(f"{args.recordings} enregistrements, FTS5 {'actif' if report['fts'] else 'indisponible'}")
+    for (query, offset), stats in report["queries"].items():
+        print(f"{query or '(vide)':>12} offset {offset:>5} : "
+              f"p50 {stats['p50_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
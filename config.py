@@ -7,9 +7,61 @@ Fichier unique regroupant tous les paramétrages.
 # AUDIO CONFIGURATION
 # ============================================================================
 
-SAMPLE_RATE = 44100
+SAMPLE_RATE = 44100  # Repli si la fréquence native du périphérique est inconnue
 VOLUME = 0.7
 DURATION_DEFAULT = 0.45
+DURATION_DEBOUNCE_MS = 300  # Préchargement de la banque une fois la saisie terminée
+
+# Flux de sortie : taille de bloc (0 = choisie par le pilote) et latence
+# ("low", "high" ou une valeur en secondes). Réduire sur interface pro.
+AUDIO_BLOCK_SIZE = 256
+AUDIO_LATENCY = "low"
+AUDIO_DEVICE = None  # None = périphérique par défaut
+
+# Limiteur de crête du bus maître (évite la saturation des accords)
+LIMITER_ENABLED = True
+LIMITER_THRESHOLD_DB = -1.0
+
+# Réverbération à convolution du bus maître (0 = désactivée)
+REVERB_WET = 0.0
+REVERB_IR = None  # Chemin d'une réponse impulsionnelle ; None = salle synthétique
+IMPULSE_RESPONSES_DIR = "data/ir"
+
+# Métronome et séquenceur : les événements sont transmis au mixeur avec
+# une anticipation, puis placés à la frame exacte dans le bloc audio
+METRONOME_BPM = 100
+METRONOME_BEATS_PER_BAR = 4
+METRONOME_GAIN = 0.5
+SEQUENCER_LOOKAHEAD = 0.1  # s
+SEQUENCER_INTERVAL = 0.025  # s, période de réveil du planificateur
+
+# Looper : couches préallouées (mémoire = couches x durée de boucle x 4 octets)
+LOOPER_MAX_LAYERS = 16
+LOOPER_BARS = 2
+LOOPER_MIXDOWN_CYCLES = 2  # Tours de boucle écrits lors du mixage
+
+# Sessions à plusieurs (jam) : port du serveur et tampon de gigue
+JAM_PORT = 7870
+JAM_MIN_DELAY_MS = 20
+JAM_MAX_DELAY_MS = 150
+
+# Service HTTP de rendu (render_service.py) : limites par requête
+RENDER_PORT = 8080
+RENDER_MAX_BODY = 1 << 20  # octets
+RENDER_MAX_EVENTS = 20000
+RENDER_MAX_SECONDS = 600
+
+# Recherche dans les enregistrements : délai de frappe et taille de page
+SEARCH_DEBOUNCE_MS = 250
+SEARCH_PAGE_SIZE = 50
+
+# Normalisation de la lecture (EBU R128) : sonie visée et plafond de crête vraie
+PLAYBACK_NORMALIZE = True
+LOUDNESS_TARGET = -16.0  # LUFS
+TRUE_PEAK_CEILING = -1.0  # dBTP
+
+# Contrôleurs MIDI (python-rtmidi) : tous les ports d'entrée sont ouverts
+MIDI_INPUT_ENABLED = True
 
 # Harmoniques pour la synthèse
 HARMONICS = {
@@ -103,8 +155,19 @@ KEYBOARD_MAP = {
 # ============================================================================
 
 SPECTRUM_RANGE = 2000  # Hz
+SPECTRUM_MIN_FREQ = 50  # Hz (axe logarithmique)
+SPECTRUM_DB_FLOOR = -60.0
+# "native" (QPainter) ou "matplotlib" (plus lent, import coûteux)
+SPECTRUM_BACKEND = "native"
+
+# Spectrogramme (cascade) : lignes (bandes log), colonnes (multiple de 4)
+SPECTROGRAM_ROWS = 128
+SPECTROGRAM_COLUMNS = 512
+SPECTROGRAM_FFT = 1024
+SPECTROGRAM_DB_FLOOR = -90.0
 OSCILLOSCOPE_SAMPLES = 1000
 GRID_ALPHA = 0.3
+FRAME_INTERVAL_MS = 16  # Regroupement des mises à jour visuelles (~60 images/s)
 
 # ============================================================================
 # FILE PATHS
@@ -113,6 +176,10 @@ GRID_ALPHA = 0.3
 RECORDINGS_DIR = "recordings"
 DATA_DIR = "data"
 
+# Format de stockage des prises (FLAC : sans perte, ~50% plus léger que WAV)
+RECORDING_FORMAT = "flac"
+EXPORT_WORKERS = 4  # Threads de transcodage pour l'export
+
 # ============================================================================
 # SECURITY
 # ============================================================================
@@ -125,5 +192,7 @@ PASSWORD_HASH_ALGORITHM = 'sha256'
 # ============================================================================
 
 CACHE_SIZE = 22  # Nombre max de samples en cache
+COMPACT_SAMPLES = False  # Stockage int16 + facteur d'échelle (moitié de mémoire)
+TRIM_SILENCE = False  # Ne garder que la partie audible (> -90 dB) des samples
 THREAD_DAEMON = True
 ANIMATION_DURATION = 150  # ms
@@ -3,19 +3,32 @@
 Architecture optimisée et modulaire pour l'application de balafon.
 """
 
+import hashlib
+import json
+import os
+import sys
 import numpy as np
 import threading
-from typing import Dict, Optional, Tuple
+import time
+import multiprocessing
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 
 try:
     import sounddevice as sd
-    import soundfile as sf
-except ImportError:
+except (ImportError, OSError):
     sd = None
+
+try:
+    import soundfile as sf
+except (ImportError, OSError):
     sf = None
 
-from scipy import signal
+
+import config
+from dsp import ConvolutionReverb, LookaheadLimiter, StreamingResampler, load_impulse_response, synthetic_ir
+from mixer import Mixer
 
 
 @dataclass
@@ -26,6 +39,84 @@ class Note:
     octave: int
 
 
+@dataclass
+class CompactSample:
+    """Sample stocké en int16 avec un facteur d'échelle propre."""
+    data: np.ndarray
+    scale: float
+
+    @classmethod
+    def from_float(cls, sample: np.ndarray) -> "CompactSample":
+        """Quantifie un sample float32 en int16 sur toute la dynamique."""
+        peak = float(np.max(np.abs(sample))) if len(sample) else 0.0
+        scale = peak / 32767.0 if peak > 0 else 1.0
+        data = np.round(sample / scale).astype(np.int16)
+        return cls(data, scale)
+
+    def to_float(self) -> np.ndarray:
+        """Reconvertit en float32."""
+        return self.data.astype(np.float32) * np.float32(self.scale)
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+@dataclass(frozen=True)
+class BankDescriptor:
+    """Banque publiée en mémoire partagée : de quoi s'y attacher sans copie.
+
+    Quelques centaines d'octets (picklable) : nom du segment, format des
+    données et index des notes ; les samples restent dans le segment.
+    """
+    name: str
+    key: str
+    dtype: str
+    frames: int
+    sample_rate: int
+    duration: float
+    frequencies: Tuple[float, ...]
+    offsets: Tuple[int, ...]
+    scales: Tuple[float, ...]
+
+
+# En-tête du segment partagé : nombre de frames, écrit une fois les données
+# copiées (un processus qui s'attache pendant la publication le détecte)
+SHARED_BANK_HEADER = 64
+
+
+# Segments créés par ce processus (inscrits auprès de son resource tracker)
+_created_segments = set()
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """Ouvre un segment existant sans le confier au resource tracker.
+
+    Avant Python 3.13, la simple ouverture inscrit le segment : la fin d'un
+    processus qui ne fait que lire le supprimerait pour tous les autres.
+    Les processus d'un pool partagent le tracker de leur parent et le
+    segment y est déjà inscrit : rien à retirer dans ce cas.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    segment = shared_memory.SharedMemory(name=name)
+    if name not in _created_segments and multiprocessing.parent_process() is None:
+        resource_tracker.unregister(segment._name, "shared_memory")
+    return segment
+
+
+def trim_silence(sample: np.ndarray, threshold_db: float = -90.0) -> np.ndarray:
+    """Supprime la queue du sample sous le seuil (en dBFS)."""
+    threshold = 10 ** (threshold_db / 20)
+    audible = np.flatnonzero(np.abs(sample) >= threshold)
+    if len(audible) == 0:
+        return sample[:0]
+    return sample[:audible[-1] + 1]
+
+
 class AudioCore:
     """Moteur audio centralisé pour la synthèse et l'analyse."""
 
@@ -35,12 +126,97 @@ class AudioCore:
     SEMITONE_RATIO = 2 ** (1 / 12)
     CHROMATIC_NOTES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
 
-    def __init__(self, sample_rate: int = 44100, volume: float = 0.7):
+    # Version du moteur de synthèse : à incrémenter dès que le rendu change
+    # pour invalider les banques persistées sur disque.
+    ENGINE_VERSION = 3
+
+    # Couches de vélocité : (vélocité max de la couche, brillance des
+    # harmoniques). Une frappe douce sonne plus sourde qu'une frappe forte ;
+    # la couche haute correspond au timbre historique du moteur.
+    VELOCITY_LAYERS = ((48, 0.4), (96, 0.7), (127, 1.0))
+    MAX_VELOCITY = 127
+
+    # Seuil de rognage du silence final en mode compact
+    TRIM_THRESHOLD_DB = -90.0
+
+    def __init__(
+        self,
+        sample_rate: int = 44100,
+        volume: float = 0.7,
+        bank_dir: Optional[str] = "data/banks",
+        compact: bool = False,
+        trim_silence: bool = False,
+        duration: float = 0.45,
+        block_size: int = 256,
+        latency="low",
+        device=None,
+        limiter: bool = False,
+        limiter_threshold_db: float = -1.0,
+        max_durations: int = 3
+    ):
         self.sample_rate = sample_rate
         self.volume = volume
-        self.sample_cache: Dict[float, np.ndarray] = {}
+        self.duration = duration
+        self.bank_dir = bank_dir
+        self.compact = compact
+        self.trim_silence = trim_silence
+        self.sample_cache: Dict[float, object] = {}
+        self.device = device
+        self.mixer = Mixer(sample_rate, block_size, gain=volume, latency=latency, device=device)
         self._lock = threading.Lock()
-        self._is_playing = False
+        self._banks: Dict[str, int] = {}
+        # Durées des banques en cache, de la plus ancienne à la plus récente :
+        # au-delà de `max_durations`, les samples de la plus ancienne sont oubliés
+        self.max_durations = max_durations
+        self._durations: List[float] = []
+        self._bank_durations: Dict[str, float] = {}
+        self._prewarm_pending: Optional[List[float]] = None
+        self._prewarm_thread: Optional[threading.Thread] = None
+        # Notes jouées absentes du cache : rendues par un thread, pas par l'appelant
+        # (verrou propre, jamais tenu pendant un rendu)
+        self._synth_lock = threading.Lock()
+        self._synth_pending: Dict[tuple, tuple] = {}
+        self._synth_thread: Optional[threading.Thread] = None
+        # Segments de mémoire partagée : publiés (à supprimer) ou attachés
+        self._published: Dict[str, shared_memory.SharedMemory] = {}
+        self._attached: Dict[str, shared_memory.SharedMemory] = {}
+        self._stats = {"hits": 0, "misses": 0, "bank_loads": 0, "bank_renders": 0, "bank_attaches": 0,
+                       "skipped_notes": 0}
+        self.reverb: Optional[ConvolutionReverb] = None
+        self.reverb_ir: Optional[str] = None
+        self.set_limiter(limiter, limiter_threshold_db)
+
+    def negotiate_device(self) -> int:
+        """Adopte la fréquence native du périphérique de sortie.
+
+        Les banques sont alors rendues directement à cette fréquence et le
+        flux s'ouvre sans rééchantillonnage par le mixeur du système.
+        """
+        if sd is None:
+            return self.sample_rate
+        try:
+            info = sd.query_devices(self.device, kind='output')
+            rate = int(info['default_samplerate'])
+        except Exception as e:
+            print(f"Erreur interrogation périphérique: {e}")
+            return self.sample_rate
+        self.set_sample_rate(rate)
+        return rate
+
+    def set_sample_rate(self, sample_rate: int):
+        """Change la fréquence d'échantillonnage du moteur (vide le cache)."""
+        if sample_rate == self.sample_rate:
+            return
+        self.mixer.stop()
+        self.sample_rate = sample_rate
+        self.mixer.sample_rate = sample_rate
+        self.clear_cache()
+        if self.mixer.limiter is not None:
+            self.set_limiter(True, self.mixer.limiter.threshold_db)
+        if self.reverb is not None:
+            # La réponse impulsionnelle est rechargée à la nouvelle fréquence
+            wet, self.reverb = self.reverb.wet, None
+            self.set_reverb(wet, self.reverb_ir)
 
     def get_frequency(self, note: str, octave: int = 4) -> float:
         """Calcule la fréquence d'une note."""
@@ -82,9 +258,18 @@ class AudioCore:
         self,
         frequency: float,
         duration: float = 0.45,
-        add_harmonics: bool = True
+        add_harmonics: bool = True,
+        gain: Optional[float] = None,
+        brightness: float = 1.0
     ) -> np.ndarray:
-        """Génère un sample de note avec harmoniques et enveloppe."""
+        """Génère un sample de note avec harmoniques et enveloppe.
+
+        `gain` vaut par défaut le volume courant ; le cache rend à gain unitaire
+        et le volume est appliqué en temps réel par le mixeur. `brightness`
+        pondère les harmoniques (couches de vélocité).
+        """
+        if gain is None:
+            gain = self.volume
         n_samples = int(self.sample_rate * duration)
         t = np.linspace(0, duration, n_samples, endpoint=False)
 
@@ -93,8 +278,8 @@ class AudioCore:
 
         # Harmoniques (résonance du bois)
         if add_harmonics:
-            wave += 0.3 * np.sin(2 * np.pi * frequency * 2 * t)  # Harmonique 2
-            wave += 0.15 * np.sin(2 * np.pi * frequency * 3 * t)  # Harmonique 3
+            wave += 0.3 * brightness * np.sin(2 * np.pi * frequency * 2 * t)  # Harmonique 2
+            wave += 0.15 * brightness * np.sin(2 * np.pi * frequency * 3 * t)  # Harmonique 3
 
         # Enveloppe ADSR percussive
         attack_time = 0.005
@@ -106,41 +291,468 @@ class AudioCore:
         decay_rate = -3 * np.log(0.01) / duration
         envelope[attack_samples:] = np.exp(-decay_rate * t[attack_samples:])
 
-        sample = (wave * envelope * self.volume).astype(np.float32)
+        sample = (wave * envelope * gain).astype(np.float32)
         return sample
 
-    def get_cached_sample(self, frequency: float) -> np.ndarray:
-        """Récupère ou génère un sample du cache."""
-        cache_key = round(frequency, 2)
+    def velocity_layer(self, velocity: int) -> int:
+        """Indice de la couche de vélocité (0 = la plus douce)."""
+        for layer, (max_velocity, _) in enumerate(self.VELOCITY_LAYERS):
+            if velocity <= max_velocity:
+                return layer
+        return len(self.VELOCITY_LAYERS) - 1
+
+    def get_cached_sample(
+        self,
+        frequency: float,
+        duration: Optional[float] = None,
+        layer: Optional[int] = None
+    ) -> np.ndarray:
+        """Récupère ou génère un sample du cache (float32, gain unitaire)."""
+        entry = self.get_voice(frequency, duration, layer)
+        if isinstance(entry, CompactSample):
+            return entry.to_float()
+        return entry
+
+    def get_voice(self, frequency: float, duration: Optional[float] = None, layer: Optional[int] = None):
+        """Récupère l'entrée brute du cache (float32 ou CompactSample) pour le mixeur.
+
+        Le cache est indexé par fréquence, durée et couche de vélocité (la
+        plus forte par défaut) : changer la durée ne l'invalide pas, revenir
+        à une durée déjà rendue est gratuit.
+        """
+        if duration is None:
+            duration = self.duration
+        if layer is None:
+            layer = len(self.VELOCITY_LAYERS) - 1
+        cache_key = self._voice_key(frequency, duration, layer)
         
         with self._lock:
             if cache_key not in self.sample_cache:
-                self.sample_cache[cache_key] = self.generate_sample(frequency)
+                self._stats["misses"] += 1
+                brightness = self.VELOCITY_LAYERS[layer][1]
+                sample = self.generate_sample(frequency, duration, gain=1.0, brightness=brightness)
+                self.sample_cache[cache_key] = self._encode(sample)
+                # Toute durée rendue compte dans la limite, pas seulement celles des banques
+                self._touch_duration(cache_key[1])
+            else:
+                self._stats["hits"] += 1
             return self.sample_cache[cache_key]
 
+    def _voice_key(self, frequency: float, duration: Optional[float] = None,
+                   layer: Optional[int] = None) -> tuple:
+        """Clé du cache : fréquence, durée (courante par défaut), couche (la plus forte par défaut)."""
+        if duration is None:
+            duration = self.duration
+        if layer is None:
+            layer = len(self.VELOCITY_LAYERS) - 1
+        return (round(frequency, 2), round(duration, 3), layer)
+
+    def _synthesize_later(self, cache_key: tuple, frequency: float):
+        """Rend en arrière-plan une voix manquante (demandes regroupées, un seul thread)."""
+        with self._synth_lock:
+            self._stats["skipped_notes"] += 1
+            self._synth_pending[cache_key] = (frequency, cache_key[1], cache_key[2])
+            if self._synth_thread is not None:
+                return
+            self._synth_thread = threading.Thread(target=self._run_synthesis, daemon=True)
+            self._synth_thread.start()
+
+    def _run_synthesis(self):
+        while True:
+            with self._synth_lock:
+                if not self._synth_pending:
+                    self._synth_thread = None
+                    return
+                _, (frequency, duration, layer) = self._synth_pending.popitem()
+            try:
+                self.get_voice(frequency, duration, layer)
+            except Exception as e:
+                print(f"Erreur rendu de voix: {e}")
+
+    def _encode(self, sample: np.ndarray):
+        """Applique le mode de stockage du cache (rognage, int16)."""
+        if self.trim_silence:
+            sample = trim_silence(sample, self.TRIM_THRESHOLD_DB)
+        if self.compact:
+            return CompactSample.from_float(sample)
+        return sample
+
     def clear_cache(self):
         """Vide le cache."""
         with self._lock:
             self.sample_cache.clear()
+            self._banks.clear()
+            self._durations.clear()
+            self._bank_durations.clear()
 
-    def play_async(self, frequency: float):
-        """Joue une note de manière asynchrone."""
-        if sd is None:
-            return
+    def cache_stats(self) -> dict:
+        """Statistiques du cache de samples (mémoire totale et par banque)."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self.sample_cache)
+            stats["bytes"] = sum(s.nbytes for s in self.sample_cache.values())
+            stats["banks"] = dict(self._banks)
+            stats["storage"] = "int16" if self.compact else "float32"
+        return stats
 
-        sample = self.get_cached_sample(frequency)
+    # ------------------------------------------------------------------
+    # Banques de samples persistées
+    # ------------------------------------------------------------------
 
-        def _play():
+    def bank_hash(self, frequencies: List[float], duration: Optional[float] = None) -> str:
+        """Empreinte de tous les paramètres de synthèse d'une banque."""
+        if duration is None:
+            duration = self.duration
+        params = {
+            "engine": self.ENGINE_VERSION,
+            "sample_rate": self.sample_rate,
+            "duration": round(duration, 3),
+            "frequencies": [round(f, 6) for f in frequencies],
+            "layers": [brightness for _, brightness in self.VELOCITY_LAYERS],
+            "compact": self.compact,
+            "trim_silence": self.trim_silence,
+        }
+        payload = json.dumps(params, sort_keys=True).encode()
+        return hashlib.sha256(payload).hexdigest()[:16]
+
+    def render_bank(
+        self,
+        frequencies: List[float],
+        duration: Optional[float] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Synthétise une banque : samples concaténés, offsets et échelles par note.
+
+        Les entrées sont rangées couche par couche : l'entrée
+        `layer * len(frequencies) + i` est la note `i` de la couche `layer`.
+        """
+        if duration is None:
+            duration = self.duration
+        entries = [
+            self._encode(self.generate_sample(f, duration, gain=1.0, brightness=brightness))
+            for _, brightness in self.VELOCITY_LAYERS
+            for f in frequencies
+        ]
+        offsets = np.zeros(len(entries) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(e) for e in entries])
+        if self.compact:
+            scales = np.array([e.scale for e in entries], dtype=np.float32)
+            chunks = [e.data for e in entries]
+            dtype = np.int16
+        else:
+            scales = np.ones(len(entries), dtype=np.float32)
+            chunks = entries
+            dtype = np.float32
+        data = np.concatenate(chunks) if chunks else np.zeros(0, dtype=dtype)
+        return data.astype(dtype, copy=False), offsets, scales
+
+    def _bank_path(self, bank_key: str) -> str:
+        return os.path.join(self.bank_dir, f"bank_{bank_key}")
+
+    def _read_bank(self, base: str, n_notes: int) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Ouvre une banque persistée en mmap (lecture seule, sans copie)."""
+        try:
+            with np.load(base + ".idx.npz") as index:
+                offsets = index["offsets"]
+                scales = index["scales"]
+            data = np.load(base + ".npy", mmap_mode='r')
+        except (OSError, ValueError, KeyError):
+            return None
+        if len(offsets) != n_notes + 1 or offsets[-1] != len(data):
+            return None
+        return data, offsets, scales
+
+    def _write_bank(self, base: str, data: np.ndarray, offsets: np.ndarray, scales: np.ndarray):
+        """Écrit une banque de manière atomique (fichier temporaire + rename)."""
+        try:
+            os.makedirs(self.bank_dir, exist_ok=True)
+            tmp_index = f"{base}.idx.npz.{os.getpid()}.tmp"
+            with open(tmp_index, "wb") as f:
+                np.savez(f, offsets=offsets, scales=scales)
+            os.replace(tmp_index, base + ".idx.npz")
+
+            tmp_data = f"{base}.npy.{os.getpid()}.tmp"
+            with open(tmp_data, "wb") as f:
+                np.save(f, data)
+            os.replace(tmp_data, base + ".npy")
+        except OSError as e:
+            print(f"Erreur écriture banque: {e}")
+
+    def load_bank(self, frequencies: List[float]) -> bool:
+        """Charge la banque depuis le disque ou la rend puis la persiste.
+
+        Les samples placés dans le cache sont des vues sur le fichier mappé.
+        Retourne True si la banque provenait du disque.
+        """
+        frequencies = [float(f) for f in frequencies]
+        duration = self.duration
+        bank_key = self.bank_hash(frequencies, duration)
+        bank = None
+        base = None
+        if self.bank_dir:
+            base = self._bank_path(bank_key)
+            bank = self._read_bank(base, len(frequencies) * len(self.VELOCITY_LAYERS))
+
+        from_disk = bank is not None
+        if bank is None:
+            bank = self.render_bank(frequencies, duration)
+            if base is not None:
+                self._write_bank(base, *bank)
+
+        self._install_bank(bank_key, frequencies, duration, *bank)
+        with self._lock:
+            self._stats["bank_loads" if from_disk else "bank_renders"] += 1
+        return from_disk
+
+    def _install_bank(self, bank_key: str, frequencies: List[float], duration: float,
+                      data: np.ndarray, offsets, scales):
+        """Place dans le cache des vues (sans copie) sur les samples d'une banque."""
+        with self._lock:
+            for layer in range(len(self.VELOCITY_LAYERS)):
+                for i, freq in enumerate(frequencies):
+                    entry = layer * len(frequencies) + i
+                    chunk = data[offsets[entry]:offsets[entry + 1]]
+                    if self.compact:
+                        chunk = CompactSample(chunk, float(scales[entry]))
+                    self.sample_cache[(round(freq, 2), round(duration, 3), layer)] = chunk
+            self._banks[bank_key] = int(data.nbytes)
+            self._bank_durations[bank_key] = round(duration, 3)
+            self._touch_duration(round(duration, 3))
+
+    def _touch_duration(self, duration: float):
+        """Marque une durée comme récente et évince la plus ancienne au-delà de la limite (verrou tenu).
+
+        La durée courante du clavier est épargnée, même si des rendus à
+        d'autres durées l'ont rendue la plus ancienne.
+        """
+        if duration in self._durations:
+            self._durations.remove(duration)
+        self._durations.append(duration)
+        current = round(self.duration, 3)
+        while len(self._durations) > self.max_durations:
+            # La durée jouée au clavier n'est jamais évincée
+            old = next((d for d in self._durations if d != current), None)
+            if old is None:
+                break
+            self._durations.remove(old)
+            for key in [key for key in self.sample_cache if key[1] == old]:
+                del self.sample_cache[key]
+            for bank_key in [k for k, d in self._bank_durations.items() if d == old]:
+                del self._bank_durations[bank_key]
+                self._banks.pop(bank_key, None)
+
+    # ------------------------------------------------------------------
+    # Banques en mémoire partagée (pools de processus)
+    # ------------------------------------------------------------------
+
+    def publish_bank(self, frequencies: List[float], timeout: float = 30.0) -> BankDescriptor:
+        """Publie la banque dans un segment de mémoire partagée nommé.
+
+        Le segment porte l'empreinte de la banque et contient son index :
+        si un autre processus de la machine l'a déjà publié, il est repris
+        tel quel, sans rendu ni lecture disque (en attendant au plus
+        `timeout` secondes qu'il ait fini de l'écrire). Les processus de
+        rendu s'y attachent ensuite par `attach_bank`, sans copie.
+        """
+        frequencies = [float(f) for f in frequencies]
+        duration = round(self.duration, 3)
+        bank_key = self.bank_hash(frequencies, duration)
+        name = f"symphony_{bank_key}"
+        n_entries = len(frequencies) * len(self.VELOCITY_LAYERS)
+        with self._lock:
+            segment = self._published.get(bank_key) or self._attached.get(bank_key)
+        if segment is None:
+            try:
+                segment = _attach_shared_memory(name)
+            except FileNotFoundError:
+                segment = self._create_shared_bank(name, bank_key, frequencies, n_entries)
+            with self._lock:
+                if bank_key not in self._published:
+                    # Segment d'un autre processus : fermé par release_shared_banks
+                    self._attached[bank_key] = segment
+
+        header = np.ndarray(2, dtype=np.int64, buffer=segment.buf)
+        deadline = time.monotonic() + timeout
+        # Publication en cours dans un autre processus : attendre la marque de fin
+        while header[0] < 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        frames = int(header[0])
+        if frames < 0 or header[1] != n_entries:
+            del header
+            raise ValueError(f"Banque partagée incomplète: {name}")
+        offsets = np.ndarray(n_entries + 1, dtype=np.int64, buffer=segment.buf, offset=SHARED_BANK_HEADER)
+        scales = np.ndarray(n_entries, dtype=np.float32, buffer=segment.buf,
+                            offset=SHARED_BANK_HEADER + offsets.nbytes)
+        descriptor = BankDescriptor(
+            name=name, key=bank_key, dtype=np.dtype(np.int16 if self.compact else np.float32).str,
+            frames=frames, sample_rate=self.sample_rate, duration=duration,
+            frequencies=tuple(frequencies), offsets=tuple(int(o) for o in offsets),
+            scales=tuple(float(x) for x in scales),
+        )
+        del header, offsets, scales
+        self.attach_bank(descriptor)
+        return descriptor
+
+    @staticmethod
+    def _shared_data_offset(n_entries: int) -> int:
+        """Position des samples dans le segment (après en-tête et index, alignée sur 64)."""
+        index_bytes = SHARED_BANK_HEADER + 8 * (n_entries + 1) + 4 * n_entries
+        return -(-index_bytes // 64) * 64
+
+    def _create_shared_bank(self, name: str, bank_key: str, frequencies: List[float],
+                            n_entries: int) -> shared_memory.SharedMemory:
+        """Rend (ou lit sur disque) la banque et la copie dans un nouveau segment."""
+        bank = None
+        if self.bank_dir:
+            bank = self._read_bank(self._bank_path(bank_key), n_entries)
+        if bank is None:
+            bank = self.render_bank(frequencies)
+            if self.bank_dir:
+                self._write_bank(self._bank_path(bank_key), *bank)
+        data, offsets, scales = bank
+        data_offset = self._shared_data_offset(n_entries)
+        try:
+            segment = shared_memory.SharedMemory(name=name, create=True, size=data_offset + data.nbytes)
+        except FileExistsError:
+            # Publiée entre-temps par un autre processus
+            return _attach_shared_memory(name)
+        _created_segments.add(name)
+        header = np.ndarray(2, dtype=np.int64, buffer=segment.buf)
+        header[:] = (-1, n_entries)
+        np.ndarray(n_entries + 1, dtype=np.int64, buffer=segment.buf, offset=SHARED_BANK_HEADER)[:] = offsets
+        np.ndarray(n_entries, dtype=np.float32, buffer=segment.buf,
+                   offset=SHARED_BANK_HEADER + 8 * (n_entries + 1))[:] = scales
+        np.ndarray(data.shape, dtype=data.dtype, buffer=segment.buf, offset=data_offset)[:] = data
+        # Marque de fin de publication, écrite en dernier
+        header[0] = len(data)
+        del header
+        with self._lock:
+            self._published[bank_key] = segment
+            self._stats["bank_renders"] += 1
+        return segment
+
+    def attach_bank(self, descriptor: BankDescriptor):
+        """Remplit le cache avec des vues sur une banque publiée (temps constant, sans copie)."""
+        if descriptor.sample_rate != self.sample_rate:
+            raise ValueError("Banque partagée à une autre fréquence d'échantillonnage")
+        if np.dtype(descriptor.dtype) != np.dtype(np.int16 if self.compact else np.float32):
+            raise ValueError("Banque partagée dans un autre format de stockage")
+        with self._lock:
+            segment = self._published.get(descriptor.key) or self._attached.get(descriptor.key)
+        if segment is None:
+            segment = _attach_shared_memory(descriptor.name)
+            with self._lock:
+                self._attached[descriptor.key] = segment
+        n_entries = len(descriptor.offsets) - 1
+        data = np.ndarray(descriptor.frames, dtype=descriptor.dtype, buffer=segment.buf,
+                          offset=self._shared_data_offset(n_entries))
+        data.flags.writeable = False
+        self._install_bank(descriptor.key, list(descriptor.frequencies), descriptor.duration,
+                           data, descriptor.offsets, descriptor.scales)
+        with self._lock:
+            self._stats["bank_attaches"] += 1
+
+    def release_shared_banks(self):
+        """Détache les banques partagées et supprime celles publiées par ce processus."""
+        self.clear_cache()
+        with self._lock:
+            published, self._published = self._published, {}
+            attached, self._attached = self._attached, {}
+        for segment in list(attached.values()) + list(published.values()):
+            try:
+                segment.close()
+            except BufferError:
+                pass  # Des vues existent encore ailleurs : fermé à la fin du processus
+        for segment in published.values():
+            segment.unlink()
+            _created_segments.discard(segment.name)
+
+    def prewarm_bank(self, frequencies: List[float]):
+        """Charge la banque en arrière-plan pour ne pas bloquer l'interface.
+
+        Un seul chargement à la fois : une demande faite pendant un
+        chargement remplace celle en attente et est traitée à sa suite,
+        pour la durée courante à ce moment-là.
+        """
+        with self._lock:
+            self._prewarm_pending = list(frequencies)
+            if self._prewarm_thread is not None:
+                return
+            self._prewarm_thread = threading.Thread(target=self._run_prewarm, daemon=True)
+            self._prewarm_thread.start()
+
+    def _run_prewarm(self):
+        while True:
+            with self._lock:
+                frequencies, self._prewarm_pending = self._prewarm_pending, None
+                if frequencies is None:
+                    self._prewarm_thread = None
+                    return
             try:
-                self._is_playing = True
-                sd.play(sample, self.sample_rate)
-                sd.wait()
-                self._is_playing = False
+                self.load_bank(frequencies)
             except Exception as e:
-                print(f"Erreur playback: {e}")
+                print(f"Erreur préchargement banque: {e}")
 
-        thread = threading.Thread(target=_play, daemon=True)
-        thread.start()
+    def set_volume(self, volume: float):
+        """Change le volume ; appliqué en temps réel avec une rampe anti-clic."""
+        self.volume = max(0.0, min(1.0, volume))
+        self.mixer.set_gain(self.volume)
+
+    def set_limiter(self, enabled: bool, threshold_db: float = -1.0):
+        """Active le limiteur du bus maître (temps réel et rendus hors ligne).
+
+        Les sommes polyphoniques ne saturent plus ; la réduction de gain
+        est rapportée par `mixer.stats()["limiter"]`.
+        """
+        self.mixer.limiter = LookaheadLimiter(self.sample_rate, threshold_db) if enabled else None
+
+    def set_reverb(self, wet: float, ir_path: Optional[str] = None):
+        """Règle la réverbération du bus maître (`wet` = 0 la retire).
+
+        La réponse impulsionnelle (fichier ou salle synthétique) n'est
+        rechargée et partitionnée que si elle change ; les partitions ont
+        la taille des blocs du mixeur.
+        """
+        if wet <= 0:
+            self.mixer.set_effects([])
+            return
+        if self.reverb is None or ir_path != self.reverb_ir:
+            if ir_path:
+                ir = load_impulse_response(ir_path, self.sample_rate)
+            else:
+                ir = synthetic_ir(self.sample_rate)
+            self.reverb = ConvolutionReverb(ir, self.mixer.block_size or 128, wet)
+            self.reverb_ir = ir_path
+        self.reverb.wet = wet
+        self.mixer.set_effects([self.reverb])
+
+    def set_duration(self, duration: float):
+        """Change la durée des notes ; les samples sont rendus via le cache indexé."""
+        self.duration = duration
+
+    def play_async(self, frequency: float, velocity: int = MAX_VELOCITY):
+        """Joue une note de manière asynchrone via le mixeur.
+
+        La vélocité choisit la couche de timbre et fixe le gain de la voix.
+        Seules les voix déjà en cache (banque préchargée) sont jouées.
+        """
+        if sd is None:
+            return
+
+        layer = self.velocity_layer(velocity)
+        cache_key = self._voice_key(frequency, layer=layer)
+        # Lecture du cache sans verrou : le jeu n'attend jamais un rendu ou un
+        # préchargement en cours. Une voix absente (durée tout juste changée)
+        # est rendue en arrière-plan et la note est sautée.
+        voice = self.sample_cache.get(cache_key)
+        if voice is None:
+            self._synthesize_later(cache_key, frequency)
+            return
+        gain = velocity / self.MAX_VELOCITY
+        self.mixer.trigger(voice, gain=gain)
+        looper = self.mixer.looper
+        if looper is not None:
+            looper.capture(voice, gain)
+        self.mixer.start()
 
     def analyze_spectrum(self, sample: np.ndarray, freq_range: int = 2000) -> Tuple:
         """Analyse le spectre FFT du sample."""
@@ -169,17 +781,39 @@ class AudioCore:
             print(f"Erreur sauvegarde: {e}")
             return False
 
-    def load_recording(self, filepath: str) -> Optional[np.ndarray]:
-        """Charge un enregistrement."""
+    def load_recording(self, filepath: str, block_frames: int = 65536) -> Optional[np.ndarray]:
+        """Charge un enregistrement à la fréquence du moteur.
+
+        Les fichiers à une autre fréquence sont rééchantillonnés une seule
+        fois, en flux polyphase, plutôt que par le mixeur du système.
+        """
         if sf is None:
             return None
         try:
-            data, sr = sf.read(filepath, dtype='float32')
-            return data
+            with sf.SoundFile(filepath) as f:
+                if f.samplerate == self.sample_rate:
+                    return f.read(dtype='float32')
+                resampler = StreamingResampler(f.samplerate, self.sample_rate)
+                chunks = [resampler.process(block)
+                          for block in f.blocks(block_frames, dtype='float32')]
+                chunks.append(resampler.flush())
+            return np.concatenate(chunks)
         except Exception as e:
             print(f"Erreur chargement: {e}")
             return None
 
 
 # Instance globale
-audio_core = AudioCore()
+audio_core = AudioCore(
+    sample_rate=config.SAMPLE_RATE,
+    volume=config.VOLUME,
+    compact=config.COMPACT_SAMPLES,
+    trim_silence=config.TRIM_SILENCE,
+    block_size=config.AUDIO_BLOCK_SIZE,
+    latency=config.AUDIO_LATENCY,
+    device=config.AUDIO_DEVICE,
+    limiter=config.LIMITER_ENABLED,
+    limiter_threshold_db=config.LIMITER_THRESHOLD_DB,
+)
+if config.REVERB_WET > 0:
+    audio_core.set_reverb(config.REVERB_WET, config.REVERB_IR)
@@ -7,7 +7,90 @@ import sqlite3
 import hashlib
 import os
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, List, Optional, Tuple
+
+
+# Métadonnées de fichier mises en cache dans la table recordings
+RECORDING_METADATA = {
+    "sample_rate": "INTEGER",
+    "frames": "INTEGER",
+    "channels": "INTEGER",
+    "codec": "TEXT",
+    "file_size": "INTEGER",
+    "mtime": "REAL",
+    "content_hash": "TEXT",
+    "missing": "INTEGER DEFAULT 0",
+    "loudness": "REAL",   # Sonie intégrée (LUFS)
+    "true_peak": "REAL",  # Crête vraie (dBTP)
+}
+
+# Champs descriptifs saisis par l'utilisateur, indexés en plein texte
+RECORDING_DETAILS = {
+    "tags": "TEXT DEFAULT ''",
+    "notes": "TEXT DEFAULT ''",
+}
+
+# Index plein texte externe (le texte reste dans recordings), tenu à jour
+# par des déclencheurs ; les accents sont ignorés à la recherche et les
+# préfixes courts (saisie en cours) ont leur propre index
+FTS_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS recordings_fts USING fts5(
+           name, tags, notes, content='recordings', content_rowid='id',
+           tokenize="unicode61 remove_diacritics 2", prefix='2 3'
+       )""",
+    """CREATE TRIGGER IF NOT EXISTS recordings_fts_insert AFTER INSERT ON recordings BEGIN
+           INSERT INTO recordings_fts (rowid, name, tags, notes)
+           VALUES (new.id, new.name, new.tags, new.notes);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS recordings_fts_delete AFTER DELETE ON recordings BEGIN
+           INSERT INTO recordings_fts (recordings_fts, rowid, name, tags, notes)
+           VALUES ('delete', old.id, old.name, old.tags, old.notes);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS recordings_fts_update AFTER UPDATE OF name, tags, notes ON recordings BEGIN
+           INSERT INTO recordings_fts (recordings_fts, rowid, name, tags, notes)
+           VALUES ('delete', old.id, old.name, old.tags, old.notes);
+           INSERT INTO recordings_fts (rowid, name, tags, notes)
+           VALUES (new.id, new.name, new.tags, new.notes);
+       END""",
+]
+
+# Poids bm25 des colonnes (nom, étiquettes, notes)
+FTS_WEIGHTS = (10.0, 5.0, 1.0)
+# Correspondances classées par bm25, les plus récentes d'abord : un mot
+# fréquent ne fait pas scorer toute la table avant LIMIT/OFFSET
+FTS_CANDIDATES = 1000
+
+
+def like_pattern(text: str) -> str:
+    """Motif LIKE « contient `text` » (à utiliser avec ESCAPE '\\')."""
+    for ch in ("\\", "%", "_"):
+        text = text.replace(ch, "\\" + ch)
+    return f"%{text}%"
+
+
+def split_tags(tags: str) -> List[str]:
+    """Étiquettes d'une chaîne séparée par des virgules (vides ignorées)."""
+    return [tag.strip() for tag in (tags or "").split(",") if tag.strip()]
+
+
+def fts_query(query: str) -> str:
+    """Traduit une saisie libre en requête FTS5.
+
+    Chaque mot devient un préfixe (`bal` trouve `balafon`) et tous doivent
+    correspondre ; `tag:xyz` restreint le mot aux étiquettes. Les mots sont
+    cités et la ponctuation seule ignorée : la saisie ne peut pas produire
+    de syntaxe FTS5 invalide.
+    """
+    terms = []
+    for token in query.split():
+        column = ""
+        if token.lower().startswith("tag:"):
+            column, token = "tags : ", token[4:]
+        if not any(ch.isalnum() for ch in token):
+            continue
+        token = token.replace('"', '""')
+        terms.append(f'{column}"{token}"*')
+    return " ".join(terms)
 
 
 class Database:
@@ -15,6 +98,8 @@ class Database:
 
     def __init__(self, db_path: str = "data/symphony.db"):
         self.db_path = db_path
+        # Faux si SQLite est compilé sans FTS5 (recherche par LIKE)
+        self.fts = False
         Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
         self.init_db()
 
@@ -50,6 +135,24 @@ class Database:
             )
         """)
 
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS waveforms (
+                recording_id INTEGER PRIMARY KEY,
+                pyramid BLOB NOT NULL,
+                FOREIGN KEY(recording_id) REFERENCES recordings(id) ON DELETE CASCADE
+            )
+        """)
+
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS performances (
+                recording_id INTEGER PRIMARY KEY,
+                events BLOB NOT NULL,
+                event_count INTEGER NOT NULL,
+                engine_version INTEGER,
+                FOREIGN KEY(recording_id) REFERENCES recordings(id) ON DELETE CASCADE
+            )
+        """)
+
         # Migration: Ajouter la colonne 'name' si elle n'existe pas
         try:
             c.execute("ALTER TABLE recordings ADD COLUMN name TEXT DEFAULT 'Enregistrement'")
@@ -57,6 +160,38 @@ class Database:
             # La colonne existe déjà
             pass
 
+        # Migration: colonnes de métadonnées de fichier
+        for column, column_type in RECORDING_METADATA.items():
+            try:
+                c.execute(f"ALTER TABLE recordings ADD COLUMN {column} {column_type}")
+            except sqlite3.OperationalError:
+                pass
+
+        # Migration: étiquettes et notes
+        for column, column_type in RECORDING_DETAILS.items():
+            try:
+                c.execute(f"ALTER TABLE recordings ADD COLUMN {column} {column_type}")
+            except sqlite3.OperationalError:
+                pass
+
+        # Liste paginée d'un utilisateur sans tri complet
+        c.execute("""
+            CREATE INDEX IF NOT EXISTS recordings_user_created
+            ON recordings (user_id, created_at DESC, id DESC)
+        """)
+
+        c.execute("SELECT 1 FROM sqlite_master WHERE name = 'recordings_fts'")
+        fts_existed = c.fetchone() is not None
+        try:
+            for statement in FTS_SCHEMA:
+                c.execute(statement)
+            if not fts_existed:
+                # Base existante : indexer les enregistrements déjà présents
+                c.execute("INSERT INTO recordings_fts (recordings_fts) VALUES ('rebuild')")
+            self.fts = True
+        except sqlite3.OperationalError as e:
+            print(f"FTS5 indisponible, recherche simplifiée: {e}")
+
         conn.commit()
         conn.close()
 
@@ -94,16 +229,28 @@ class Database:
             return row['id']
         return None
 
-    def save_recording(self, user_id: int, filename: str, duration: float, name: str = "Enregistrement"):
-        """Enregistre une métadonnée d'enregistrement."""
+    def save_recording(
+        self,
+        user_id: int,
+        filename: str,
+        duration: float,
+        name: str = "Enregistrement",
+        metadata: Optional[dict] = None
+    ) -> int:
+        """Enregistre une métadonnée d'enregistrement. Retourne son ID."""
+        metadata = {k: v for k, v in (metadata or {}).items() if k in RECORDING_METADATA}
+        columns = ["user_id", "filename", "duration", "name"] + list(metadata)
+        values = [user_id, filename, duration, name] + list(metadata.values())
         conn = self.get_connection()
         c = conn.cursor()
         c.execute(
-            "INSERT INTO recordings (user_id, filename, duration, name) VALUES (?, ?, ?, ?)",
-            (user_id, filename, duration, name)
+            f"INSERT INTO recordings ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            values
         )
+        recording_id = c.lastrowid
         conn.commit()
         conn.close()
+        return recording_id
 
     def get_recordings(self, user_id: int) -> list:
         """Récupère les enregistrements d'un utilisateur."""
@@ -117,16 +264,205 @@ class Database:
         conn.close()
         return rows
 
+    def search_recordings(self, user_id: int, query: str = "", limit: int = 50,
+                          offset: int = 0) -> Tuple[list, bool]:
+        """Page d'enregistrements correspondant à `query` (nom, étiquettes, notes).
+
+        Les résultats sont classés par pertinence puis du plus récent au plus
+        ancien, parmi les FTS_CANDIDATES correspondances les plus récentes ;
+        une requête vide liste simplement les enregistrements.
+        Retourne (lignes, True s'il reste des pages).
+        """
+        sql, params = self._search_statement(user_id, query, limit, offset)
+        conn = self.get_connection()
+        c = conn.cursor()
+        c.execute(sql, params)
+        rows = c.fetchall()
+        conn.close()
+        return rows[:limit], len(rows) > limit
+
+    def _search_statement(self, user_id: int, query: str, limit: int, offset: int) -> Tuple[str, list]:
+        """Requête SQL (et paramètres) d'une page de recherche."""
+        match = fts_query(query)
+        # Une ligne de plus que demandé : indique s'il existe une page suivante
+        if not match:
+            return (
+                """SELECT * FROM recordings WHERE user_id = ?
+                   ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?""",
+                [user_id, limit + 1, offset]
+            )
+        if self.fts:
+            # FTS5 parcourt ses correspondances par rowid décroissant et s'arrête
+            # à FTS_CANDIDATES : seules celles-ci sont scorées puis triées
+            return (
+                f"""SELECT r.* FROM (
+                        SELECT rowid, bm25(recordings_fts, {', '.join(map(str, FTS_WEIGHTS))}) AS score
+                        FROM recordings_fts WHERE recordings_fts MATCH ?
+                        ORDER BY rowid DESC LIMIT ?
+                    ) f JOIN recordings r ON r.id = f.rowid
+                    WHERE r.user_id = ?
+                    ORDER BY f.score, r.created_at DESC, r.id DESC
+                    LIMIT ? OFFSET ?""",
+                [match, FTS_CANDIDATES, user_id, limit + 1, offset]
+            )
+        conditions, params = [], [user_id]
+        for token in query.split():
+            if token.lower().startswith("tag:"):
+                conditions.append("tags LIKE ? ESCAPE '\\'")
+                params.append(like_pattern(token[4:]))
+            else:
+                conditions.append("(name LIKE ? ESCAPE '\\' OR tags LIKE ? ESCAPE '\\' OR notes LIKE ? ESCAPE '\\')")
+                params += [like_pattern(token)] * 3
+        return (
+            f"""SELECT * FROM recordings WHERE user_id = ? AND {' AND '.join(conditions)}
+                ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?""",
+            params + [limit + 1, offset]
+        )
+
+    def set_recording_details(self, recording_id: int, tags: Optional[Iterable[str]] = None,
+                              notes: Optional[str] = None) -> bool:
+        """Met à jour les étiquettes et/ou les notes d'un enregistrement."""
+        values = {}
+        if tags is not None:
+            values["tags"] = ", ".join(dict.fromkeys(t.strip() for t in tags if t.strip()))
+        if notes is not None:
+            values["notes"] = notes
+        if not values:
+            return True
+        try:
+            conn = self.get_connection()
+            with conn:
+                assignments = ", ".join(f"{column} = ?" for column in values)
+                conn.execute(f"UPDATE recordings SET {assignments} WHERE id = ?",
+                             list(values.values()) + [recording_id])
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Erreur étiquettes DB: {e}")
+            return False
+
+    def get_all_recordings(self) -> list:
+        """Récupère tous les enregistrements (pour la réconciliation avec le disque)."""
+        conn = self.get_connection()
+        c = conn.cursor()
+        c.execute("SELECT * FROM recordings")
+        rows = c.fetchall()
+        conn.close()
+        return rows
+
+    def update_recordings_metadata(self, updates: Iterable[tuple]):
+        """Met à jour en une transaction les métadonnées de plusieurs enregistrements.
+
+        `updates` contient des couples (recording_id, dict de métadonnées).
+        """
+        conn = self.get_connection()
+        with conn:
+            for recording_id, metadata in updates:
+                metadata = {k: v for k, v in metadata.items() if k in RECORDING_METADATA}
+                if "frames" in metadata and metadata.get("sample_rate"):
+                    metadata["duration"] = metadata["frames"] / metadata["sample_rate"]
+                if not metadata:
+                    continue
+                assignments = ", ".join(f"{column} = ?" for column in metadata)
+                conn.execute(
+                    f"UPDATE recordings SET {assignments} WHERE id = ?",
+                    list(metadata.values()) + [recording_id]
+                )
+        conn.close()
+
+    def set_recordings_missing(self, missing_ids: Iterable[int], present_ids: Iterable[int]):
+        """Marque en masse les enregistrements dont le fichier a disparu (ou réapparu)."""
+        conn = self.get_connection()
+        with conn:
+            conn.executemany("UPDATE recordings SET missing = 1 WHERE id = ?",
+                             [(i,) for i in missing_ids])
+            conn.executemany("UPDATE recordings SET missing = 0 WHERE id = ?",
+                             [(i,) for i in present_ids])
+        conn.close()
+
+    def save_waveform(self, recording_id: int, pyramid: bytes):
+        """Stocke la pyramide de crêtes (sérialisée) d'un enregistrement."""
+        conn = self.get_connection()
+        c = conn.cursor()
+        c.execute(
+            "INSERT OR REPLACE INTO waveforms (recording_id, pyramid) VALUES (?, ?)",
+            (recording_id, sqlite3.Binary(pyramid))
+        )
+        conn.commit()
+        conn.close()
+
+    def get_waveforms(self, user_id: int, recording_ids: Optional[Iterable[int]] = None) -> dict:
+        """Récupère les pyramides de crêtes des enregistrements d'un utilisateur.
+
+        `recording_ids` limite la lecture à ces enregistrements (page affichée).
+        """
+        conn = self.get_connection()
+        c = conn.cursor()
+        query = """SELECT w.recording_id, w.pyramid FROM waveforms w
+                   JOIN recordings r ON r.id = w.recording_id
+                   WHERE r.user_id = ?"""
+        params = [user_id]
+        if recording_ids is not None:
+            ids = list(recording_ids)
+            query += f" AND w.recording_id IN ({', '.join('?' * len(ids))})"
+            params += ids
+        c.execute(query, params)
+        rows = c.fetchall()
+        conn.close()
+        return {row['recording_id']: bytes(row['pyramid']) for row in rows}
+
+    def save_performance(self, recording_id: int, events: bytes, event_count: int,
+                         engine_version: Optional[int] = None):
+        """Stocke la séquence d'événements (BLOB compact) d'un enregistrement."""
+        conn = self.get_connection()
+        c = conn.cursor()
+        c.execute(
+            """INSERT OR REPLACE INTO performances
+               (recording_id, events, event_count, engine_version) VALUES (?, ?, ?, ?)""",
+            (recording_id, sqlite3.Binary(events), event_count, engine_version)
+        )
+        conn.commit()
+        conn.close()
+
+    def get_performance(self, recording_id: int) -> Optional[bytes]:
+        """Récupère la séquence d'événements d'un enregistrement, ou None."""
+        conn = self.get_connection()
+        c = conn.cursor()
+        c.execute("SELECT events FROM performances WHERE recording_id = ?", (recording_id,))
+        row = c.fetchone()
+        conn.close()
+        return bytes(row['events']) if row else None
+
     def delete_recording(self, recording_id: int) -> bool:
         """Supprime un enregistrement de la base de données."""
+        return self.delete_recordings([recording_id])
+
+    def delete_recordings(self, recording_ids: Iterable[int]) -> bool:
+        """Supprime plusieurs enregistrements en une seule transaction."""
+        params = [(recording_id,) for recording_id in recording_ids]
         try:
             conn = self.get_connection()
-            c = conn.cursor()
-            c.execute("DELETE FROM recordings WHERE id = ?", (recording_id,))
-            conn.commit()
+            with conn:
+                conn.executemany("DELETE FROM waveforms WHERE recording_id = ?", params)
+                conn.executemany("DELETE FROM performances WHERE recording_id = ?", params)
+                conn.executemany("DELETE FROM recordings WHERE id = ?", params)
             conn.close()
             return True
         except Exception as e:
             print(f"Erreur suppression DB: {e}")
             return False
 
+    def rename_recordings(self, renames: Iterable[Tuple[int, str]]) -> bool:
+        """Renomme plusieurs enregistrements (couples (id, nom)) en une transaction."""
+        try:
+            conn = self.get_connection()
+            with conn:
+                conn.executemany(
+                    "UPDATE recordings SET name = ? WHERE id = ?",
+                    [(name, recording_id) for recording_id, name in renames]
+                )
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Erreur renommage DB: {e}")
+            return False
@@ -0,0 +1,372 @@
+"""Traitements du signal de Symphony.
+
+Blocs DSP réutilisables par le moteur temps réel et les rendus hors ligne.
+"""
+
+from math import ceil, gcd
+from typing import Iterable, Iterator
+
+import numpy as np
+from scipy import signal
+from scipy.ndimage import minimum_filter1d
+
+try:
+    import soundfile as sf
+except (ImportError, OSError):
+    sf = None
+
+
+class StreamingResampler:
+    """Rééchantillonnage polyphase en flux, bloc par bloc.
+
+    Chaque bloc est traité par `signal.resample_poly` avec un contexte
+    suffisant de part et d'autre pour couvrir le filtre : la sortie est
+    identique à un rééchantillonnage du fichier entier, sans le charger.
+    """
+
+    def __init__(self, rate_in: int, rate_out: int, block_frames: int = 8192):
+        divisor = gcd(int(rate_in), int(rate_out))
+        self.up = int(rate_out) // divisor
+        self.down = int(rate_in) // divisor
+        # Demi-longueur du filtre de resample_poly, ramenée en échantillons d'entrée
+        half_len = 10 * max(self.up, self.down)
+        self.context = self.down * ceil((half_len // self.up + 2) / self.down)
+        self.block = self.down * max(1, block_frames // self.down)
+        self._buffer = None
+        self._buffer_start = 0  # Index global du premier échantillon du tampon
+        self._position = 0      # Index global du prochain échantillon à traiter
+        self._emitted = 0
+
+    @property
+    def passthrough(self) -> bool:
+        return self.up == self.down
+
+    def _resample_segment(self, start: int, frames: int) -> np.ndarray:
+        """Rééchantillonne [start, start + frames) avec son contexte."""
+        lo = start - self.context
+        hi = start + frames + self.context
+        segment = self._buffer[max(0, lo - self._buffer_start):hi - self._buffer_start]
+        pad_left = max(0, self._buffer_start - lo)
+        pad_right = (hi - lo) - pad_left - len(segment)
+        if pad_left or pad_right:
+            pad = [(pad_left, pad_right)] + [(0, 0)] * (segment.ndim - 1)
+            segment = np.pad(segment, pad)
+        out = signal.resample_poly(segment, self.up, self.down, axis=0)
+        first = self.context * self.up // self.down
+        return out[first:first + frames * self.up // self.down]
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """Ajoute un bloc d'entrée et retourne la sortie disponible."""
+        block = np.asarray(block, dtype=np.float32)
+        if self.passthrough:
+            return block
+        if self._buffer is None:
+            self._buffer = block[:0]
+        self._buffer = np.concatenate([self._buffer, block])
+
+        outputs = []
+        buffer_end = self._buffer_start + len(self._buffer)
+        while buffer_end - self._position >= self.block + self.context:
+            outputs.append(self._resample_segment(self._position, self.block))
+            self._position += self.block
+        self._trim()
+        return self._collect(outputs, block)
+
+    def flush(self) -> np.ndarray:
+        """Vide le tampon en complétant par des zéros (fin de flux)."""
+        if self.passthrough or self._buffer is None:
+            return np.zeros(0, dtype=np.float32)
+        buffer_end = self._buffer_start + len(self._buffer)
+        remaining = buffer_end - self._position
+        total_out = ceil(buffer_end * self.up / self.down)
+        aligned = self.down * ceil(remaining / self.down)
+        out = self._resample_segment(self._position, aligned)
+        out = out[:total_out - self._emitted]
+        self._position = buffer_end
+        self._trim()
+        return self._collect([out], self._buffer)
+
+    def _trim(self):
+        """Oublie les échantillons qui ne servent plus de contexte."""
+        keep_from = max(self._buffer_start, self._position - self.context)
+        self._buffer = self._buffer[keep_from - self._buffer_start:]
+        self._buffer_start = keep_from
+
+    def _collect(self, outputs: list, like: np.ndarray) -> np.ndarray:
+        if not outputs:
+            return np.zeros((0,) + like.shape[1:], dtype=np.float32)
+        out = np.concatenate(outputs).astype(np.float32, copy=False)
+        self._emitted += len(out)
+        return out
+
+
+def resample_blocks(blocks: Iterable[np.ndarray], rate_in: int, rate_out: int) -> Iterator[np.ndarray]:
+    """Rééchantillonne une suite de blocs, en flux."""
+    resampler = StreamingResampler(rate_in, rate_out)
+    for block in blocks:
+        out = resampler.process(block)
+        if len(out):
+            yield out
+    tail = resampler.flush()
+    if len(tail):
+        yield tail
+
+
+class RingBuffer:
+    """Tampon circulaire float32 à un seul écrivain (le thread audio).
+
+    L'écrivain n'attend jamais ; un lecteur concurrent peut au pire lire
+    un bloc en cours d'écriture, sans conséquence pour un affichage.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = int(capacity)
+        self._data = np.zeros(self.capacity, dtype=np.float32)
+        self.written = 0  # Nombre total d'échantillons écrits
+
+    def write(self, block: np.ndarray):
+        n = len(block)
+        if n >= self.capacity:
+            self._data[:] = block[-self.capacity:]
+            self.written += n
+            return
+        start = self.written % self.capacity
+        first = min(n, self.capacity - start)
+        self._data[start:start + first] = block[:first]
+        self._data[:n - first] = block[first:]
+        self.written += n
+
+    def latest(self, frames: int, out: np.ndarray = None) -> np.ndarray:
+        """Copie les `frames` derniers échantillons (dans `out` si fourni)."""
+        frames = min(frames, self.capacity)
+        if out is None:
+            out = np.empty(frames, dtype=np.float32)
+        end = self.written % self.capacity
+        start = end - frames
+        if start >= 0:
+            out[:frames] = self._data[start:end]
+        else:
+            out[:-start] = self._data[start:]
+            out[-start:frames] = self._data[:end]
+        return out
+
+
+def find_trigger(samples: np.ndarray, level: float = 0.0, search: int = None) -> int:
+    """Premier front montant franchissant `level` dans les `search` premiers échantillons.
+
+    Retourne 0 si aucun front n'est trouvé (affichage libre).
+    """
+    window = samples[:search + 1] if search is not None else samples
+    crossings = np.flatnonzero((window[:-1] < level) & (window[1:] >= level))
+    return int(crossings[0]) + 1 if len(crossings) else 0
+
+
+def minmax_decimate(samples: np.ndarray, columns: int) -> tuple:
+    """Réduit un signal à `columns` paires (min, max), une par colonne de pixels."""
+    edges = np.linspace(0, len(samples), columns + 1).astype(np.int64)
+    starts = np.minimum(edges[:-1], max(0, len(samples) - 1))
+    return np.minimum.reduceat(samples, starts), np.maximum.reduceat(samples, starts)
+
+
+class PartitionedConvolver:
+    """Convolution par partitions uniformes (overlap-add dans le domaine fréquentiel).
+
+    La réponse impulsionnelle est découpée en partitions de `block_size`
+    échantillons dont les FFT (taille 2 × bloc) sont calculées une fois.
+    Chaque bloc d'entrée est transformé une seule fois puis rangé dans une
+    ligne à retard fréquentielle ; la sortie est la somme des produits
+    bloc × partition, ramenée en temps par une seule IFFT. Le coût par bloc
+    est fixe et sans latence ajoutée quand les blocs reçus sont des
+    multiples de `block_size`.
+    """
+
+    def __init__(self, ir: np.ndarray, block_size: int = 128):
+        ir = np.asarray(ir, dtype=np.float32)
+        self.block_size = block_size
+        self.fft_size = 2 * block_size
+        self.partitions = max(1, ceil(len(ir) / block_size))
+        padded = np.zeros(self.partitions * block_size, dtype=np.float32)
+        padded[:len(ir)] = ir
+        spectra = np.fft.rfft(padded.reshape(self.partitions, block_size), self.fft_size, axis=1)
+        # Partitions rangées à l'envers et doublées : la partition à associer
+        # à chaque case de la ligne à retard est une tranche contiguë.
+        reversed_spectra = spectra[::-1].astype(np.complex64)
+        self._spectra = np.concatenate([reversed_spectra, reversed_spectra])
+        self._delay_line = np.zeros((self.partitions, block_size + 1), dtype=np.complex64)
+        self._slot = 0
+        self._tail = np.zeros(block_size, dtype=np.float32)
+        self._input = np.zeros(0, dtype=np.float32)
+        self._output = np.zeros(0, dtype=np.float32)
+        self._buffered = False
+
+    def reset(self):
+        self._delay_line[:] = 0
+        self._tail[:] = 0
+        self._input = np.zeros(0, dtype=np.float32)
+        self._output = np.zeros(0, dtype=np.float32)
+        self._buffered = False
+
+    def _process_block(self, block: np.ndarray) -> np.ndarray:
+        self._slot = (self._slot + 1) % self.partitions
+        self._delay_line[self._slot] = np.fft.rfft(block, self.fft_size)
+        start = self.partitions - 1 - self._slot
+        spectrum = np.einsum("pb,pb->b", self._delay_line, self._spectra[start:start + self.partitions])
+        out = np.fft.irfft(spectrum, self.fft_size).astype(np.float32)
+        result = out[:self.block_size] + self._tail
+        self._tail = out[self.block_size:]
+        return result
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """Convolue un bloc ; retourne autant d'échantillons qu'en entrée."""
+        block = np.asarray(block, dtype=np.float32)
+        size = self.block_size
+        if not self._buffered and len(block) % size == 0:
+            # Chemin temps réel : blocs alignés, aucune latence
+            if len(block) == size:
+                return self._process_block(block)
+            return np.concatenate([self._process_block(b) for b in block.reshape(-1, size)])
+
+        # Blocs de taille variable : latence fixe d'un bloc, amorcée une fois
+        # (reste ensuite constante pour ne pas créer de discontinuité)
+        if not self._buffered:
+            self._buffered = True
+            self._output = np.zeros(size, dtype=np.float32)
+        data = np.concatenate([self._input, block])
+        whole = len(data) // size * size
+        produced = [self._process_block(b) for b in data[:whole].reshape(-1, size)]
+        self._input = data[whole:]
+        self._output = np.concatenate([self._output] + produced)
+        out, self._output = self._output[:len(block)], self._output[len(block):]
+        return out
+
+
+class ConvolutionReverb:
+    """Réverbération à convolution pour le bus maître (mélange sec / réverbéré)."""
+
+    name = "reverb"
+
+    def __init__(self, ir: np.ndarray, block_size: int = 128, wet: float = 0.3):
+        self.ir = np.asarray(ir, dtype=np.float32)
+        self.wet = wet
+        self.convolver = PartitionedConvolver(self.ir, block_size)
+
+    @property
+    def tail_frames(self) -> int:
+        """Durée de la queue ajoutée après la fin du signal."""
+        return len(self.ir) - 1
+
+    def reset(self):
+        self.convolver.reset()
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """Traitement temps réel, bloc par bloc."""
+        return block + np.float32(self.wet) * self.convolver.process(block)
+
+    def render(self, audio: np.ndarray) -> np.ndarray:
+        """Traitement hors ligne en une seule convolution (queue comprise)."""
+        audio = np.asarray(audio, dtype=np.float32)
+        out = np.float32(self.wet) * signal.oaconvolve(audio, self.ir).astype(np.float32)
+        out[:len(audio)] += audio
+        return out
+
+
+def synthetic_ir(sample_rate: int, duration: float = 1.5, decay_db: float = -60.0, seed: int = 0) -> np.ndarray:
+    """Réponse impulsionnelle de salle synthétique (bruit à décroissance exponentielle)."""
+    frames = max(1, int(duration * sample_rate))
+    rng = np.random.default_rng(seed)
+    envelope = np.exp(np.log(10 ** (decay_db / 20)) * np.arange(frames) / frames)
+    ir = (rng.standard_normal(frames) * envelope).astype(np.float32)
+    return normalize_ir(ir)
+
+
+def normalize_ir(ir: np.ndarray) -> np.ndarray:
+    """Normalise l'énergie de la réponse (gain réverbéré ~ unitaire)."""
+    energy = np.sqrt(np.sum(np.square(ir, dtype=np.float64)))
+    return (ir / energy).astype(np.float32) if energy > 0 else ir.astype(np.float32)
+
+
+def load_impulse_response(path: str, sample_rate: int) -> np.ndarray:
+    """Charge une réponse impulsionnelle (mono, à la fréquence du moteur, normalisée)."""
+    if sf is None:
+        raise RuntimeError("soundfile indisponible")
+    ir, rate = sf.read(path, dtype="float32", always_2d=True)
+    ir = ir.mean(axis=1)
+    if rate != sample_rate:
+        divisor = gcd(int(rate), int(sample_rate))
+        ir = signal.resample_poly(ir, sample_rate // divisor, rate // divisor).astype(np.float32)
+    return normalize_ir(ir)
+
+
+class LookaheadLimiter:
+    """Limiteur de crête à anticipation, vectorisé par bloc.
+
+    Gain requis par échantillon = seuil / |x| (borné à 1), puis :
+    minimum glissant sur `lookahead + hold` échantillons (maintien), puis
+    moyenne glissante sur `lookahead` échantillons (rampe d'attaque et de
+    relâchement sans discontinuité). Le signal est retardé de
+    `lookahead - 1` échantillons : le gain a déjà atteint son minimum quand
+    la crête sort, la sortie ne dépasse jamais le seuil.
+    """
+
+    name = "limiter"
+
+    def __init__(self, sample_rate: int = 44100, threshold_db: float = -1.0,
+                 lookahead_ms: float = 2.0, hold_ms: float = 40.0):
+        self.sample_rate = sample_rate
+        self.threshold_db = threshold_db
+        self.threshold = 10 ** (threshold_db / 20)
+        self.lookahead = max(2, int(round(lookahead_ms * sample_rate / 1000)))
+        self.hold = max(0, int(round(hold_ms * sample_rate / 1000)))
+        self.window = self.lookahead + self.hold
+        self.latency = self.lookahead - 1
+        self.reset()
+
+    def reset(self):
+        self._required = np.ones(self.window - 1)
+        self._held = np.ones(self.lookahead - 1)
+        self._delay = np.zeros(self.latency, dtype=np.float32)
+        self._stats = {"max_reduction_db": 0.0, "reduction_db": 0.0, "limited_frames": 0}
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """Limite un bloc (latence de `latency` échantillons)."""
+        block = np.asarray(block, dtype=np.float32)
+        n = len(block)
+        if n == 0:
+            return block
+        required = np.minimum(1.0, self.threshold / np.maximum(np.abs(block), 1e-12))
+
+        # Minimum glissant (van Herk, O(n)) sur la fenêtre de maintien
+        required = np.concatenate([self._required, required])
+        held = minimum_filter1d(required, self.window, origin=(self.window - 1) // 2)[self.window - 1:]
+        self._required = required[-(self.window - 1):]
+
+        # Moyenne glissante : rampe de gain lissée
+        held = np.concatenate([self._held, held])
+        sums = np.concatenate([[0.0], np.cumsum(held)])
+        gain = (sums[self.lookahead:] - sums[:-self.lookahead]) / self.lookahead
+        self._held = held[-(self.lookahead - 1):]
+
+        delayed = np.concatenate([self._delay, block])
+        out = (delayed[:n] * gain).astype(np.float32)
+        self._delay = delayed[n:]
+
+        reduction = float(-20 * np.log10(max(gain.min(), 1e-12)))
+        self._stats["reduction_db"] = reduction
+        self._stats["max_reduction_db"] = max(self._stats["max_reduction_db"], reduction)
+        self._stats["limited_frames"] += int(np.count_nonzero(gain < 1.0 - 1e-9))
+        return out
+
+    def render(self, audio: np.ndarray) -> np.ndarray:
+        """Traitement hors ligne, latence compensée (même longueur qu'en entrée)."""
+        offline = LookaheadLimiter(self.sample_rate, self.threshold_db,
+                                   self.lookahead * 1000 / self.sample_rate,
+                                   self.hold * 1000 / self.sample_rate)
+        padded = np.concatenate([np.asarray(audio, dtype=np.float32), np.zeros(self.latency, dtype=np.float32)])
+        out = offline.process(padded)[self.latency:]
+        self._stats["max_reduction_db"] = max(self._stats["max_reduction_db"],
+                                              offline._stats["max_reduction_db"])
+        return out
+
+    def stats(self) -> dict:
+        """Réduction de gain : courante (dernier bloc), maximale, frames limitées."""
+        return dict(self._stats)
@@ -0,0 +1,185 @@
+"""Entrées de jeu hors clavier : contrôleurs MIDI (e-mallets, pads...).
+
+Les messages reçus par les backends sont horodatés à l'arrivée puis
+déposés dans une file unique, vidée par un thread dédié qui déclenche
+directement le moteur audio, sans passer par la boucle d'événements Qt.
+L'interface n'est prévenue qu'ensuite, pour l'affichage et la prise.
+"""
+
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from midi_io import nearest_keys
+
+try:
+    import rtmidi
+except ImportError:
+    rtmidi = None
+
+
+class MidiMessage(NamedTuple):
+    """Message MIDI brut horodaté à la réception (`time.perf_counter_ns`)."""
+    source: str
+    status: int
+    data1: int
+    data2: int
+    timestamp_ns: int
+
+
+class MidiBackend:
+    """Source de messages MIDI ; `open` reçoit la fonction de dépôt."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._sink: Optional[Callable[[MidiMessage], None]] = None
+
+    def open(self, sink: Callable[[MidiMessage], None]):
+        self._sink = sink
+
+    def close(self):
+        self._sink = None
+
+    def push(self, status: int, data1: int = 0, data2: int = 0, timestamp_ns: Optional[int] = None):
+        """Dépose un message (appelé depuis le thread du pilote)."""
+        if timestamp_ns is None:
+            timestamp_ns = time.perf_counter_ns()
+        sink = self._sink
+        if sink is not None:
+            sink(MidiMessage(self.name, status, data1, data2, timestamp_ns))
+
+
+class LoopbackBackend(MidiBackend):
+    """Contrôleur virtuel : les messages sont injectés par programme (tests)."""
+
+    def __init__(self, name: str = "loopback"):
+        super().__init__(name)
+
+    def note_on(self, note: int, velocity: int = 100, channel: int = 0):
+        self.push(0x90 | channel, note, velocity)
+
+    def note_off(self, note: int, channel: int = 0):
+        self.push(0x80 | channel, note, 0)
+
+
+class RtMidiBackend(MidiBackend):
+    """Port d'entrée matériel via python-rtmidi (optionnel)."""
+
+    def __init__(self, port: int = 0, name: Optional[str] = None):
+        if rtmidi is None:
+            raise RuntimeError("python-rtmidi n'est pas installé")
+        self.port = port
+        self._midi_in = rtmidi.MidiIn()
+        super().__init__(name or self._midi_in.get_port_name(port))
+
+    @staticmethod
+    def list_ports() -> List[str]:
+        if rtmidi is None:
+            return []
+        return rtmidi.MidiIn().get_ports()
+
+    def open(self, sink: Callable[[MidiMessage], None]):
+        super().open(sink)
+        self._midi_in.set_callback(self._on_message)
+        self._midi_in.open_port(self.port)
+
+    def close(self):
+        self._midi_in.cancel_callback()
+        self._midi_in.close_port()
+        super().close()
+
+    def _on_message(self, event, data=None):
+        message, _ = event
+        if len(message) >= 3:
+            self.push(message[0], message[1], message[2])
+
+
+class InputEngine:
+    """Thread d'entrée : messages MIDI -> lames du balafon -> mixeur.
+
+    `on_note(key, velocity, timestamp_ns)` est appelé depuis le thread
+    d'entrée une fois la voix déclenchée (l'interface doit le relayer par
+    un signal Qt).
+    """
+
+    def __init__(self, core, notes: list, on_note: Optional[Callable[[int, int, int], None]] = None):
+        self.core = core
+        self.on_note = on_note
+        self._queue: "queue.SimpleQueue[Optional[MidiMessage]]" = queue.SimpleQueue()
+        self._sources: Dict[str, MidiBackend] = {}
+        self._latency: Dict[str, dict] = {}
+        self._thread: Optional[threading.Thread] = None
+        self.set_notes(notes)
+
+    def set_notes(self, notes: list):
+        """Recalcule la table note MIDI -> lame (échelle courante)."""
+        frequencies = [n.frequency for n in notes]
+        keys = nearest_keys(np.arange(128), notes)
+        # Remplacement atomique : le thread d'entrée lit l'une ou l'autre table
+        self._lookup = [(int(k), frequencies[k]) for k in keys]
+
+    def add_source(self, backend: MidiBackend):
+        backend.open(self._queue.put)
+        self._sources[backend.name] = backend
+        self._latency[backend.name] = {"events": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0}
+
+    def remove_source(self, name: str):
+        backend = self._sources.pop(name, None)
+        if backend is not None:
+            backend.close()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="midi-input", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Ferme les sources et arrête le thread."""
+        for name in list(self._sources):
+            self.remove_source(name)
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            message = self._queue.get()
+            if message is None:
+                return
+            self._handle(message)
+
+    def _handle(self, message: MidiMessage):
+        kind = message.status & 0xF0
+        if kind != 0x90 or message.data2 == 0:
+            return  # Lames percussives : les note-off sont ignorés
+        key, frequency = self._lookup[message.data1 & 0x7F]
+        velocity = message.data2
+        self.core.play_async(frequency, velocity)
+
+        latency_ms = (time.perf_counter_ns() - message.timestamp_ns) / 1e6
+        stats = self._latency.get(message.source)
+        if stats is not None:
+            stats["events"] += 1
+            stats["total_ms"] += latency_ms
+            stats["max_ms"] = max(stats["max_ms"], latency_ms)
+            stats["last_ms"] = latency_ms
+
+        if self.on_note is not None:
+            self.on_note(key, velocity, message.timestamp_ns)
+
+    def stats(self) -> dict:
+        """Latence réception -> déclenchement, par source (ms)."""
+        report = {}
+        for name, stats in self._latency.items():
+            events = stats["events"]
+            report[name] = {
+                "events": events,
+                "mean_ms": stats["total_ms"] / events if events else 0.0,
+                "max_ms": stats["max_ms"],
+                "last_ms": stats["last_ms"],
+            }
+        return report
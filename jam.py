@@ -0,0 +1,505 @@
+"""Sessions de jeu à plusieurs (jam) sur le réseau local.
+
+Un serveur asyncio relaie entre les instances de Symphony des événements
+de note minuscules (15 octets) horodatés sur l'horloge de la session ; le
+son n'est jamais transmis. Chaque client estime le décalage de son horloge
+avec celle du serveur (échanges ping/pong à la NTP), place les notes des
+autres dans un tampon de gigue puis les rend avec sa propre banque.
+
+    python jam.py serve --port 7870
+    python jam.py bench --clients 16 --notes 200
+"""
+
+import argparse
+import asyncio
+import heapq
+import itertools
+import struct
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+import config
+from performance import SCALE_IDS
+
+# Messages : un octet de type puis une charge de taille fixe
+MSG_WELCOME, MSG_PING, MSG_PONG, MSG_NOTE = 1, 2, 3, 4
+MESSAGES = {
+    MSG_WELCOME: struct.Struct(">BH"),        # id attribué au client
+    MSG_PING: struct.Struct(">Bq"),           # t0 (horloge locale, µs)
+    MSG_PONG: struct.Struct(">Bqq"),          # t0, horloge du serveur (µs)
+    MSG_NOTE: struct.Struct(">BHBBBxq"),      # émetteur, lame, vélocité, gamme, instant (session, µs)
+}
+
+
+def valid_note(key: int, scale_id: int) -> bool:
+    """Vrai si une note reçue désigne une lame et une gamme existantes."""
+    return key < config.NUM_NOTES and scale_id < len(SCALE_IDS)
+
+
+def monotonic_us() -> int:
+    return time.perf_counter_ns() // 1000
+
+
+async def read_message(reader: asyncio.StreamReader) -> tuple:
+    """Lit un message complet ; lève IncompleteReadError en fin de flux."""
+    kind = (await reader.readexactly(1))[0]
+    layout = MESSAGES.get(kind)
+    if layout is None:
+        raise ValueError(f"Message inconnu: {kind}")
+    return layout.unpack(bytes([kind]) + await reader.readexactly(layout.size - 1))
+
+
+# ============================================================================
+# HORLOGE ET TAMPON DE GIGUE
+# ============================================================================
+
+class ClockSync:
+    """Estimation du décalage horloge locale -> horloge de la session.
+
+    Parmi les derniers échanges, celui de plus petit aller-retour est
+    retenu : c'est le moins perturbé par les files d'attente.
+    """
+
+    def __init__(self, window: int = 8):
+        self.window = window
+        self._samples: List[tuple] = []  # (aller-retour, décalage)
+
+    def add(self, t0: int, server_time: int, t1: int):
+        rtt = t1 - t0
+        self._samples.append((rtt, server_time - (t0 + t1) / 2))
+        del self._samples[:-self.window]
+
+    @property
+    def synced(self) -> bool:
+        return bool(self._samples)
+
+    @property
+    def offset(self) -> float:
+        """Décalage (µs) à ajouter à l'horloge locale pour obtenir celle de la session."""
+        return min(self._samples)[1] if self._samples else 0.0
+
+    @property
+    def rtt(self) -> float:
+        return min(self._samples)[0] if self._samples else 0.0
+
+
+class JitterBuffer:
+    """Tampon de gigue adaptatif : les notes sont rejouées à instant + délai.
+
+    La gigue du transit est estimée comme en RTP (moyenne glissante des
+    écarts de transit, gain 1/16) ; le délai suit `factor` fois la gigue,
+    borné par `min_delay_us` et `max_delay_us`. Une note qui arrive après
+    son échéance est jouée aussitôt et comptée en retard.
+    """
+
+    def __init__(self, min_delay_us: int = 20000, max_delay_us: int = 150000, factor: float = 4.0):
+        self.min_delay_us = min_delay_us
+        self.max_delay_us = max_delay_us
+        self.factor = factor
+        self.jitter_us = 0.0
+        self.late = 0
+        self._last_transit: Optional[float] = None
+        self._heap: List[tuple] = []
+        self._order = itertools.count()
+
+    @property
+    def delay_us(self) -> float:
+        return min(self.max_delay_us, max(self.min_delay_us, self.factor * self.jitter_us))
+
+    def push(self, event_time: float, arrival: float, payload):
+        """Ajoute une note (instants en µs sur l'horloge locale)."""
+        transit = arrival - event_time
+        if self._last_transit is not None:
+            self.jitter_us += (abs(transit - self._last_transit) - self.jitter_us) / 16
+        self._last_transit = transit
+        due = event_time + self.delay_us
+        if due < arrival:
+            self.late += 1
+            due = arrival
+        heapq.heappush(self._heap, (due, next(self._order), payload))
+
+    def next_due(self) -> Optional[float]:
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float) -> List[tuple]:
+        """Notes arrivées à échéance : liste de (échéance, charge)."""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            when, _, payload = heapq.heappop(self._heap)
+            due.append((when, payload))
+        return due
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+# ============================================================================
+# SERVEUR
+# ============================================================================
+
+class JamServer:
+    """Relais de session : horloge de référence et diffusion des notes."""
+
+    def __init__(self, clock: Callable[[], int] = monotonic_us, max_buffer: int = 64 * 1024):
+        self.clock = clock
+        # Au-delà de `max_buffer` octets en attente vers un client lent, ses
+        # notes sont abandonnées : une note en retard n'a plus d'intérêt et
+        # les autres musiciens ne doivent pas l'attendre
+        self.max_buffer = max_buffer
+        self._clients: Dict[int, asyncio.StreamWriter] = {}
+        self._handlers = set()
+        self._ids = itertools.count(1)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.relayed = 0
+        self.dropped = 0
+        self.rejected = 0  # notes invalides (lame ou gamme inconnue)
+
+    async def start(self, host: str = "127.0.0.1", port: int = config.JAM_PORT) -> int:
+        """Ouvre le port d'écoute ; renvoie le port effectif (0 = choisi par le système)."""
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._clients.values()):
+                writer.close()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        client_id = next(self._ids)
+        self._clients[client_id] = writer
+        self._handlers.add(asyncio.current_task())
+        writer.write(MESSAGES[MSG_WELCOME].pack(MSG_WELCOME, client_id))
+        note = MESSAGES[MSG_NOTE]
+        try:
+            while True:
+                message = await read_message(reader)
+                kind = message[0]
+                if kind == MSG_PING:
+                    writer.write(MESSAGES[MSG_PONG].pack(MSG_PONG, message[1], self.clock()))
+                elif kind == MSG_NOTE:
+                    if not valid_note(message[2], message[4]):
+                        self.rejected += 1
+                        continue
+                    # L'identité de l'émetteur est imposée par le serveur
+                    packet = note.pack(MSG_NOTE, client_id, *message[2:])
+                    for other_id, other in self._clients.items():
+                        if other_id == client_id:
+                            continue
+                        if other.transport.get_write_buffer_size() > self.max_buffer:
+                            self.dropped += 1
+                        else:
+                            other.write(packet)
+                            self.relayed += 1
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self._clients.pop(client_id, None)
+            self._handlers.discard(asyncio.current_task())
+            writer.close()
+
+
+# ============================================================================
+# CLIENT
+# ============================================================================
+
+class JamClient:
+    """Participant d'une session.
+
+    Les notes reçues sont rejouées à leur échéance par `on_note(émetteur,
+    lame, vélocité, gamme)` ; par défaut elles sont rendues par le moteur
+    `core` (sa banque locale). `send_note` peut être appelé depuis un autre
+    thread une fois le client lancé par `start`. `on_disconnect()` est
+    appelé (dans la boucle du client) si le serveur ferme la session.
+    """
+
+    PING_INTERVAL = 1.0
+
+    def __init__(
+        self,
+        core=None,
+        on_note: Optional[Callable[[int, int, int, str], None]] = None,
+        jitter: Optional[JitterBuffer] = None,
+        clock: Callable[[], int] = monotonic_us,
+        keep_latencies: bool = False,
+        on_disconnect: Optional[Callable[[], None]] = None
+    ):
+        self.core = core
+        self.on_note = on_note
+        self.on_disconnect = on_disconnect
+        self.jitter = jitter or JitterBuffer(config.JAM_MIN_DELAY_MS * 1000, config.JAM_MAX_DELAY_MS * 1000)
+        self.clock = clock
+        self.sync = ClockSync()
+        self.client_id: Optional[int] = None
+        self.sent = 0
+        self.arrived = 0
+        self.received = 0
+        self.rejected = 0
+        self._transit = [0.0, 0.0]  # somme, max (µs)
+        self.latencies: Optional[List[float]] = [] if keep_latencies else None
+        self._scales: Dict[str, list] = {}
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # Dans la boucle asyncio
+    # ------------------------------------------------------------------
+
+    async def connect(self, host: str = "127.0.0.1", port: int = config.JAM_PORT, pings: int = 5):
+        """Se connecte, synchronise l'horloge puis lance réception et rejeu."""
+        self._loop = asyncio.get_running_loop()
+        self._reader, self._writer = await asyncio.open_connection(host, port)
+        _, self.client_id = await read_message(self._reader)
+        for _ in range(pings):
+            self._writer.write(MESSAGES[MSG_PING].pack(MSG_PING, self.clock()))
+            message = await read_message(self._reader)
+            while message[0] != MSG_PONG:
+                # Notes reçues avant la synchronisation : ignorées
+                message = await read_message(self._reader)
+            self.sync.add(message[1], message[2], self.clock())
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._receive()),
+            asyncio.create_task(self._playout()),
+            asyncio.create_task(self._ping()),
+        ]
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def send_note(self, key: int, velocity: int = 127, scale: str = "pentatonic"):
+        """Diffuse une note jouée localement (à appeler dans la boucle)."""
+        if self._writer is None:
+            return
+        session_time = int(self.clock() + self.sync.offset)
+        self._writer.write(MESSAGES[MSG_NOTE].pack(
+            MSG_NOTE, 0, key, velocity, SCALE_IDS.index(scale), session_time
+        ))
+        self.sent += 1
+
+    async def _receive(self):
+        try:
+            while True:
+                message = await read_message(self._reader)
+                kind = message[0]
+                if kind == MSG_NOTE:
+                    _, sender, key, velocity, scale_id, session_time = message
+                    if not valid_note(key, scale_id):
+                        # Un paquet malformé ne doit pas interrompre le rejeu
+                        self.rejected += 1
+                        continue
+                    now = self.clock()
+                    event_time = session_time - self.sync.offset
+                    transit = now - event_time
+                    self.arrived += 1
+                    self._transit[0] += transit
+                    self._transit[1] = max(self._transit[1], transit)
+                    self.jitter.push(event_time, now, (event_time, sender, key, velocity, scale_id))
+                    self._wakeup.set()
+                elif kind == MSG_PONG:
+                    self.sync.add(message[1], message[2], self.clock())
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        # Session fermée par le serveur : arrêter le rejeu et les pings
+        current = asyncio.current_task()
+        for task in self._tasks:
+            if task is not current:
+                task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self.on_disconnect is not None:
+            self.on_disconnect()
+
+    async def _playout(self):
+        """Rejoue les notes du tampon de gigue à leur échéance."""
+        while True:
+            self._wakeup.clear()
+            due = self.jitter.next_due()
+            if due is None:
+                await self._wakeup.wait()
+                continue
+            wait = (due - self.clock()) / 1e6
+            if wait > 0:
+                # Réveil anticipé si une note plus urgente arrive entre-temps
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            now = self.clock()
+            for _, (event_time, sender, key, velocity, scale_id) in self.jitter.pop_due(now):
+                self._play(sender, key, velocity, SCALE_IDS[scale_id])
+                self.received += 1
+                if self.latencies is not None:
+                    self.latencies.append(self.clock() - event_time)
+
+    async def _ping(self):
+        while True:
+            await asyncio.sleep(self.PING_INTERVAL)
+            self._writer.write(MESSAGES[MSG_PING].pack(MSG_PING, self.clock()))
+
+    def _play(self, sender: int, key: int, velocity: int, scale: str):
+        if self.core is not None:
+            if scale not in self._scales:
+                self._scales[scale] = self.core.build_balafon_scale(scale)
+            notes = self._scales[scale]
+            if 0 <= key < len(notes):
+                self.core.play_async(notes[key].frequency, velocity)
+        if self.on_note is not None:
+            self.on_note(sender, key, velocity, scale)
+
+    # ------------------------------------------------------------------
+    # Depuis un autre thread (interface)
+    # ------------------------------------------------------------------
+
+    def start(self, host: str, port: int = config.JAM_PORT, timeout: float = 5.0):
+        """Lance le client dans un thread dédié ; lève l'erreur de connexion."""
+        loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=loop.run_forever, name="jam", daemon=True)
+        self._thread.start()
+        try:
+            asyncio.run_coroutine_threadsafe(self.connect(host, port), loop).result(timeout)
+        except Exception:
+            loop.call_soon_threadsafe(loop.stop)
+            self._thread.join(timeout=1.0)
+            self._thread = None
+            raise
+
+    def send_note_threadsafe(self, key: int, velocity: int = 127, scale: str = "pentatonic"):
+        if self._loop is not None and self._thread is not None:
+            self._loop.call_soon_threadsafe(self.send_note, key, velocity, scale)
+
+    def stop(self):
+        if self._thread is None:
+            return
+        loop = self._loop
+        asyncio.run_coroutine_threadsafe(self.close(), loop).result(timeout=1.0)
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(timeout=1.0)
+        self._thread = None
+
+    def stats(self) -> dict:
+        arrived = self.arrived
+        return {
+            "client_id": self.client_id,
+            "sent": self.sent,
+            "received": self.received,
+            "late": self.jitter.late,
+            "offset_us": self.sync.offset,
+            "rtt_us": self.sync.rtt,
+            "jitter_us": self.jitter.jitter_us,
+            "delay_us": self.jitter.delay_us,
+            "transit_mean_us": self._transit[0] / arrived if arrived else 0.0,
+            "transit_max_us": self._transit[1],
+        }
+
+
+# ============================================================================
+# BANC D'ESSAI LOCAL
+# ============================================================================
+
+async def benchmark(clients: int = 8, notes: int = 200, rate: float = 200.0,
+                    jitter_delay_ms: float = config.JAM_MIN_DELAY_MS, timeout: float = 30.0) -> dict:
+    """Session locale simulée : débit d'événements et latence de bout en bout.
+
+    Chaque client envoie `notes` notes à `rate` notes/s ; toutes doivent
+    être rejouées par les `clients - 1` autres. Le tampon de gigue est fixé
+    à `jitter_delay_ms` : la latence de rejeu vaut ce délai tant que le
+    transit (mesuré à part) reste en dessous.
+    """
+    server = JamServer()
+    port = await server.start("127.0.0.1", 0)
+    delay_us = int(jitter_delay_ms * 1000)
+    members = [
+        JamClient(jitter=JitterBuffer(delay_us, max(delay_us, 1)), keep_latencies=True)
+        for _ in range(clients)
+    ]
+    for member in members:
+        await member.connect("127.0.0.1", port)
+
+    expected = clients * (clients - 1) * notes
+
+    async def play(member: JamClient, seed: int):
+        rng = np.random.default_rng(seed)
+        for _ in range(notes):
+            member.send_note(int(rng.integers(22)), int(rng.integers(1, 128)))
+            await asyncio.sleep(1.0 / rate)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(play(member, i) for i, member in enumerate(members)))
+    deadline = start + timeout
+    while sum(m.received for m in members) < expected and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+
+    for member in members:
+        await member.close()
+    await server.close()
+
+    latencies = np.concatenate([np.asarray(m.latencies, dtype=np.float64) for m in members]) / 1000.0
+    delivered = sum(m.received for m in members)
+    arrived = sum(m.arrived for m in members)
+    return {
+        "clients": clients,
+        "expected": expected,
+        "delivered": delivered,
+        "events_per_s": delivered / elapsed,
+        "latency_mean_ms": float(latencies.mean()) if len(latencies) else 0.0,
+        "latency_p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+        "transit_mean_ms": sum(m._transit[0] for m in members) / arrived / 1000.0 if arrived else 0.0,
+        "transit_max_ms": max(m._transit[1] for m in members) / 1000.0,
+        "late": sum(m.jitter.late for m in members),
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Serveur de session Symphony et banc d'essai local.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="Lance un serveur de session")
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=config.JAM_PORT)
+    bench = commands.add_parser("bench", help="Mesure débit et latence avec des clients simulés")
+    bench.add_argument("--clients", type=int, default=8)
+    bench.add_argument("--notes", type=int, default=200)
+    bench.add_argument("--rate", type=float, default=200.0, help="Notes/s par client")
+    bench.add_argument("--delay-ms", type=float, default=config.JAM_MIN_DELAY_MS, help="Délai du tampon de gigue")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        async def serve_forever():
+            server = JamServer()
+            port = await server.start(args.host, args.port)
+            print(f"Session ouverte sur {args.host}:{port}")
+            await asyncio.Event().wait()
+        try:
+            asyncio.run(serve_forever())
+        except KeyboardInterrupt:
+            pass
+    else:
+        report = asyncio.run(benchmark(args.clients, args.notes, args.rate, args.delay_ms))
+        print(f"{report['delivered']}/{report['expected']} notes rejouées, "
+              f"{report['events_per_s']:.0f} événements/s")
+        print(f"transit moyen {report['transit_mean_ms']:.2f} ms, max {report['transit_max_ms']:.2f} ms")
+        print(f"rejeu moyen {report['latency_mean_ms']:.2f} ms, "
+              f"p99 {report['latency_p99_ms']:.2f} ms, {report['late']} en retard")
+
+
+if __name__ == "__main__":
+    main()
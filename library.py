@@ -0,0 +1,256 @@
+"""Bibliothèque d'enregistrements de Symphony.
+
+Stockage compressé des prises, export en tâche de fond, métadonnées de
+fichier mises en cache et réconciliation avec le dossier des prises.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+try:
+    import soundfile as sf
+except (ImportError, OSError):
+    sf = None
+
+import config
+from analysis import LoudnessMeter
+
+# Format de sortie -> (format libsndfile, sous-type)
+EXPORT_FORMATS = {
+    "wav": ("WAV", "PCM_16"),
+    "flac": ("FLAC", "PCM_16"),
+    "ogg": ("OGG", "VORBIS"),
+}
+
+# Taille des blocs de transcodage (modeste : l'encodeur Vorbis n'aime pas
+# les écritures trop longues)
+BLOCK_FRAMES = 8192
+
+
+# Caractères interdits dans un nom de fichier (Windows inclus) et noms réservés
+_UNSAFE_CHARS = re.compile(r'[\x00-\x1f<>:"/\\|?*]+')
+_RESERVED_NAMES = {"CON", "PRN", "AUX", "NUL"} | {f"{p}{i}" for p in ("COM", "LPT") for i in range(1, 10)}
+
+
+def safe_file_stem(name: str, fallback: str = "enregistrement", max_length: int = 100) -> str:
+    """Nom libre (saisi par l'utilisateur) ramené à un nom de fichier sûr, sans extension.
+
+    Séparateurs, `..` et caractères invalides sous Windows sont remplacés :
+    le fichier reste dans le dossier choisi, sur tout système.
+    """
+    stem = _UNSAFE_CHARS.sub("_", name or "").strip(" .")[:max_length].rstrip(" .")
+    if not stem:
+        return fallback
+    if stem.split(".")[0].upper() in _RESERVED_NAMES:
+        stem = f"_{stem}"
+    return stem
+
+
+@dataclass
+class ExportJob:
+    """Un fichier à transcoder (`frames` : longueur en cache, sinon lue par le pool)."""
+    src: str
+    dst: str
+    fmt: str = "wav"
+    frames: Optional[int] = None
+
+
+@dataclass
+class ScanReport:
+    """Résultat de la réconciliation base / dossier des enregistrements."""
+    missing: List[int] = field(default_factory=list)    # IDs sans fichier
+    orphans: List[str] = field(default_factory=list)    # fichiers sans ligne en base
+    refreshed: List[int] = field(default_factory=list)  # métadonnées recalculées
+    measured: List[int] = field(default_factory=list)   # sonie mesurée
+
+    @property
+    def clean(self) -> bool:
+        return not (self.missing or self.orphans or self.refreshed or self.measured)
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """Empreinte SHA-256 du contenu d'un fichier, lue par morceaux."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def probe_file(path: str, with_hash: bool = True) -> Optional[dict]:
+    """Métadonnées d'un fichier audio (en-tête seulement, sans décodage)."""
+    if sf is None:
+        return None
+    try:
+        info = sf.info(path)
+        stat = os.stat(path)
+    except Exception as e:
+        print(f"Erreur lecture métadonnées {path}: {e}")
+        return None
+    metadata = {
+        "sample_rate": info.samplerate,
+        "frames": info.frames,
+        "channels": info.channels,
+        "codec": f"{info.format}/{info.subtype}",
+        "file_size": stat.st_size,
+        "mtime": stat.st_mtime,
+    }
+    if with_hash:
+        metadata["content_hash"] = file_hash(path)
+    return metadata
+
+
+def scan_library(db, recordings_dir: str = config.RECORDINGS_DIR, measure_loudness: bool = True) -> ScanReport:
+    """Réconcilie la table recordings avec le dossier, en masse.
+
+    Les fichiers disparus sont marqués `missing`, ceux dont la taille ou la
+    date a changé (ou jamais sondés) voient leurs métadonnées recalculées,
+    et les fichiers inconnus de la base sont signalés comme orphelins. La
+    sonie des prises jamais mesurées (ou dont le contenu a changé) est
+    ensuite mesurée en flux, hors du thread de l'interface.
+    """
+    report = ScanReport()
+    rows = db.get_all_recordings()
+    known = set()
+    present, updates, to_measure = [], [], []
+
+    for row in rows:
+        path = row['filename']
+        known.add(os.path.normcase(os.path.abspath(path)))
+        try:
+            stat = os.stat(path)
+        except OSError:
+            report.missing.append(row['id'])
+            continue
+        present.append(row['id'])
+        stale = row['loudness'] is None
+        if row['file_size'] != stat.st_size or row['mtime'] != stat.st_mtime:
+            metadata = probe_file(path)
+            if metadata is not None:
+                if metadata["content_hash"] != row['content_hash']:
+                    # Contenu modifié : l'ancienne sonie ne vaut plus
+                    metadata.update(loudness=None, true_peak=None)
+                    stale = True
+                updates.append((row['id'], metadata))
+                report.refreshed.append(row['id'])
+        if stale:
+            to_measure.append((row['id'], path))
+
+    if os.path.isdir(recordings_dir):
+        for entry in os.scandir(recordings_dir):
+            if not entry.is_file() or entry.name.endswith(".part"):
+                continue
+            if os.path.normcase(os.path.abspath(entry.path)) not in known:
+                report.orphans.append(entry.path)
+
+    db.update_recordings_metadata(updates)
+    db.set_recordings_missing(report.missing, present)
+
+    if measure_loudness:
+        measured = []
+        for recording_id, path in to_measure:
+            loudness = LoudnessMeter.measure_file(path)
+            if loudness is not None:
+                measured.append((recording_id, loudness))
+                report.measured.append(recording_id)
+        db.update_recordings_metadata(measured)
+    return report
+
+
+def recording_path(user_id: int, timestamp: int, fmt: Optional[str] = None) -> str:
+    """Chemin d'une nouvelle prise dans le dossier des enregistrements."""
+    fmt = fmt or config.RECORDING_FORMAT
+    return os.path.join(config.RECORDINGS_DIR, f"rec_{user_id}_{timestamp}.{fmt}")
+
+
+def transcode(
+    src: str,
+    dst: str,
+    fmt: str = "wav",
+    progress: Optional[Callable[[int], None]] = None
+) -> bool:
+    """Convertit un fichier audio en flux, bloc par bloc.
+
+    `progress` reçoit le nombre de frames traitées depuis le dernier appel.
+    """
+    if sf is None:
+        return False
+    file_format, subtype = EXPORT_FORMATS[fmt]
+    tmp_path = f"{dst}.part"
+    try:
+        with sf.SoundFile(src) as reader:
+            with sf.SoundFile(
+                tmp_path, "w", reader.samplerate, reader.channels,
+                format=file_format, subtype=subtype
+            ) as writer:
+                for block in reader.blocks(BLOCK_FRAMES, dtype="float32"):
+                    writer.write(block)
+                    if progress is not None:
+                        progress(len(block))
+        os.replace(tmp_path, dst)
+        return True
+    except Exception as e:
+        print(f"Erreur transcodage {src}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+
+class ExportPool:
+    """Pool de transcodage en arrière-plan avec progression agrégée."""
+
+    def __init__(self, workers: int = config.EXPORT_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export")
+
+    def submit(
+        self,
+        jobs: List[ExportJob],
+        progress: Optional[Callable[[int, int], None]] = None,
+        done: Optional[Callable[[List[tuple]], None]] = None
+    ):
+        """Lance les exports ; `progress(frames_faites, frames_totales)`.
+
+        `done` reçoit la liste des (job, succès) une fois tout terminé.
+        Les callbacks sont appelés depuis les threads du pool. Rien n'est lu
+        sur le thread appelant : les longueurs inconnues (`frames` à None)
+        sont lues par les threads du pool et ajoutées au total à ce moment.
+        """
+        state = {"frames": 0, "total": sum(job.frames or 0 for job in jobs), "remaining": len(jobs)}
+        results = [None] * len(jobs)
+        lock = threading.Lock()
+
+        def on_frames(frames: int):
+            with lock:
+                state["frames"] += frames
+                current, total = state["frames"], state["total"]
+            if progress is not None:
+                progress(current, total)
+
+        def run(index: int, job: ExportJob):
+            if job.frames is None and sf is not None and os.path.exists(job.src):
+                try:
+                    frames = sf.info(job.src).frames
+                except Exception:
+                    frames = 0
+                with lock:
+                    state["total"] += frames
+            ok = transcode(job.src, job.dst, job.fmt, on_frames)
+            with lock:
+                results[index] = (job, ok)
+                state["remaining"] -= 1
+                finished = state["remaining"] == 0
+            if finished and done is not None:
+                done(results)
+            return ok
+
+        if not jobs and done is not None:
+            done([])
+        return [self._executor.submit(run, i, job) for i, job in enumerate(jobs)]
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
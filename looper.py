@@ -0,0 +1,238 @@
+"""Looper multipiste : couches superposées jouées en boucle.
+
+Chaque couche est un tampon float32 de la longueur de la boucle, alloué
+une fois pour toutes : la mémoire vaut couches x longueur x 4 octets, quel
+que soit le jeu. Le mixeur somme les couches actives dans son callback
+(un produit matrice-vecteur par bloc) et écrit, juste après la lecture,
+les notes captées dans la couche en cours d'enregistrement : ce qui vient
+d'être joué n'est relu qu'au tour suivant, jamais en double.
+"""
+
+import os
+from collections import deque
+from typing import Callable, Optional
+
+import numpy as np
+
+import config
+from library import BLOCK_FRAMES, EXPORT_FORMATS
+
+try:
+    import soundfile as sf
+except (ImportError, OSError):
+    sf = None
+
+
+class Looper:
+    """Boucle de `loop_frames` frames à `max_layers` couches préallouées."""
+
+    def __init__(self, sample_rate: int, loop_frames: int, max_layers: int = 16, origin_frame: int = 0):
+        self.sample_rate = sample_rate
+        self.max_layers = max_layers
+        self.gains = np.ones(max_layers, dtype=np.float32)
+        self.muted = np.zeros(max_layers, dtype=bool)
+        self.used = np.zeros(max_layers, dtype=bool)
+        # Notes à écrire dans une couche, déposées par les threads de jeu
+        self._captures = deque()
+        # Commandes de l'interface (effacer, changer de longueur), appliquées
+        # par le thread audio en tête de bloc : il reste seul à écrire les voix
+        self._commands = deque()
+        # Voix en cours d'écriture [données, gain, position, couche], thread audio
+        self._voices = []
+        self._record_layer: Optional[int] = None
+        self._record_remaining = 0
+        self._scratch = np.zeros(BLOCK_FRAMES, dtype=np.float32)
+        self.set_length(loop_frames, origin_frame)
+
+    # ------------------------------------------------------------------
+    # Configuration (thread de l'interface)
+    # ------------------------------------------------------------------
+
+    def set_length(self, loop_frames: int, origin_frame: int = 0):
+        """Change la longueur de la boucle ; les couches sont effacées.
+
+        `origin_frame` (horloge du mixeur) est le début de la boucle, par
+        exemple un début de mesure du métronome.
+        """
+        self._record_layer = None
+        self.used[:] = False
+        self._update_mix()
+        self.origin_frame = origin_frame
+        # Remplacement atomique : le thread audio lit l'ancien ou le nouveau tampon
+        self.buffers = np.zeros((self.max_layers, max(1, int(loop_frames))), dtype=np.float32)
+        # Les voix en cours visaient l'ancien tampon : abandonnées par le thread audio
+        self._commands.append(("reset", None))
+
+    @property
+    def loop_frames(self) -> int:
+        return self.buffers.shape[1]
+
+    def _update_mix(self):
+        """Recalcule les gains effectifs (0 pour une couche vide ou muette)."""
+        mix = np.where(self.used & ~self.muted, self.gains, 0).astype(np.float32)
+        active = np.flatnonzero(mix)
+        # Seules les couches jusqu'à la dernière active sont sommées
+        self._mix = mix[:active[-1] + 1] if len(active) else mix[:0]
+
+    def set_gain(self, layer: int, gain: float):
+        self.gains[layer] = gain
+        self._update_mix()
+
+    def set_muted(self, layer: int, muted: bool):
+        self.muted[layer] = muted
+        self._update_mix()
+
+    def clear(self, layer: int):
+        """Efface une couche (elle redevient libre)."""
+        if self._record_layer == layer:
+            self.stop_recording()
+        self.used[layer] = False
+        self._update_mix()
+        # Voix et tampon appartiennent au thread audio : effacement en tête du
+        # prochain bloc, pour que ni une queue de note ni un bloc en cours ne
+        # réécrivent dans la couche effacée
+        self._commands.append(("clear", layer))
+
+    def record(self, layer: Optional[int] = None) -> Optional[int]:
+        """Enregistre pendant un tour de boucle, sur une couche libre ou en overdub.
+
+        Renvoie la couche enregistrée, ou None si toutes sont occupées.
+        """
+        if layer is None:
+            free = np.flatnonzero(~self.used)
+            if len(free) == 0:
+                return None
+            layer = int(free[0])
+        self.used[layer] = True
+        self._update_mix()
+        self._record_remaining = self.loop_frames
+        self._record_layer = layer
+        return layer
+
+    def stop_recording(self):
+        self._record_layer = None
+
+    @property
+    def recording_layer(self) -> Optional[int]:
+        return self._record_layer
+
+    @property
+    def writing(self) -> bool:
+        """Vrai tant qu'une couche enregistre ou reçoit encore des queues de notes."""
+        return self._record_layer is not None or bool(self._voices)
+
+    def capture(self, sample, gain: float = 1.0):
+        """Dépose une note jouée ; écrite dans la couche si elle enregistre."""
+        if self._record_layer is None:
+            return
+        if isinstance(sample, np.ndarray):
+            data, scale = sample, 1.0
+        else:
+            data, scale = sample.data, sample.scale
+        self._captures.append((data, float(scale) * float(gain)))
+
+    # ------------------------------------------------------------------
+    # Thread audio
+    # ------------------------------------------------------------------
+
+    def _apply_commands(self):
+        """Applique les commandes de l'interface, dans l'ordre où elles ont été émises."""
+        while self._commands:
+            command, layer = self._commands.popleft()
+            if command == "clear":
+                # Les queues de notes destinées à cette couche ne doivent plus y écrire
+                self._voices = [v for v in self._voices if v[3] != layer]
+                self.buffers[layer] = 0.0
+            elif command == "reset":
+                self._voices = []
+
+    def render(self, out: np.ndarray, frame: int):
+        """Ajoute les couches à `out` (bloc commençant à la frame `frame`)."""
+        self._apply_commands()
+        buffers, mix = self.buffers, self._mix
+        length = buffers.shape[1]
+        layer = self._record_layer
+        while self._captures:
+            data, gain = self._captures.popleft()
+            if layer is not None:
+                self._voices.append([data, gain, 0, layer])
+
+        frames = len(out)
+        if len(self._scratch) < frames:
+            self._scratch = np.zeros(frames, dtype=np.float32)
+        scratch = self._scratch
+        position = (frame - self.origin_frame) % length
+        done = 0
+        while done < frames:
+            n = min(frames - done, length - position)
+            if len(mix):
+                np.dot(mix, buffers[:len(mix), position:position + n], out=scratch[:n])
+                out[done:done + n] += scratch[:n]
+            # Écriture après lecture : la note ne sera relue qu'au tour suivant
+            for voice in self._voices:
+                data, gain, pos, target = voice
+                chunk = data[pos:pos + n]
+                np.multiply(chunk, np.float32(gain), out=scratch[:len(chunk)], dtype=np.float32)
+                buffers[target, position:position + len(chunk)] += scratch[:len(chunk)]
+                voice[2] = pos + len(chunk)
+            done += n
+            position = (position + n) % length
+
+        # Les queues des notes continuent d'être écrites après la fin du tour
+        self._voices = [v for v in self._voices if v[2] < len(v[0])]
+        if layer is not None:
+            self._record_remaining -= frames
+            if self._record_remaining <= 0 and self._record_layer == layer:
+                self._record_layer = None
+
+    # ------------------------------------------------------------------
+    # Mixage final
+    # ------------------------------------------------------------------
+
+    def mixdown_blocks(self, cycles: int = 1, block_frames: int = BLOCK_FRAMES):
+        """Somme des couches actives, bloc par bloc, sur `cycles` tours."""
+        buffers, mix = self.buffers, self._mix
+        for _ in range(cycles):
+            for start in range(0, buffers.shape[1], block_frames):
+                segment = buffers[:len(mix), start:start + block_frames]
+                yield mix @ segment if len(mix) else np.zeros(segment.shape[1], dtype=np.float32)
+
+    def mixdown(self, path: str, cycles: int = 1, fmt: str = config.RECORDING_FORMAT,
+                on_block: Optional[Callable[[np.ndarray], None]] = None, mixer=None) -> bool:
+        """Écrit la boucle mixée dans un fichier, en flux (jamais matérialisée).
+
+        Avec `mixer`, chaque bloc passe par la chaîne du bus maître (effets,
+        volume, limiteur) : le fichier sonne comme la lecture. `on_block`
+        reçoit chaque bloc écrit : les analyses (vignette, sonie) portent
+        ainsi exactement sur l'audio du fichier. Refusé tant que la boucle
+        est en cours d'écriture (`writing`).
+        """
+        if sf is None or self.writing:
+            return False
+        file_format, subtype = EXPORT_FORMATS[fmt]
+        tmp_path = f"{path}.part"
+        try:
+            with sf.SoundFile(tmp_path, "w", self.sample_rate, 1, format=file_format, subtype=subtype) as writer:
+                blocks = self.mixdown_blocks(cycles)
+                if mixer is not None:
+                    blocks = mixer.master_blocks(blocks)
+                for block in blocks:
+                    writer.write(block)
+                    if on_block is not None:
+                        on_block(block)
+            os.replace(tmp_path, path)
+            return True
+        except Exception as e:
+            print(f"Erreur mixage de la boucle: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+    def stats(self) -> dict:
+        return {
+            "loop_frames": self.loop_frames,
+            "layers": int(self.used.sum()),
+            "active_layers": int(np.count_nonzero(self._mix)),
+            "recording": self._record_layer,
+            "memory_bytes": int(self.buffers.nbytes),
+        }
@@ -0,0 +1,309 @@
+"""Import/export de fichiers MIDI standard (SMF) pour Symphony.
+
+L'export écrit les performances enregistrées (séquences d'événements) en
+SMF format 0. L'import lit les notes en flux, piste par piste, et les
+projette sur les 22 lames de l'échelle courante par quantification à la
+note la plus proche. Utilisable sans interface :
+
+    python midi_io.py morceaux/*.mid -o rendus/ --scale pentatonic
+"""
+
+import argparse
+import heapq
+import math
+import mmap
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, NamedTuple, Optional
+
+import numpy as np
+
+from performance import EVENT_DTYPE, MAX_VELOCITY, SCALE_IDS, render_events
+
+DEFAULT_PPQ = 480
+DEFAULT_TEMPO_US = 500000  # 120 BPM
+
+# Priorité des événements simultanés lors de la fusion des pistes
+_TEMPO, _NOTE_ON = 0, 1
+
+
+class MidiNote(NamedTuple):
+    """Note-on lue dans un fichier MIDI."""
+    time_us: int
+    note: int
+    velocity: int
+    channel: int
+
+
+def frequency_to_midi(frequency: float) -> float:
+    """Numéro de note MIDI (fractionnaire) d'une fréquence."""
+    return 69 + 12 * math.log2(frequency / 440.0)
+
+
+def nearest_keys(midi_notes: np.ndarray, notes: list) -> np.ndarray:
+    """Indice de la lame la plus proche (en demi-tons) pour chaque note MIDI."""
+    key_pitches = np.array([frequency_to_midi(n.frequency) for n in notes])
+    midi_notes = np.asarray(midi_notes, dtype=np.float64)
+    return np.abs(midi_notes[:, np.newaxis] - key_pitches[np.newaxis, :]).argmin(axis=1)
+
+
+# ============================================================================
+# EXPORT
+# ============================================================================
+
+def _vlq(value: int) -> bytes:
+    """Encode une quantité à longueur variable."""
+    out = [value & 0x7F]
+    value >>= 7
+    while value:
+        out.append(0x80 | (value & 0x7F))
+        value >>= 7
+    return bytes(reversed(out))
+
+
+def write_midi(events: np.ndarray, path: str, core, ppq: int = DEFAULT_PPQ,
+               tempo_us: int = DEFAULT_TEMPO_US) -> bool:
+    """Écrit une performance en SMF format 0.
+
+    Une note rejouée avant la fin de sa durée est coupée à la nouvelle
+    frappe : sans cela, son 0x80 tomberait après le 0x90 suivant et
+    éteindrait la note rejouée.
+    """
+    scales = {}
+    notes = []  # (tick début, tick fin, note, vélocité)
+    for event in events:
+        scale = SCALE_IDS[event["scale_id"]]
+        if scale not in scales:
+            scales[scale] = core.build_balafon_scale(scale)
+        note = int(round(frequency_to_midi(scales[scale][event["key"]].frequency)))
+        note = max(0, min(127, note))
+        on_tick = int(round(int(event["onset_us"]) * ppq / tempo_us))
+        off_tick = on_tick + max(1, int(round(float(event["duration"]) * 1e6 * ppq / tempo_us)))
+        velocity = max(1, min(127, int(event["velocity"])))
+        notes.append((on_tick, off_tick, note, velocity))
+    notes.sort(key=lambda n: n[0])
+
+    messages = []  # (tick, ordre, octets) ; à tick égal le 0x80 passe avant le 0x90
+    next_on = {}
+    for on_tick, off_tick, note, velocity in reversed(notes):
+        off_tick = min(off_tick, next_on.get(note, off_tick))
+        next_on[note] = on_tick
+        messages.append((on_tick, 1, bytes([0x90, note, velocity])))
+        messages.append((off_tick, 0, bytes([0x80, note, 0])))
+    messages.sort(key=lambda m: (m[0], m[1]))
+
+    track = bytearray()
+    track += _vlq(0) + b"\xFF\x51\x03" + tempo_us.to_bytes(3, "big")
+    last_tick = 0
+    for tick, _, message in messages:
+        track += _vlq(tick - last_tick) + message
+        last_tick = tick
+    track += _vlq(0) + b"\xFF\x2F\x00"
+
+    try:
+        with open(path, "wb") as f:
+            f.write(b"MThd" + struct.pack(">IHHH", 6, 0, 1, ppq))
+            f.write(b"MTrk" + struct.pack(">I", len(track)) + bytes(track))
+        return True
+    except OSError as e:
+        print(f"Erreur écriture MIDI: {e}")
+        return False
+
+
+# ============================================================================
+# IMPORT (FLUX)
+# ============================================================================
+
+def _read_vlq(data, pos: int):
+    value = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return value, pos
+
+
+def _iter_track(data, start: int, end: int) -> Iterator[tuple]:
+    """Événements utiles d'une piste : (tick, priorité, type, valeurs)."""
+    pos, tick, status = start, 0, 0
+    while pos < end:
+        delta, pos = _read_vlq(data, pos)
+        tick += delta
+        byte = data[pos]
+        if byte & 0x80:
+            status = byte
+            pos += 1
+        elif status == 0:
+            raise ValueError("Running status sans statut précédent")
+
+        if status == 0xFF:
+            meta_type = data[pos]
+            length, pos = _read_vlq(data, pos + 1)
+            if meta_type == 0x51 and length == 3:
+                yield tick, _TEMPO, "tempo", int.from_bytes(data[pos:pos + 3], "big")
+            elif meta_type == 0x2F:
+                return
+            pos += length
+            status = 0
+        elif status in (0xF0, 0xF7):
+            length, pos = _read_vlq(data, pos)
+            pos += length
+            status = 0
+        else:
+            kind = status & 0xF0
+            if kind in (0xC0, 0xD0):
+                pos += 1
+            else:
+                if kind == 0x90 and data[pos + 1] > 0:
+                    yield tick, _NOTE_ON, "note", (data[pos], data[pos + 1], status & 0x0F)
+                pos += 2
+
+
+def iter_midi_notes(path: str) -> Iterator[MidiNote]:
+    """Lit les note-on d'un fichier MIDI en flux, dans l'ordre temporel.
+
+    Le fichier est mappé en mémoire et chaque piste est décodée par un
+    générateur ; les pistes sont fusionnées à la volée (tempo compris),
+    sans jamais matérialiser la liste complète des événements.
+    """
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:4] != b"MThd":
+                raise ValueError(f"Fichier MIDI invalide: {path}")
+            header_len, _, n_tracks, division = struct.unpack(">IHHH", data[4:14])
+            pos = 8 + header_len
+
+            if division & 0x8000:
+                # Division SMPTE : durée d'un tick fixe
+                fps = 256 - (division >> 8)
+                us_per_tick_fixed = 1e6 / (fps * (division & 0xFF))
+                ppq = None
+            else:
+                ppq = division
+                us_per_tick_fixed = None
+
+            tracks = []
+            while pos + 8 <= len(data) and len(tracks) < n_tracks:
+                chunk_type = data[pos:pos + 4]
+                (length,) = struct.unpack(">I", data[pos + 4:pos + 8])
+                if chunk_type == b"MTrk":
+                    tracks.append(_iter_track(data, pos + 8, min(pos + 8 + length, len(data))))
+                pos += 8 + length
+
+            tempo = DEFAULT_TEMPO_US
+            last_tick, last_us = 0, 0.0
+            for tick, _, kind, value in heapq.merge(*tracks, key=lambda e: (e[0], e[1])):
+                us_per_tick = us_per_tick_fixed or tempo / ppq
+                last_us += (tick - last_tick) * us_per_tick
+                last_tick = tick
+                if kind == "tempo":
+                    tempo = value
+                else:
+                    note, velocity, channel = value
+                    yield MidiNote(int(round(last_us)), note, velocity, channel)
+
+
+def import_midi(path: str, core, scale: str = "pentatonic",
+                duration: Optional[float] = None, skip_drums: bool = True) -> np.ndarray:
+    """Convertit un fichier MIDI en séquence d'événements sur les 22 lames."""
+    notes = core.build_balafon_scale(scale)
+    duration = core.duration if duration is None else duration
+    scale_id = SCALE_IDS.index(scale)
+
+    chunk_size = 4096
+    chunks: List[np.ndarray] = []
+    pending = []
+
+    def flush():
+        if not pending:
+            return
+        chunk = np.zeros(len(pending), dtype=EVENT_DTYPE)
+        raw = np.array(pending, dtype=np.int64)
+        chunk["onset_us"] = raw[:, 0]
+        chunk["key"] = nearest_keys(raw[:, 1], notes)
+        chunk["velocity"] = np.clip(raw[:, 2], 1, MAX_VELOCITY)
+        chunk["scale_id"] = scale_id
+        chunk["duration"] = duration
+        chunks.append(chunk)
+        pending.clear()
+
+    for midi_note in iter_midi_notes(path):
+        if skip_drums and midi_note.channel == 9:
+            continue
+        pending.append((midi_note.time_us, midi_note.note, midi_note.velocity))
+        if len(pending) >= chunk_size:
+            flush()
+    flush()
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=EVENT_DTYPE)
+
+
+def play_midi(path: str, core, scale: str = "pentatonic") -> bool:
+    """Joue un fichier MIDI via le mixeur du moteur."""
+    events = import_midi(path, core, scale)
+    if len(events) == 0:
+        return False
+    core.mixer.trigger(render_events(events, core))
+    return core.mixer.start()
+
+
+# ============================================================================
+# CONVERSION PAR LOTS
+# ============================================================================
+
+def _attach_bank(descriptor):
+    """Initialisation d'un processus du pool : banque partagée, sans resynthèse."""
+    from core import audio_core
+    audio_core.attach_bank(descriptor)
+
+
+def _convert_one(args) -> tuple:
+    """Tâche d'un processus du pool : MIDI -> fichier audio."""
+    path, out_dir, fmt, scale = args
+    from core import audio_core
+    try:
+        events = import_midi(path, audio_core, scale)
+        audio = render_events(events, audio_core, tail=audio_core.duration)
+        name = os.path.splitext(os.path.basename(path))[0]
+        out_path = os.path.join(out_dir, f"{name}.{fmt}")
+        return path, out_path if audio_core.save_recording(audio, out_path) else None
+    except Exception as e:
+        print(f"Erreur conversion {path}: {e}")
+        return path, None
+
+
+def convert_batch(paths: List[str], out_dir: str, fmt: str = "flac",
+                  scale: str = "pentatonic", workers: Optional[int] = None) -> List[tuple]:
+    """Rend un corpus de fichiers MIDI en parallèle (un processus par cœur)."""
+    from core import audio_core
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [(path, out_dir, fmt, scale) for path in paths]
+    # Banque publiée une fois en mémoire partagée ; les processus s'y attachent
+    bank = audio_core.publish_bank([n.frequency for n in audio_core.build_balafon_scale(scale)])
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach_bank, initargs=(bank,)) as pool:
+            return list(pool.map(_convert_one, jobs))
+    finally:
+        audio_core.release_shared_banks()
+
+
+def main(argv: Optional[List[str]] = None):
+    """Conversion MIDI -> audio en ligne de commande."""
+    parser = argparse.ArgumentParser(description="Rend des fichiers MIDI sur le balafon Symphony.")
+    parser.add_argument("paths", nargs="+", help="Fichiers .mid à convertir")
+    parser.add_argument("-o", "--out-dir", default="rendus")
+    parser.add_argument("-f", "--format", default="flac", choices=["wav", "flac", "ogg"])
+    parser.add_argument("-s", "--scale", default="pentatonic", choices=SCALE_IDS)
+    parser.add_argument("-j", "--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    results = convert_batch(args.paths, args.out_dir, args.format, args.scale, args.workers)
+    failed = [path for path, out in results if out is None]
+    print(f"{len(results) - len(failed)} fichier(s) rendu(s), {len(failed)} échec(s)")
+    for path in failed:
+        print(f"  échec: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""Mixeur audio temps réel de Symphony.
+
+Somme les voix actives bloc par bloc dans le callback du flux de sortie,
+ce qui permet la polyphonie (plusieurs lames qui résonnent ensemble).
+"""
+
+import copy
+import threading
+import time
+from collections import deque
+from typing import Iterable, Iterator, Optional
+import numpy as np
+
+from dsp import LookaheadLimiter, RingBuffer
+
+try:
+    import sounddevice as sd
+except (ImportError, OSError):
+    sd = None
+
+
+class Mixer:
+    """Mixeur polyphonique alimenté par une file de déclenchements."""
+
+    # Durée des rampes de gain (évite les clics lors des changements de volume)
+    GAIN_RAMP_TIME = 0.02
+
+    def __init__(
+        self,
+        sample_rate: int = 44100,
+        block_size: int = 256,
+        max_voices: int = 32,
+        gain: float = 1.0,
+        latency="low",
+        device=None
+    ):
+        self.sample_rate = sample_rate
+        # 0 laisse le pilote choisir une taille de bloc variable
+        self.block_size = block_size
+        self.latency = latency
+        self.device = device
+        self.max_voices = max_voices
+        self._gain = float(gain)
+        self._gain_target = float(gain)
+        self._gain_step = 0.0
+        # File de déclenchements : append/popleft sont atomiques, le thread
+        # audio n'attend jamais de verrou.
+        self._pending = deque()
+        # Voix actives [données, échelle, gain, position], propriété du thread audio ;
+        # une position négative est un départ différé dans un bloc à venir
+        self._voices = []
+        # Horloge : frames rendues depuis la création (base des événements planifiés)
+        self.frame_clock = 0
+        self._scratch = np.zeros(max(block_size, 1), dtype=np.float32)
+        # Copie de la sortie pour les visualiseurs (activée à la demande)
+        self.tap: Optional[RingBuffer] = None
+        # Traitements du bus maître : objets avec process(bloc) et render(signal)
+        self.effects = []
+        # Looper : couches en boucle sommées aux voix, avant les effets
+        self.looper = None
+        # Limiteur de crête en fin de chaîne (après le gain maître)
+        self.limiter: Optional[LookaheadLimiter] = None
+        self._stream = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "blocks": 0,
+            "voices_started": 0,
+            "voices_stolen": 0,
+            "peak_voices": 0,
+            "underruns": 0,
+            "callback_time_max_ms": 0.0,
+            "late_events": 0,
+        }
+
+    def set_effects(self, effects: list):
+        """Remplace la chaîne d'effets du bus maître (affectation atomique)."""
+        self.effects = list(effects)
+
+    def render_effects_offline(self, audio: np.ndarray) -> np.ndarray:
+        """Applique la chaîne du bus maître (effets puis limiteur) à un rendu complet."""
+        for effect in self.effects:
+            audio = effect.render(audio)
+        if self.limiter is not None:
+            audio = self.limiter.render(audio)
+        return audio
+
+    def master_blocks(self, blocks: Iterable[np.ndarray], gain: Optional[float] = None) -> Iterator[np.ndarray]:
+        """Applique en flux la chaîne du bus maître (effets, gain, limiteur) à un rendu hors ligne.
+
+        Même ordre que `render` ; les effets et le limiteur sont des copies
+        remises à zéro, l'état du flux temps réel n'est pas touché. La
+        latence du limiteur est compensée : la sortie a la longueur de
+        l'entrée. `gain` vaut par défaut le gain maître courant.
+        """
+        effects = [copy.deepcopy(effect) for effect in self.effects]
+        limiter = copy.deepcopy(self.limiter)
+        for processor in effects + ([limiter] if limiter is not None else []):
+            processor.reset()
+        gain = np.float32(self.gain if gain is None else gain)
+        skip = limiter.latency if limiter is not None else 0
+
+        def chain(block):
+            for effect in effects:
+                block = effect.process(block)
+            block = block * gain
+            return limiter.process(block) if limiter is not None else block
+
+        for block in blocks:
+            block = chain(np.asarray(block, dtype=np.float32))
+            drop = min(skip, len(block))
+            skip -= drop
+            if len(block) > drop:
+                yield block[drop:]
+        if limiter is not None and limiter.latency:
+            # Vidange de la ligne à retard du limiteur
+            tail = chain(np.zeros(limiter.latency, dtype=np.float32))[skip:]
+            if len(tail):
+                yield tail
+
+    def enable_tap(self, frames: int) -> RingBuffer:
+        """Active la copie de la sortie dans un tampon circulaire."""
+        if self.tap is None or self.tap.capacity < frames:
+            self.tap = RingBuffer(frames)
+        return self.tap
+
+    def set_gain(self, gain: float):
+        """Fixe le gain maître ; la transition se fait par une rampe linéaire."""
+        ramp_frames = max(1, int(self.GAIN_RAMP_TIME * self.sample_rate))
+        self._gain_step = abs(gain - self._gain) / ramp_frames
+        self._gain_target = float(gain)
+
+    @property
+    def gain(self) -> float:
+        return self._gain_target
+
+    def _apply_gain(self, out: np.ndarray):
+        """Applique le gain maître, en rampe si une transition est en cours."""
+        gain, target = self._gain, self._gain_target
+        if gain == target:
+            if gain != 1.0:
+                out *= np.float32(gain)
+            return
+        direction = 1.0 if target > gain else -1.0
+        ramp = gain + direction * self._gain_step * np.arange(1, len(out) + 1)
+        ramp = np.minimum(ramp, target) if direction > 0 else np.maximum(ramp, target)
+        out *= ramp
+        self._gain = float(ramp[-1]) if len(ramp) else gain
+
+    def trigger(self, sample, gain: float = 1.0, frame: Optional[int] = None):
+        """Planifie une voix ; `sample` est un tableau float32 ou un sample compact.
+
+        Sans `frame`, la voix démarre au prochain bloc ; sinon à cette frame
+        exacte de l'horloge du mixeur (`frame_clock`), même en milieu de bloc.
+        """
+        if isinstance(sample, np.ndarray):
+            data, scale = sample, 1.0
+        else:
+            data, scale = sample.data, sample.scale
+        self._pending.append((data, float(scale), float(gain), frame))
+
+    def _start_pending(self):
+        """Transfère les déclenchements en attente vers les voix actives."""
+        while self._pending:
+            data, scale, gain, frame = self._pending.popleft()
+            position = 0
+            if frame is not None:
+                position = self.frame_clock - frame
+                if position > 0:
+                    # Arrivé trop tard : joué tout de suite plutôt que tronqué
+                    self._stats["late_events"] += 1
+                    position = 0
+            self._voices.append([data, scale, gain, position])
+            self._stats["voices_started"] += 1
+        excess = len(self._voices) - self.max_voices
+        if excess > 0:
+            # Vol de voix : on coupe les plus anciennes
+            del self._voices[:excess]
+            self._stats["voices_stolen"] += excess
+        self._stats["peak_voices"] = max(self._stats["peak_voices"], len(self._voices))
+
+    def render(self, frames: int) -> np.ndarray:
+        """Calcule un bloc de sortie mono float32."""
+        self._start_pending()
+        out = np.zeros(frames, dtype=np.float32)
+        if len(self._scratch) < frames:
+            self._scratch = np.zeros(frames, dtype=np.float32)
+        scratch = self._scratch
+
+        for voice in self._voices:
+            data, scale, gain, pos = voice
+            offset = 0
+            if pos < 0:
+                # Départ planifié : décalage exact dans le bloc
+                if -pos >= frames:
+                    voice[3] = pos + frames
+                    continue
+                offset, pos = -pos, 0
+            chunk = data[pos:pos + frames - offset]
+            n = len(chunk)
+            target = out[offset:offset + n]
+            if chunk.dtype == np.float32 and scale * gain == 1.0:
+                target += chunk
+            else:
+                # Conversion int16 -> float32 faite ici, bloc par bloc
+                np.multiply(chunk, np.float32(scale * gain), out=scratch[:n], dtype=np.float32)
+                target += scratch[:n]
+            voice[3] = pos + n
+
+        self._voices = [v for v in self._voices if v[3] < len(v[0])]
+        looper = self.looper
+        if looper is not None:
+            looper.render(out, self.frame_clock)
+        for effect in self.effects:
+            out = effect.process(out)
+        self._apply_gain(out)
+        if self.limiter is not None:
+            out = self.limiter.process(out)
+        if self.tap is not None:
+            self.tap.write(out)
+        self._stats["blocks"] += 1
+        self.frame_clock += frames
+        return out
+
+    def _callback(self, outdata, frames, time_info, status):
+        """Callback du flux sounddevice."""
+        start = time.perf_counter()
+        if status:
+            self._stats["underruns"] += 1
+        outdata[:, 0] = self.render(frames)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if elapsed_ms > self._stats["callback_time_max_ms"]:
+            self._stats["callback_time_max_ms"] = elapsed_ms
+
+    def start(self) -> bool:
+        """Ouvre le flux de sortie (sans effet s'il tourne déjà)."""
+        if sd is None:
+            return False
+        if self._stream is not None:
+            # Chemin rapide des déclenchements : pas de verrou si le flux tourne
+            return True
+        with self._lock:
+            if self._stream is not None:
+                return True
+            try:
+                self._stream = sd.OutputStream(
+                    samplerate=self.sample_rate,
+                    blocksize=self.block_size,
+                    latency=self.latency,
+                    device=self.device,
+                    channels=1,
+                    dtype='float32',
+                    callback=self._callback,
+                )
+                self._stream.start()
+                return True
+            except Exception as e:
+                print(f"Erreur ouverture flux audio: {e}")
+                self._stream = None
+                return False
+
+    def stop(self):
+        """Ferme le flux de sortie."""
+        with self._lock:
+            if self._stream is not None:
+                try:
+                    self._stream.stop()
+                    self._stream.close()
+                finally:
+                    self._stream = None
+
+    @property
+    def active_voices(self) -> int:
+        return len(self._voices)
+
+    def stats(self) -> dict:
+        """Statistiques du moteur de mixage."""
+        stats = dict(self._stats)
+        stats["active_voices"] = len(self._voices)
+        stats["running"] = self._stream is not None
+        stats["sample_rate"] = self.sample_rate
+        stats["block_size"] = self.block_size
+        stats["effects"] = [effect.name for effect in self.effects]
+        if self.looper is not None:
+            stats["looper"] = self.looper.stats()
+        if self.limiter is not None:
+            stats["limiter"] = self.limiter.stats()
+        stream = self._stream
+        stats["latency_ms"] = stream.latency * 1000 if stream is not None else None
+        return stats
+
+
+def mix_offline(voices, extra_frames: int = 0) -> np.ndarray:
+    """Mixeur hors ligne : somme des voix (début en frames, sample, gain).
+
+    Les samples peuvent être float32 ou compacts (données int16 + échelle).
+    """
+    parts = []
+    end = 0
+    for onset, sample, gain in voices:
+        if isinstance(sample, np.ndarray):
+            data, scale = sample, 1.0
+        else:
+            data, scale = sample.data, sample.scale
+        parts.append((onset, data, scale * gain))
+        end = max(end, onset + len(data))
+
+    out = np.zeros(end + extra_frames, dtype=np.float32)
+    for onset, data, gain in parts:
+        segment = out[onset:onset + len(data)]
+        segment += data.astype(np.float32, copy=False) * np.float32(gain)
+    return out
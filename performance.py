@@ -0,0 +1,91 @@
+"""Performances sous forme de séquences d'événements de notes.
+
+Une prise est stockée comme un tableau NumPy structuré très compact,
+re-rendu à la demande par le mixeur hors ligne avec n'importe quel
+moteur de synthèse ou accordage.
+"""
+
+import time
+from typing import Optional
+
+import numpy as np
+
+from mixer import mix_offline
+
+# Un événement : instant (µs depuis le début), lame, vélocité, échelle, durée (s)
+EVENT_DTYPE = np.dtype([
+    ("onset_us", "<i8"),
+    ("key", "u1"),
+    ("velocity", "u1"),
+    ("scale_id", "u1"),
+    ("duration", "<f4"),
+])
+
+# Identifiants d'échelle stockés dans les événements
+SCALE_IDS = ["pentatonic", "major", "chromatic"]
+
+MAX_VELOCITY = 127
+
+
+def pack_events(events: np.ndarray) -> bytes:
+    """Sérialise des événements (BLOB little-endian)."""
+    return np.ascontiguousarray(events, dtype=EVENT_DTYPE).tobytes()
+
+
+def unpack_events(blob: bytes) -> np.ndarray:
+    """Désérialise des événements (copie modifiable)."""
+    return np.frombuffer(blob, dtype=EVENT_DTYPE).copy()
+
+
+class PerformanceRecorder:
+    """Capture horodatée des notes jouées pendant un enregistrement."""
+
+    def __init__(self):
+        self._start_ns = time.perf_counter_ns()
+        self._events = []
+
+    def add(self, key: int, scale: str = "pentatonic", velocity: int = MAX_VELOCITY,
+            duration: float = 0.45, onset_us: Optional[int] = None,
+            timestamp_ns: Optional[int] = None):
+        """Ajoute une note ; l'instant est pris maintenant par défaut.
+
+        `timestamp_ns` (horloge `time.perf_counter_ns`) date une note reçue
+        plus tôt, par exemple d'un contrôleur MIDI.
+        """
+        if onset_us is None:
+            if timestamp_ns is None:
+                timestamp_ns = time.perf_counter_ns()
+            onset_us = (timestamp_ns - self._start_ns) // 1000
+        self._events.append((onset_us, key, velocity, SCALE_IDS.index(scale), duration))
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def events(self) -> np.ndarray:
+        """Événements capturés, triés par instant."""
+        events = np.array(self._events, dtype=EVENT_DTYPE)
+        return np.sort(events, order="onset_us", kind="stable")
+
+
+def render_events(events: np.ndarray, core, tail: float = 0.0) -> np.ndarray:
+    """Rend une séquence d'événements avec le moteur `core` (AudioCore).
+
+    Chaque note est placée à la frame exacte de son instant ; le volume
+    et la vélocité sont appliqués comme gain de voix, puis les effets du
+    bus maître du moteur.
+    """
+    scales = {}
+    voices = []
+    for event in events:
+        scale = SCALE_IDS[event["scale_id"]]
+        if scale not in scales:
+            scales[scale] = core.build_balafon_scale(scale)
+        note = scales[scale][event["key"]]
+        layer = core.velocity_layer(int(event["velocity"]))
+        sample = core.get_cached_sample(note.frequency, float(event["duration"]), layer)
+        onset = int(round(int(event["onset_us"]) * core.sample_rate / 1_000_000))
+        gain = core.volume * event["velocity"] / MAX_VELOCITY
+        voices.append((onset, sample, gain))
+    audio = mix_offline(voices, extra_frames=int(tail * core.sample_rate))
+    # Effets du bus maître (réverbération...) en une seule passe
+    return core.mixer.render_effects_offline(audio)
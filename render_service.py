@@ -0,0 +1,458 @@
+"""Service HTTP de rendu sans interface (clients web).
+
+Un serveur HTTP/1.1 asyncio minimal (bibliothèque standard seulement)
+reçoit des partitions, les rend sur un pool de processus qui partagent la
+banque de samples en mémoire, et renvoie l'audio encodé :
+
+    POST /render        partition JSON (ou événements binaires) -> audio
+    GET  /recordings    enregistrements de l'utilisateur (JSON)
+    GET  /health        statistiques du service
+
+L'authentification (HTTP Basic) et la liste des enregistrements passent
+par `Database`. Les petites requêtes concurrentes sont regroupées en lots
+rendus en une seule passe de mixage ; les résultats sont mis en cache par
+empreinte du contenu.
+
+    python render_service.py --port 8080 --workers 4
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+import config
+from core import AudioCore, BankDescriptor, audio_core
+from database import Database
+from library import EXPORT_FORMATS
+from mixer import mix_offline
+from performance import EVENT_DTYPE, MAX_VELOCITY, SCALE_IDS, pack_events, unpack_events
+
+try:
+    import soundfile as sf
+except (ImportError, OSError):
+    sf = None
+
+CONTENT_TYPES = {"wav": "audio/wav", "flac": "audio/flac", "ogg": "audio/ogg"}
+
+REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class RequestError(Exception):
+    """Erreur renvoyée au client avec un code HTTP."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+# ============================================================================
+# PROCESSUS DE RENDU
+# ============================================================================
+
+def _init_worker(banks: Tuple[BankDescriptor, ...]):
+    """S'attache aux banques publiées en mémoire partagée (sans rendu ni copie)."""
+    for descriptor in banks:
+        audio_core.attach_bank(descriptor)
+
+
+def render_batch(jobs: List[Tuple[bytes, str, float]]) -> List[bytes]:
+    """Rend un lot de partitions (événements sérialisés, format, traîne).
+
+    Les voix de toutes les partitions sont placées bout à bout dans un seul
+    tampon et sommées en une passe ; chaque segment reçoit ensuite les
+    effets du bus maître puis est encodé séparément.
+    """
+    core = audio_core
+    scales = {}
+    voices = []
+    spans = []
+    offset = voices_end = 0
+    for blob, _, tail in jobs:
+        end = 0
+        for event in unpack_events(blob):
+            scale = SCALE_IDS[event["scale_id"]]
+            if scale not in scales:
+                scales[scale] = core.build_balafon_scale(scale)
+            note = scales[scale][event["key"]]
+            layer = core.velocity_layer(int(event["velocity"]))
+            sample = core.get_voice(note.frequency, float(event["duration"]), layer)
+            onset = int(round(int(event["onset_us"]) * core.sample_rate / 1_000_000))
+            voices.append((offset + onset, sample, core.volume * event["velocity"] / MAX_VELOCITY))
+            end = max(end, onset + len(sample if isinstance(sample, np.ndarray) else sample.data))
+        voices_end = max(voices_end, offset + end)
+        length = end + int(tail * core.sample_rate)
+        spans.append((offset, length))
+        offset += length
+
+    mixed = mix_offline(voices, extra_frames=offset - voices_end)
+    results = []
+    for (start, length), (_, fmt, _) in zip(spans, jobs):
+        audio = core.mixer.render_effects_offline(mixed[start:start + length].copy())
+        file_format, subtype = EXPORT_FORMATS[fmt]
+        buffer = io.BytesIO()
+        sf.write(buffer, audio, core.sample_rate, format=file_format, subtype=subtype)
+        results.append(buffer.getvalue())
+    return results
+
+
+# ============================================================================
+# PARTITIONS
+# ============================================================================
+
+def parse_score(body: bytes, content_type: str, query: Dict[str, List[str]]) -> Tuple[np.ndarray, str, float]:
+    """Décode une requête de rendu : (événements, format, traîne en secondes).
+
+    JSON : {"scale": "pentatonic", "duration": 0.45, "format": "wav",
+    "tail": 0.5, "notes": [{"t": 0, "key": 3, "velocity": 100}, ...]}
+    (t en millisecondes). Binaire (application/octet-stream) : événements
+    EVENT_DTYPE, format et traîne en paramètres d'URL.
+    """
+    try:
+        if content_type.startswith("application/octet-stream"):
+            if len(body) % EVENT_DTYPE.itemsize:
+                raise RequestError(400, "Taille d'événements invalide")
+            events = unpack_events(body)
+            fmt = query.get("format", ["wav"])[0]
+            tail = float(query.get("tail", [0.0])[0])
+        else:
+            score = json.loads(body)
+            scale = score.get("scale", "pentatonic")
+            duration = float(score.get("duration", config.DURATION_DEFAULT))
+            notes = score["notes"]
+            fmt = score.get("format", "wav")
+            tail = float(score.get("tail", 0.0))
+            events = np.zeros(len(notes), dtype=EVENT_DTYPE)
+            events["onset_us"] = [int(round(float(n["t"]) * 1000)) for n in notes]
+            events["key"] = [int(n["key"]) for n in notes]
+            events["velocity"] = [int(n.get("velocity", MAX_VELOCITY)) for n in notes]
+            events["scale_id"] = SCALE_IDS.index(scale)
+            events["duration"] = duration
+    except (ValueError, KeyError, TypeError, AttributeError, OverflowError) as e:
+        raise RequestError(400, f"Partition invalide: {e}")
+
+    if len(events) == 0:
+        raise RequestError(400, "Partition vide")
+    if fmt not in EXPORT_FORMATS:
+        raise RequestError(400, f"Format inconnu: {fmt}")
+    if len(events) > config.RENDER_MAX_EVENTS:
+        raise RequestError(413, "Partition trop longue")
+    if (
+        events["key"].max() >= 22 or events["scale_id"].max() >= len(SCALE_IDS)
+        or events["onset_us"].min() < 0 or events["onset_us"].max() > config.RENDER_MAX_SECONDS * 1_000_000
+        or not 0.0 < events["duration"].min() <= events["duration"].max() <= 2.0
+        or events["velocity"].min() < 1 or events["velocity"].max() > MAX_VELOCITY
+    ):
+        raise RequestError(400, "Événements hors limites")
+    if not 0.0 <= tail <= 5.0:
+        raise RequestError(400, "Traîne hors limites")
+    events.sort(order="onset_us", kind="stable")
+    return events, fmt, tail
+
+
+# ============================================================================
+# SERVICE
+# ============================================================================
+
+class RenderService:
+    """Service de rendu : HTTP, lots, pool de processus et cache."""
+
+    def __init__(
+        self,
+        db: Database,
+        workers: Optional[int] = None,
+        batch_window: float = 0.005,
+        max_batch: int = 32,
+        cache_bytes: int = 64 << 20,
+        prewarm_scales: Tuple[str, ...] = tuple(SCALE_IDS),
+        auth_ttl: float = 60.0,
+        auth_entries: int = 1024
+    ):
+        self.db = db
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.cache_bytes = cache_bytes
+        self.auth_ttl = auth_ttl
+        self.auth_entries = auth_entries
+        # Banque rendue une fois, partagée par tous les processus de rendu
+        banks = tuple(
+            audio_core.publish_bank([n.frequency for n in audio_core.build_balafon_scale(scale)])
+            for scale in prewarm_scales
+        )
+        self._pool = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(banks,))
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._cached_bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._batch: List[tuple] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # Empreinte de l'en-tête Authorization -> (utilisateur, échéance)
+        self._auth: "OrderedDict[bytes, Tuple[int, float]]" = OrderedDict()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._stats = {"requests": 0, "renders": 0, "batches": 0, "cache_hits": 0, "errors": 0}
+
+    async def start(self, host: str = "127.0.0.1", port: int = config.RENDER_PORT) -> int:
+        """Démarre les processus (banque attachée) puis l'écoute HTTP."""
+        loop = asyncio.get_running_loop()
+        # Une tâche vide par processus force leur démarrage avant la première requête
+        await asyncio.gather(*(loop.run_in_executor(self._pool, render_batch, [])
+                               for _ in range(self.workers)))
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        self._pool.shutdown(wait=True)
+        audio_core.release_shared_banks()
+
+    # ------------------------------------------------------------------
+    # Rendu : cache, lots
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def content_key(events: np.ndarray, fmt: str, tail: float) -> str:
+        """Empreinte de tout ce qui détermine l'audio rendu : partition, moteur, bus maître."""
+        digest = hashlib.sha256(pack_events(events))
+        digest.update(f"{fmt}:{tail}:{AudioCore.ENGINE_VERSION}:{audio_core.sample_rate}".encode())
+        digest.update(f":{config.LIMITER_ENABLED}:{config.LIMITER_THRESHOLD_DB}"
+                      f":{config.REVERB_WET}:{config.REVERB_IR}".encode())
+        return digest.hexdigest()
+
+    async def render(self, events: np.ndarray, fmt: str = "wav", tail: float = 0.0) -> Tuple[bytes, bool]:
+        """Audio encodé d'une partition ; renvoie (octets, depuis le cache)."""
+        key = self.content_key(events, fmt, tail)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self._stats["cache_hits"] += 1
+            return cached, True
+        future = self._inflight.get(key)
+        if future is None:
+            # Les requêtes identiques simultanées partagent le même rendu
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            self._batch.append((key, pack_events(events), fmt, tail, future))
+            if len(self._batch) >= self.max_batch:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = asyncio.get_running_loop().call_later(self.batch_window, self._flush)
+        return await asyncio.shield(future), False
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._batch = self._batch, []
+        if batch:
+            asyncio.get_running_loop().create_task(self._run_batch(batch))
+
+    async def _run_batch(self, batch: List[tuple]):
+        loop = asyncio.get_running_loop()
+        jobs = [(blob, fmt, tail) for _, blob, fmt, tail, _ in batch]
+        try:
+            results = await loop.run_in_executor(self._pool, render_batch, jobs)
+        except Exception as e:
+            for key, *_, future in batch:
+                self._inflight.pop(key, None)
+                future.set_exception(e)
+            return
+        self._stats["batches"] += 1
+        self._stats["renders"] += len(batch)
+        for (key, *_, future), audio in zip(batch, results):
+            self._store(key, audio)
+            self._inflight.pop(key, None)
+            future.set_result(audio)
+
+    def _store(self, key: str, audio: bytes):
+        """Cache LRU borné en octets."""
+        if len(audio) > self.cache_bytes:
+            return
+        self._cache[key] = audio
+        self._cached_bytes += len(audio)
+        while self._cached_bytes > self.cache_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cached_bytes -= len(evicted)
+
+    def stats(self) -> dict:
+        stats = dict(self._stats)
+        stats["cache_entries"] = len(self._cache)
+        stats["cache_bytes"] = self._cached_bytes
+        stats["mean_batch"] = stats["renders"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+    # ------------------------------------------------------------------
+    # HTTP
+    # ------------------------------------------------------------------
+
+    async def authenticate(self, authorization: str) -> int:
+        """Identifie l'utilisateur (HTTP Basic).
+
+        Le hachage du mot de passe est coûteux : un succès est gardé
+        `auth_ttl` secondes (un mot de passe changé ou un compte supprimé
+        cesse donc de fonctionner peu après), dans un cache borné indexé par
+        l'empreinte de l'en-tête plutôt que par l'identifiant en clair.
+        """
+        key = hashlib.sha256(authorization.encode()).digest()
+        now = time.monotonic()
+        cached = self._auth.get(key)
+        if cached is not None:
+            user_id, expires = cached
+            if now < expires:
+                self._auth.move_to_end(key)
+                return user_id
+            del self._auth[key]
+        try:
+            scheme, _, credentials = authorization.partition(" ")
+            if scheme.lower() != "basic":
+                raise ValueError(scheme)
+            username, _, password = base64.b64decode(credentials).decode().partition(":")
+        except ValueError:
+            raise RequestError(401, "Authentification requise")
+        user_id = await asyncio.get_running_loop().run_in_executor(None, self.db.verify_user, username, password)
+        if user_id is None:
+            raise RequestError(401, "Identifiants invalides")
+        self._auth[key] = (user_id, now + self.auth_ttl)
+        while len(self._auth) > self.auth_entries:
+            self._auth.popitem(last=False)
+        return user_id
+
+    async def _dispatch(self, method: str, target: str, headers: Dict[str, str], body: bytes) -> tuple:
+        url = urlsplit(target)
+        if url.path == "/health":
+            return 200, "application/json", json.dumps(self.stats()).encode(), {}
+        if url.path not in ("/render", "/recordings"):
+            raise RequestError(404, "Ressource inconnue")
+        user_id = await self.authenticate(headers.get("authorization", ""))
+
+        if url.path == "/recordings":
+            if method != "GET":
+                raise RequestError(405, "GET attendu")
+            rows = await asyncio.get_running_loop().run_in_executor(None, self.db.get_recordings, user_id)
+            listing = [
+                {"id": row["id"], "name": row["name"], "duration": row["duration"], "created_at": row["created_at"]}
+                for row in rows
+            ]
+            return 200, "application/json", json.dumps(listing).encode(), {}
+
+        if method != "POST":
+            raise RequestError(405, "POST attendu")
+        events, fmt, tail = parse_score(body, headers.get("content-type", ""), parse_qs(url.query))
+        audio, cached = await self.render(events, fmt, tail)
+        return 200, CONTENT_TYPES[fmt], audio, {"X-Cache": "hit" if cached else "miss"}
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Connexion HTTP/1.1 (keep-alive)."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+
+                self._stats["requests"] += 1
+                extra = {}
+                try:
+                    if length > config.RENDER_MAX_BODY:
+                        raise RequestError(413, "Requête trop volumineuse")
+                    body = await reader.readexactly(length) if length else b""
+                    status, content_type, payload, extra = await self._dispatch(method, target, headers, body)
+                except RequestError as e:
+                    self._stats["errors"] += 1
+                    status, content_type = e.status, "application/json"
+                    payload = json.dumps({"error": str(e)}).encode()
+                    if e.status == 401:
+                        extra = {"WWW-Authenticate": 'Basic realm="symphony"'}
+                    if e.status == 413:
+                        keep_alive = False
+                except Exception as e:
+                    self._stats["errors"] += 1
+                    print(f"Erreur service de rendu: {e}")
+                    status, content_type = 500, "application/json"
+                    payload = json.dumps({"error": "Erreur interne"}).encode()
+
+                head = [f"HTTP/1.1 {status} {REASONS[status]}",
+                        f"Content-Type: {content_type}",
+                        f"Content-Length: {len(payload)}",
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                head += [f"{name}: {value}" for name, value in extra.items()]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def http_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, method: str,
+                       path: str, body: bytes = b"", headers: Optional[Dict[str, str]] = None) -> tuple:
+    """Client HTTP/1.1 minimal sur une connexion ouverte : (statut, en-têtes, corps)."""
+    head = [f"{method} {path} HTTP/1.1", "Host: localhost", f"Content-Length: {len(body)}"]
+    head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    response_headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        response_headers[name.strip().lower()] = value.strip()
+    payload = await reader.readexactly(int(response_headers.get("content-length", 0)))
+    return status, response_headers, payload
+
+
+def basic_auth(username: str, password: str) -> str:
+    return "Basic " + base64.b64encode(f"{username}:{password}".encode()).decode()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Service HTTP de rendu du balafon Symphony.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=config.RENDER_PORT)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--db", default="data/symphony.db")
+    args = parser.parse_args(argv)
+
+    async def serve():
+        service = RenderService(Database(args.db), args.workers)
+        port = await service.start(args.host, args.port)
+        print(f"Service de rendu sur http://{args.host}:{port}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await service.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
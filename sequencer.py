@@ -0,0 +1,232 @@
+"""Séquenceur à la frame près : métronome, motifs et relecture de prises.
+
+Les sources produisent des événements datés en frames de l'horloge du
+mixeur. Un thread d'anticipation les transmet au mixeur un peu avant leur
+échéance ; le mixeur les place à la frame exacte dans ses blocs. Le
+minutage ne dépend donc ni de la charge de l'interface ni de la précision
+des réveils du thread.
+"""
+
+import heapq
+import itertools
+import threading
+from bisect import bisect_right
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from performance import MAX_VELOCITY, SCALE_IDS
+
+# Événement d'une source : (position, sample, gain) ; la position est une
+# frame, ou un temps pour les sources musicales (suivent le tempo)
+ScheduledEvent = Tuple[float, object, float]
+
+
+class TempoMap:
+    """Correspondance temps musical (temps) <-> frames, par segments de tempo.
+
+    Chaque position est calculée depuis l'origine de son segment et non par
+    incréments successifs : aucune dérive, même après des heures.
+    """
+
+    def __init__(self, sample_rate: int, bpm: float = 120.0, origin_frame: int = 0):
+        self.sample_rate = sample_rate
+        # Segments (temps de début, frame de début, bpm), triés
+        self._beats = [0.0]
+        self._frames = [float(origin_frame)]
+        self._bpms = [float(bpm)]
+
+    @property
+    def bpm(self) -> float:
+        return self._bpms[-1]
+
+    def frames_per_beat(self, bpm: float) -> float:
+        return self.sample_rate * 60.0 / bpm
+
+    def frame_at(self, beat: float) -> int:
+        """Frame (arrondie) d'une position en temps."""
+        i = max(0, bisect_right(self._beats, beat) - 1)
+        return int(round(self._frames[i] + (beat - self._beats[i]) * self.frames_per_beat(self._bpms[i])))
+
+    def beat_at(self, frame: int) -> float:
+        """Position en temps d'une frame."""
+        i = max(0, bisect_right(self._frames, frame) - 1)
+        return self._beats[i] + (frame - self._frames[i]) / self.frames_per_beat(self._bpms[i])
+
+    def set_tempo(self, bpm: float, beat: float):
+        """Change le tempo à partir du temps `beat` (les segments postérieurs sont remplacés)."""
+        i = max(0, bisect_right(self._beats, beat) - 1)
+        frame = self._frames[i] + (beat - self._beats[i]) * self.frames_per_beat(self._bpms[i])
+        del self._beats[i + 1:], self._frames[i + 1:], self._bpms[i + 1:]
+        if beat == self._beats[i]:
+            self._bpms[i] = float(bpm)
+        else:
+            self._beats.append(float(beat))
+            self._frames.append(frame)
+            self._bpms.append(float(bpm))
+
+
+def click_sample(sample_rate: int, accent: bool = False, duration: float = 0.03) -> np.ndarray:
+    """Clic de métronome (le premier temps de la mesure est plus aigu)."""
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    frequency = 1760.0 if accent else 1320.0
+    return (0.6 * np.sin(2 * np.pi * frequency * t) * np.exp(-t / (duration / 5))).astype(np.float32)
+
+
+class Sequencer:
+    """Planificateur d'événements musicaux pour le mixeur de `core`."""
+
+    def __init__(self, core, bpm: float = 120.0, lookahead: float = 0.1, interval: float = 0.025):
+        self.core = core
+        self.mixer = core.mixer
+        self.lookahead_frames = int(lookahead * core.sample_rate)
+        self.interval = interval
+        self.tempo = TempoMap(core.sample_rate, bpm, self.mixer.frame_clock)
+        self._heap: List[tuple] = []  # (frame, ordre, id source, temps, sample, gain)
+        self._sources = {}  # id -> (itérateur, musicale)
+        self._ids = itertools.count()
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # Sources
+    # ------------------------------------------------------------------
+
+    def add_source(self, events: Iterator[ScheduledEvent], musical: bool = False) -> int:
+        """Ajoute une source (itérateur d'événements en positions croissantes).
+
+        Les positions d'une source musicale sont en temps : leur frame est
+        recalculée si le tempo change avant leur envoi au mixeur.
+        """
+        with self._lock:
+            source_id = next(self._ids)
+            self._sources[source_id] = (events, musical)
+            self._pull(source_id)
+        return source_id
+
+    def remove_source(self, source_id: int):
+        """Retire une source ; ses événements déjà transmis au mixeur sonneront."""
+        with self._lock:
+            self._sources.pop(source_id, None)
+            self._heap = [entry for entry in self._heap if entry[2] != source_id]
+            heapq.heapify(self._heap)
+
+    def _pull(self, source_id: int):
+        """Place le prochain événement d'une source dans le tas."""
+        source = self._sources.get(source_id)
+        if source is None:
+            return
+        events, musical = source
+        event = next(events, None)
+        if event is None:
+            del self._sources[source_id]
+            return
+        position, sample, gain = event
+        if musical:
+            entry = (self.tempo.frame_at(position), next(self._order), source_id, position, sample, gain)
+        else:
+            entry = (int(position), next(self._order), source_id, None, sample, gain)
+        heapq.heappush(self._heap, entry)
+
+    def start_frame(self) -> int:
+        """Frame de départ d'une nouvelle source (juste après l'horizon déjà planifié)."""
+        return self.mixer.frame_clock + self.lookahead_frames
+
+    # ------------------------------------------------------------------
+    # Sources prêtes à l'emploi
+    # ------------------------------------------------------------------
+
+    def metronome(self, beats_per_bar: int = 4, gain: float = 1.0) -> int:
+        """Clics sur chaque temps (accent sur le premier), jusqu'au retrait."""
+        accent = click_sample(self.core.sample_rate, accent=True)
+        normal = click_sample(self.core.sample_rate)
+        first = int(np.ceil(self.tempo.beat_at(self.start_frame())))
+
+        def events():
+            for beat in itertools.count(first):
+                yield beat, accent if beat % beats_per_bar == 0 else normal, gain
+
+        return self.add_source(events(), musical=True)
+
+    def pattern(self, steps: List[Tuple[float, int, int]], length_beats: float, scale: str = "pentatonic") -> int:
+        """Motif en boucle : pas (temps dans le motif, lame, vélocité)."""
+        notes = self.core.build_balafon_scale(scale)
+        steps = sorted(steps)
+        first = float(np.ceil(self.tempo.beat_at(self.start_frame())))
+
+        def events():
+            for loop in itertools.count():
+                base = first + loop * length_beats
+                for beat, key, velocity in steps:
+                    yield (base + beat,
+                           self.core.get_voice(notes[key].frequency, layer=self.core.velocity_layer(velocity)),
+                           velocity / MAX_VELOCITY)
+
+        return self.add_source(events(), musical=True)
+
+    def performance(self, events: np.ndarray, start_frame: Optional[int] = None) -> int:
+        """Relecture d'une prise (séquence d'événements) à la frame près."""
+        start = self.start_frame() if start_frame is None else start_frame
+        rate = self.core.sample_rate
+        scales = {}
+
+        def scheduled():
+            for event in events:
+                scale = SCALE_IDS[event["scale_id"]]
+                if scale not in scales:
+                    scales[scale] = self.core.build_balafon_scale(scale)
+                frequency = scales[scale][event["key"]].frequency
+                layer = self.core.velocity_layer(int(event["velocity"]))
+                frame = start + int(round(int(event["onset_us"]) * rate / 1_000_000))
+                yield (frame, self.core.get_voice(frequency, float(event["duration"]), layer),
+                       event["velocity"] / MAX_VELOCITY)
+
+        return self.add_source(scheduled())
+
+    def set_tempo(self, bpm: float):
+        """Change le tempo à partir de l'horizon déjà transmis au mixeur."""
+        with self._lock:
+            horizon = self.mixer.frame_clock + self.lookahead_frames
+            self.tempo.set_tempo(bpm, self.tempo.beat_at(horizon))
+            self._heap = [
+                (self.tempo.frame_at(beat), order, source_id, beat, sample, gain) if beat is not None
+                else (frame, order, source_id, beat, sample, gain)
+                for frame, order, source_id, beat, sample, gain in self._heap
+            ]
+            heapq.heapify(self._heap)
+
+    # ------------------------------------------------------------------
+    # Planification
+    # ------------------------------------------------------------------
+
+    def pump(self) -> int:
+        """Transmet au mixeur les événements de l'horizon d'anticipation."""
+        horizon = self.mixer.frame_clock + self.lookahead_frames
+        sent = 0
+        with self._lock:
+            while self._heap and self._heap[0][0] < horizon:
+                frame, _, source_id, _, sample, gain = heapq.heappop(self._heap)
+                self.mixer.trigger(sample, gain, frame=frame)
+                sent += 1
+                self._pull(source_id)
+        return sent
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.pump()
+
+    def start(self):
+        """Démarre le flux audio et le thread d'anticipation."""
+        self.mixer.start()
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sequencer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
@@ -0,0 +1,67 @@
+"""Spectre matplotlib de Symphony (repli de `config.SPECTRUM_BACKEND`).
+
+Module séparé pour que matplotlib ne soit importé que s'il est choisi.
+"""
+
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+
+from core import audio_core
+
+
+class SpectrumWidget(FigureCanvas):
+    """Analyseur de spectre FFT moderne et optimisé."""
+
+    def __init__(self, parent=None):
+        self.fig = Figure(figsize=(5, 3), dpi=100, facecolor='#0f1419')
+        super().__init__(self.fig)
+        self.setParent(parent)
+        self.setMinimumHeight(250)
+        
+        self.ax = self.fig.add_subplot(111)
+        self.ax.set_facecolor('#1a1f2e')
+        self.ax.set_title('Spectre Fréquentiel', color='#f1f5f9', fontsize=12, fontweight='bold')
+        self.ax.set_xlabel('Fréquence (Hz)', color='#94a3b8')
+        self.ax.set_ylabel('Magnitude', color='#94a3b8')
+        self.ax.grid(True, color='#334155', alpha=0.3, linestyle='--')
+        self.ax.set_xlim(0, 2000)
+        self.ax.set_ylim(0, 1.2)
+        
+        for spine in self.ax.spines.values():
+            spine.set_color('#334155')
+        self.ax.tick_params(colors='#94a3b8')
+
+    def update_spectrum(self, frequency: float):
+        """Met à jour le spectre en temps réel."""
+        try:
+            self.ax.clear()
+            self.ax.set_facecolor('#1a1f2e')
+            
+            sample = audio_core.get_cached_sample(frequency)
+            freqs, mags = audio_core.analyze_spectrum(sample)
+            
+            self.ax.bar(freqs, mags, width=10, color='#10b981', alpha=0.8, edgecolor='#059669')
+            
+            self.ax.set_xlim(0, 2000)
+            self.ax.set_ylim(0, 1.2)
+            self.ax.set_title('Spectre Fréquentiel', color='#f1f5f9')
+            self.ax.set_xlabel('Fréquence (Hz)', color='#94a3b8')
+            self.ax.set_ylabel('Magnitude', color='#94a3b8')
+            self.ax.grid(True, color='#334155', alpha=0.3)
+            self.ax.tick_params(colors='#94a3b8')
+            
+            for spine in self.ax.spines.values():
+                spine.set_color('#334155')
+            
+            self.fig.tight_layout()
+            self.draw()
+        except Exception as e:
+            print(f"Erreur spectrum: {e}")
+    
+    def set_theme(self, theme: dict):
+        """Change le thème du spectre."""
+        self.fig.patch.set_facecolor(theme['bg'])
+        self.ax.set_facecolor(theme['surface'])
+        self.ax.set_title('Spectre Fréquentiel', color=theme['text'])
+        self.ax.tick_params(colors=theme['text_muted'])
+        self.draw()
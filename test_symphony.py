@@ -3,14 +3,37 @@
 Valide l'ensemble du système : audio, UI, base de données.
 """
 
+import asyncio
+import json
 import pytest
 import numpy as np
 import tempfile
+import threading
+import time
 import os
 from pathlib import Path
 
-from core import audio_core, AudioCore, Note
-from database import Database
+import config
+from core import audio_core, AudioCore, Note, CompactSample, trim_silence
+from mixer import Mixer, mix_offline
+from dsp import (
+    LookaheadLimiter, PartitionedConvolver, RingBuffer, StreamingResampler, find_trigger,
+    load_impulse_response, minmax_decimate, resample_blocks, synthetic_ir
+)
+from scipy import signal
+from library import ExportJob, ExportPool, transcode, probe_file, safe_file_stem, scan_library
+from analysis import (
+    LogSpectrumMapper, LoudnessMeter, PeakPyramid, SILENT_LOUDNESS, SpectrogramRing, StreamingSTFT,
+    k_weighting_sos, normalization_gain, spectrogram_columns
+)
+from input_devices import InputEngine, LoopbackBackend
+from jam import MESSAGES, MSG_NOTE, JamClient, JamServer, JitterBuffer, benchmark, monotonic_us
+from looper import Looper
+from midi_io import _read_vlq, import_midi, iter_midi_notes, nearest_keys, write_midi
+from render_service import RenderService, basic_auth, http_request, parse_score, render_batch
+from performance import EVENT_DTYPE, PerformanceRecorder, pack_events, unpack_events, render_events
+from sequencer import Sequencer, TempoMap
+from database import FTS_CANDIDATES, Database
 
 
 class TestAudioCore:
@@ -52,6 +75,1112 @@ class TestAudioCore:
         assert len(mags) > 0
         assert mags.max() <= 1.0
 
+    def test_log_spectrum_mapper(self):
+        """Teste la projection log-fréquence en dB du spectre natif."""
+        sample = audio_core.generate_sample(440.0)
+        mapper = LogSpectrumMapper(len(sample), audio_core.sample_rate, 50, 2000, 200, db_floor=-60.0)
+        levels = mapper(np.abs(np.fft.rfft(sample)))
+
+        assert levels.shape == (200,)
+        assert levels.max() == 0.0 and levels.min() >= -60.0
+        peak = int(np.argmax(levels))
+        assert mapper.edges[peak] <= 440.0 <= mapper.edges[peak + 1]
+
+
+class TestSampleBank:
+    """Tests des banques de samples persistées."""
+
+    def test_bank_roundtrip_mmap(self):
+        """Teste la persistance puis le rechargement mmap d'une banque."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            freqs = [n.frequency for n in audio_core.build_balafon_scale("pentatonic")]
+
+            cold = AudioCore(bank_dir=tmpdir)
+            assert cold.load_bank(freqs) is False
+
+            warm = AudioCore(bank_dir=tmpdir)
+            assert warm.load_bank(freqs) is True
+            for freq in freqs:
+                sample = warm.get_cached_sample(freq)
+                assert isinstance(sample, np.memmap)
+                assert np.array_equal(sample, cold.get_cached_sample(freq))
+            assert warm.cache_stats()["bank_loads"] == 1
+            del warm, sample
+
+    def test_bank_hash_depends_on_params(self):
+        """Teste que l'empreinte change avec les paramètres de synthèse."""
+        freqs = [440.0, 880.0]
+        assert AudioCore().bank_hash(freqs) == AudioCore().bank_hash(freqs)
+        assert AudioCore().bank_hash(freqs) != AudioCore(sample_rate=48000).bank_hash(freqs)
+        assert AudioCore().bank_hash(freqs) != AudioCore().bank_hash(freqs, duration=1.0)
+
+
+class TestCompactStorage:
+    """Tests du stockage compact int16 et du mixeur."""
+
+    def test_compact_roundtrip(self):
+        """Teste la quantification int16 avec facteur d'échelle."""
+        sample = audio_core.generate_sample(440.0)
+        compact = CompactSample.from_float(sample)
+        assert compact.data.dtype == np.int16
+        assert compact.nbytes == sample.nbytes // 2
+        assert np.max(np.abs(compact.to_float() - sample)) < 1e-4
+
+    def test_trim_silence(self):
+        """Teste le rognage de la queue silencieuse."""
+        sample = np.concatenate([np.ones(100, dtype=np.float32), np.zeros(50, dtype=np.float32)])
+        assert len(trim_silence(sample)) == 100
+
+    def test_compact_bank_stats(self):
+        """Teste la mémoire par banque rapportée par les statistiques."""
+        freqs = [440.0, 880.0]
+        full = AudioCore(bank_dir=None)
+        compact = AudioCore(bank_dir=None, compact=True)
+        full.load_bank(freqs)
+        compact.load_bank(freqs)
+        full_bytes = full.cache_stats()["banks"][full.bank_hash(freqs)]
+        compact_bytes = compact.cache_stats()["banks"][compact.bank_hash(freqs)]
+        assert compact_bytes * 2 == full_bytes
+
+    def test_mixer_sums_compact_voices(self):
+        """Teste la conversion int16 -> float32 dans la boucle du mixeur."""
+        core = AudioCore(bank_dir=None, compact=True)
+        mixer = Mixer(block_size=128)
+        mixer.trigger(core.get_voice(440.0))
+        mixer.trigger(core.get_voice(440.0))
+        block = mixer.render(128)
+        expected = 2 * core.get_cached_sample(440.0)[:128]
+        assert block.dtype == np.float32
+        assert np.allclose(block, expected, atol=1e-5)
+        assert mixer.stats()["active_voices"] == 2
+
+
+class TestLiveControls:
+    """Tests du volume temps réel et de la durée indexée dans le cache."""
+
+    def test_volume_ramp_is_smooth(self):
+        """Teste que le changement de volume passe par une rampe sans saut."""
+        mixer = Mixer(block_size=256, gain=1.0)
+        mixer.trigger(np.ones(44100, dtype=np.float32))
+        mixer.render(256)
+        mixer.set_gain(0.0)
+        out = np.concatenate([mixer.render(256) for _ in range(8)])
+        assert np.max(np.abs(np.diff(out))) < 0.01
+        assert out[-1] == 0.0
+        assert mixer.gain == 0.0
+
+    def test_cache_keyed_by_duration(self):
+        """Teste que la durée fait partie de la clé du cache."""
+        core = AudioCore(bank_dir=None)
+        short = core.get_cached_sample(440.0)
+        core.set_duration(1.0)
+        long = core.get_cached_sample(440.0)
+        assert len(long) > len(short)
+        core.set_duration(0.45)
+        assert core.get_cached_sample(440.0) is short
+
+    def test_bank_cache_bounded_and_prewarm_coalesced(self):
+        """Teste l'éviction des anciennes durées et le préchargement unique."""
+        core = AudioCore(bank_dir=None, max_durations=2)
+        for duration in (0.2, 0.3, 0.4):
+            core.set_duration(duration)
+            core.load_bank([440.0])
+        assert {key[1] for key in core.sample_cache} == {0.3, 0.4}
+        assert len(core.cache_stats()["banks"]) == 2
+
+        # Les durées rendues hors banque (partitions, import MIDI) sont bornées aussi
+        for duration in (0.11, 0.12, 0.13, 0.14):
+            core.get_voice(440.0, duration)
+        assert {key[1] for key in core.sample_cache} == {0.4, 0.14}
+
+        started = []
+        original = core.load_bank
+        core.load_bank = lambda frequencies: (started.append(core.duration), time.sleep(0.05), original(frequencies))
+        for duration in (0.5, 0.6, 0.7, 0.8):
+            core.set_duration(duration)
+            core.prewarm_bank([440.0])
+        while core._prewarm_thread is not None:
+            time.sleep(0.01)
+        # Le premier chargement, puis seulement la dernière demande en attente
+        assert len(started) <= 2 and started[-1] == 0.8
+
+    def test_play_never_waits_for_synthesis(self, monkeypatch):
+        """Teste qu'une note absente du cache est sautée et rendue en arrière-plan."""
+        import core as core_module
+        monkeypatch.setattr(core_module, "sd", object())
+        core = AudioCore(bank_dir=None)
+        triggered = []
+        monkeypatch.setattr(core.mixer, "trigger", lambda voice, gain: triggered.append(voice))
+        monkeypatch.setattr(core.mixer, "start", lambda: None)
+
+        # Verrou du cache tenu (rendu en cours) : le jeu ne doit pas l'attendre
+        with core._lock:
+            player = threading.Thread(target=core.play_async, args=(440.0,))
+            player.start()
+            player.join(1.0)
+            assert not player.is_alive()
+        assert triggered == [] and core.cache_stats()["skipped_notes"] == 1
+        for _ in range(200):
+            if core._synth_thread is None:
+                break
+            time.sleep(0.01)
+        core.play_async(440.0)
+        assert len(triggered) == 1
+
+    def test_cache_is_unity_gain(self):
+        """Teste que le volume n'est pas figé dans les samples en cache."""
+        core = AudioCore(bank_dir=None, volume=0.7)
+        cached = core.get_cached_sample(440.0)
+        core.set_volume(0.2)
+        assert core.get_cached_sample(440.0) is cached
+        assert np.allclose(cached * 0.7, core.generate_sample(440.0, gain=0.7))
+
+
+class TestResampling:
+    """Tests du rééchantillonnage polyphase en flux."""
+
+    def test_streaming_matches_full_resample(self):
+        """Teste que le traitement par blocs égale resample_poly sur tout le signal."""
+        x = np.random.default_rng(0).standard_normal(50001).astype(np.float32)
+        blocks = [x[i:i + 3000] for i in range(0, len(x), 3000)]
+        streamed = np.concatenate(list(resample_blocks(blocks, 48000, 44100)))
+        full = signal.resample_poly(x, 147, 160)
+        assert len(streamed) == len(full)
+        assert np.allclose(streamed, full, atol=1e-5)
+
+    def test_passthrough(self):
+        """Teste qu'aucun traitement n'est fait à fréquence égale."""
+        resampler = StreamingResampler(44100, 44100)
+        block = np.ones(100, dtype=np.float32)
+        assert resampler.process(block) is block
+
+    def test_load_recording_resamples(self):
+        """Teste le chargement d'un fichier à une autre fréquence."""
+        import soundfile as sf
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "low.wav")
+            sf.write(path, np.zeros(22050, dtype=np.float32), 22050)
+            core = AudioCore(bank_dir=None, sample_rate=44100)
+            data = core.load_recording(path)
+            assert len(data) == 44100
+
+
+class TestOscilloscope:
+    """Tests de la chaîne de l'oscilloscope (tampon, déclenchement, réduction)."""
+
+    def test_ring_buffer_wraparound(self):
+        """Teste la lecture des derniers échantillons à travers le bouclage."""
+        ring = RingBuffer(100)
+        signal_in = np.arange(250, dtype=np.float32)
+        for block in np.array_split(signal_in, 7):
+            ring.write(block)
+        assert ring.written == 250
+        assert np.array_equal(ring.latest(60), signal_in[-60:])
+        assert np.array_equal(ring.latest(100), signal_in[-100:])
+
+    def test_trigger_and_decimation(self):
+        """Teste le calage sur front montant et la réduction min/max."""
+        t = np.arange(1000) / 1000
+        wave = np.sin(2 * np.pi * 5 * t + 1.0).astype(np.float32)
+        start = find_trigger(wave, 0.0, search=500)
+        assert wave[start - 1] < 0.0 <= wave[start]
+
+        mins, maxs = minmax_decimate(wave, 50)
+        assert len(mins) == len(maxs) == 50
+        assert np.all(mins <= maxs)
+        assert maxs.max() == wave.max() and mins.min() == wave.min()
+
+    def test_mixer_tap(self):
+        """Teste que la sortie du mixeur est recopiée dans le tampon."""
+        mixer = Mixer(block_size=128)
+        tap = mixer.enable_tap(1024)
+        mixer.trigger(np.ones(300, dtype=np.float32))
+        out = np.concatenate([mixer.render(128) for _ in range(3)])
+        assert np.array_equal(tap.latest(384), out)
+
+
+class TestSpectrogram:
+    """Tests de la STFT en flux et du tampon d'image du spectrogramme."""
+
+    def test_streaming_stft_matches_whole_signal(self):
+        """Teste que le découpage en blocs ne change pas les trames."""
+        t = np.arange(22050) / 44100
+        wave = np.sin(2 * np.pi * 1000 * t).astype(np.float32)
+        for hop in (256, 3000):
+            stft = StreamingSTFT(1024, hop)
+            streamed = np.concatenate([stft.process(b) for b in np.array_split(wave, 13)])
+            frames = np.lib.stride_tricks.sliding_window_view(wave, 1024)[::hop]
+            assert np.allclose(streamed, np.abs(np.fft.rfft(frames * stft.window, axis=1)), atol=1e-3)
+
+    def test_ring_columns_wrap(self):
+        """Teste l'écriture circulaire des colonnes (aigus en haut)."""
+        ring = SpectrogramRing(rows=3, columns=4)
+        ring.push(np.array([[1, 2, 3], [4, 5, 6]], dtype=np.uint8))
+        ring.push(np.array([[7, 8, 9], [10, 11, 12], [13, 14, 15]], dtype=np.uint8))
+        assert ring.position == 1 and ring.total == 5
+        assert list(ring.image[:, 0]) == [15, 14, 13]
+        assert list(ring.image[:, 1]) == [6, 5, 4]
+
+    def test_offline_spectrogram_from_file(self, tmp_path):
+        """Teste le spectrogramme d'une prise lue en flux."""
+        path = str(tmp_path / "tone.flac")
+        t = np.arange(3 * 44100) / 44100
+        audio_core.save_recording((0.5 * np.sin(2 * np.pi * 880 * t)).astype(np.float32), path)
+
+        chunks = list(spectrogram_columns(path, rows=64, columns=100, block_frames=8192))
+        image = np.concatenate(chunks)
+        assert len(chunks) > 1 and len(image) <= 100
+        mapper = LogSpectrumMapper(1024, 44100, 50.0, 22050, 64)
+        peak_row = int(np.argmax(image[len(image) // 2]))
+        resolution = 44100 / 1024  # Largeur d'un bin FFT
+        assert mapper.edges[peak_row] - resolution <= 880 <= mapper.edges[peak_row + 1] + resolution
+
+
+class TestReverb:
+    """Tests de la réverbération à convolution partitionnée."""
+
+    def test_partitioned_matches_direct_convolution(self):
+        """Teste l'égalité avec une convolution directe (blocs fixes et variables)."""
+        rng = np.random.default_rng(3)
+        ir = synthetic_ir(44100, duration=0.1)
+        x = rng.standard_normal(128 * 60).astype(np.float32)
+        expected = signal.oaconvolve(x, ir)[:len(x)]
+
+        fixed = PartitionedConvolver(ir, 128)
+        out = np.concatenate([fixed.process(b) for b in x.reshape(-1, 128)])
+        assert np.allclose(out, expected, atol=1e-4)
+
+        variable = PartitionedConvolver(ir, 128)
+        out = np.concatenate([variable.process(b) for b in np.array_split(x, 77)])
+        # Blocs non alignés : latence fixe d'un bloc
+        assert np.allclose(out[128:], expected[:-128], atol=1e-4)
+
+    def test_live_and_offline_reverb_agree(self):
+        """Teste que le rendu hors ligne (oaconvolve) égale le rendu temps réel."""
+        core = AudioCore(bank_dir=None, volume=1.0, block_size=128)
+        core.set_reverb(0.5)
+        assert core.mixer.stats()["effects"] == ["reverb"]
+        note = core.get_cached_sample(440.0)
+
+        core.mixer.trigger(note)
+        blocks = -(-(len(note) + core.reverb.tail_frames) // 128)
+        live = np.concatenate([core.mixer.render(128) for _ in range(blocks)])
+        offline = core.mixer.render_effects_offline(mix_offline([(0, note, 1.0)]))
+        assert len(offline) == len(note) + core.reverb.tail_frames
+        assert np.allclose(live[:len(offline)], offline, atol=1e-4)
+
+        core.set_reverb(0.0)
+        assert core.mixer.effects == []
+
+    def test_impulse_response_is_resampled(self, tmp_path):
+        """Teste le chargement d'une réponse impulsionnelle à une autre fréquence."""
+        path = str(tmp_path / "room.wav")
+        import soundfile as sf
+        sf.write(path, synthetic_ir(48000, duration=0.5) * 0.1, 48000)
+        ir = load_impulse_response(path, 44100)
+        assert abs(len(ir) - 22050) <= 2
+        assert np.isclose(np.sum(np.square(ir, dtype=np.float64)), 1.0, atol=1e-3)
+
+
+class TestLimiter:
+    """Tests du limiteur à anticipation du bus maître."""
+
+    def test_chord_never_exceeds_threshold(self):
+        """Teste qu'un accord de six lames ne sature plus en temps réel."""
+        core = AudioCore(bank_dir=None, volume=0.7, block_size=256, limiter=True)
+        for note in core.build_balafon_scale("pentatonic")[:6]:
+            core.mixer.trigger(core.get_voice(note.frequency))
+        out = np.concatenate([core.mixer.render(256) for _ in range(40)])
+
+        threshold = core.mixer.limiter.threshold
+        assert np.abs(out).max() <= threshold * (1 + 1e-6)
+        stats = core.mixer.stats()["limiter"]
+        assert stats["max_reduction_db"] > 3.0
+        assert stats["limited_frames"] > 0
+
+    def test_offline_matches_live_and_is_transparent(self):
+        """Teste l'égalité hors ligne / temps réel et l'absence d'effet sous le seuil."""
+        rng = np.random.default_rng(5)
+        loud = rng.standard_normal(256 * 40).astype(np.float32)
+        live = LookaheadLimiter(44100)
+        streamed = np.concatenate([live.process(b) for b in loud.reshape(-1, 256)])
+        offline = LookaheadLimiter(44100).render(loud)
+        assert len(offline) == len(loud)
+        assert np.allclose(offline[:-live.latency], streamed[live.latency:])
+
+        quiet = (0.5 * np.sin(np.arange(8192) / 10)).astype(np.float32)
+        assert np.array_equal(LookaheadLimiter(44100).render(quiet), quiet)
+
+
+class TestSequencer:
+    """Tests du séquenceur à la frame près et du métronome."""
+
+    def test_scheduled_trigger_lands_mid_block(self):
+        """Teste qu'une voix planifiée démarre à la frame exacte, même en milieu de bloc."""
+        mixer = Mixer(block_size=256)
+        impulse = np.ones(4, dtype=np.float32)
+        mixer.render(256)
+        mixer.trigger(impulse, frame=256 + 3 * 256 + 77)
+        out = np.concatenate([mixer.render(256) for _ in range(5)])
+        assert np.flatnonzero(out)[0] == 3 * 256 + 77
+
+        mixer.trigger(impulse, frame=10)
+        assert mixer.render(256)[0] == 1.0
+        assert mixer.stats()["late_events"] == 1
+
+    def test_metronome_follows_tempo_without_drift(self):
+        """Teste que les clics tombent sur les temps exacts, avant et après un changement de tempo."""
+        core = AudioCore(bank_dir=None, volume=1.0, block_size=256)
+        sequencer = Sequencer(core, bpm=120.0, lookahead=0.05)
+        sequencer.metronome(beats_per_bar=4)
+        frames = []
+        original = core.mixer.trigger
+        core.mixer.trigger = lambda sample, gain=1.0, frame=None: (frames.append(frame), original(sample, gain, frame))
+        for _ in range(2000):
+            sequencer.pump()
+            core.mixer.render(256)
+            if core.mixer.frame_clock == 256 * 1000:
+                sequencer.set_tempo(90.0)
+
+        tempo = sequencer.tempo
+        change_beat = tempo._beats[-1]
+        assert tempo.bpm == 90.0
+        assert np.all(np.diff(frames) > 0)
+        expected = [tempo.frame_at(b) for b in range(int(tempo.beat_at(frames[0])), 10 ** 6)][:len(frames)]
+        assert frames == expected
+        # Au-delà du changement : exactement 44100 * 60 / 90 frames par temps
+        later = [f for f in frames if tempo.beat_at(f) > change_beat + 1]
+        assert later and np.allclose(np.diff(later), 44100 * 60 / 90, atol=1)
+        assert core.mixer.stats()["late_events"] == 0
+
+    def test_tempo_map_is_exact(self):
+        """Teste la conversion temps <-> frames par segments."""
+        tempo = TempoMap(48000, bpm=120.0)
+        tempo.set_tempo(60.0, 8.0)
+        assert tempo.frame_at(8) == 8 * 24000
+        assert tempo.frame_at(10_008) == 8 * 24000 + 10_000 * 48000
+        assert tempo.beat_at(tempo.frame_at(11.5)) == 11.5
+
+
+class TestLooper:
+    """Tests du looper multipiste."""
+
+    def test_layer_plays_back_next_cycle_only(self):
+        """Teste qu'une note captée n'est relue qu'au tour suivant, à la même position."""
+        mixer = Mixer(block_size=256)
+        looper = Looper(44100, loop_frames=2048, max_layers=4)
+        mixer.looper = looper
+        note = np.full(100, 0.5, dtype=np.float32)
+        mixer.render(256)
+        assert looper.record() == 0
+        looper.capture(note)
+        mixer.trigger(note)
+        first = np.concatenate([mixer.render(256) for _ in range(8)])
+        second = np.concatenate([mixer.render(256) for _ in range(8)])
+        assert looper.recording_layer is None
+        # Tour 1 : la voix seule ; tour 2 : la couche, au même endroit de la boucle
+        assert np.allclose(first[:100], 0.5) and np.allclose(first[100:], 0.0)
+        assert np.allclose(second[:100], 0.5) and np.count_nonzero(second) == 100
+
+    def test_overdub_mute_gain_and_mixdown(self):
+        """Teste l'overdub, le mute, le gain et le mixage en flux."""
+        import soundfile as sf
+        looper = Looper(44100, loop_frames=1000, max_layers=16)
+        out = np.zeros(1000, dtype=np.float32)
+        for layer, value in ((None, 0.1), (0, 0.2), (None, 0.4)):
+            looper.record(layer)
+            looper.capture(np.full(10, value, dtype=np.float32))
+            looper.render(np.zeros(1000, dtype=np.float32), 0)
+        assert looper.used.tolist()[:3] == [True, True, False]
+        looper.render(out, 0)
+        assert np.isclose(out[0], 0.7)
+        looper.set_muted(1, True)
+        looper.set_gain(0, 0.5)
+        out[:] = 0
+        looper.render(out, 0)
+        assert np.isclose(out[0], 0.15) and looper.stats()["active_layers"] == 1
+        assert looper.stats()["memory_bytes"] == 16 * 1000 * 4
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "loop.flac")
+            blocks = []
+            assert looper.mixdown(path, cycles=3, on_block=blocks.append)
+            data, rate = sf.read(path, dtype="float32")
+            assert len(data) == 3000 and np.isclose(data[2000], 0.15, atol=1e-3)
+            assert np.allclose(np.concatenate(blocks), data, atol=1e-4)
+            looper.record()
+            assert looper.writing and not looper.mixdown(path)
+
+    def test_mixdown_applies_master_chain(self):
+        """Teste que le mixage passe par le volume et le limiteur, comme la lecture."""
+        import soundfile as sf
+        looper = Looper(44100, loop_frames=5000, max_layers=16)
+        for _ in range(16):
+            looper.record()
+            looper.capture(np.full(5000, 0.2, dtype=np.float32))
+            looper.render(np.zeros(5000, dtype=np.float32), 0)
+        mixer = Mixer(44100, gain=0.5)
+        mixer.limiter = LookaheadLimiter(44100, threshold_db=-1.0)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "loop.wav")
+            assert looper.mixdown(path, cycles=2, fmt="wav", mixer=mixer)
+            data, _ = sf.read(path, dtype="float32")
+        # Somme brute 3.2, 1.6 après le volume : ramenée sous le seuil, sans écrêtage
+        assert len(data) == 10000
+        assert np.abs(data).max() <= 10 ** (-1.0 / 20) + 1e-4
+        assert data[5000] > 0.8
+        assert mixer.limiter.stats()["limited_frames"] == 0
+
+    def test_clear_drops_pending_tails(self):
+        """Teste qu'une couche effacée ne reçoit plus la queue des notes en cours."""
+        looper = Looper(44100, loop_frames=100, max_layers=2)
+        looper.record()
+        looper.capture(np.full(250, 0.3, dtype=np.float32))
+        looper.render(np.zeros(100, dtype=np.float32), 0)
+        assert looper.writing
+        looper.clear(0)
+        looper.render(np.zeros(100, dtype=np.float32), 100)
+        assert not looper.writing and not looper.buffers[0].any()
+
+    def test_ui_commands_applied_by_audio_thread(self):
+        """Teste qu'effacement et changement de longueur passent par le thread audio."""
+        looper = Looper(44100, loop_frames=100, max_layers=2)
+        looper.record()
+        looper.capture(np.full(250, 0.3, dtype=np.float32))
+        looper.render(np.zeros(100, dtype=np.float32), 0)
+        # L'interface n'écrit ni dans les voix ni dans le tampon
+        looper.clear(0)
+        assert looper.buffers[0].any() and len(looper._voices) == 1
+        assert not looper.used[0] and looper.stats()["active_layers"] == 0
+        looper.render(np.zeros(100, dtype=np.float32), 100)
+        assert not looper.buffers[0].any() and not looper.writing
+
+        looper.record()
+        looper.capture(np.full(250, 0.3, dtype=np.float32))
+        looper.render(np.zeros(100, dtype=np.float32), 0)
+        looper.set_length(200)
+        assert looper.loop_frames == 200 and not looper.used.any()
+        looper.render(np.zeros(100, dtype=np.float32), 0)
+        assert not looper.writing and not looper.buffers.any()
+
+
+class TestJam:
+    """Tests des sessions réseau (serveur et clients sur localhost)."""
+
+    def test_jitter_buffer_orders_and_counts_late(self):
+        """Teste le rejeu à instant + délai, dans l'ordre, et le comptage des retards."""
+        buffer = JitterBuffer(min_delay_us=10000, max_delay_us=10000)
+        buffer.push(1000, 3000, "b")
+        buffer.push(0, 2000, "a")
+        buffer.push(0, 50000, "late")
+        assert buffer.late == 1
+        assert buffer.pop_due(10999) == [(10000, "a")]
+        assert [p for _, p in buffer.pop_due(60000)] == ["b", "late"]
+
+    def test_notes_cross_clock_offset(self):
+        """Teste le relais d'une note entre deux clients dont les horloges diffèrent de 5 s."""
+        async def session():
+            server = JamServer()
+            port = await server.start("127.0.0.1", 0)
+            received = {"a": [], "b": []}
+            skew = 5_000_000
+            a = JamClient(on_note=lambda *n: received["a"].append(n),
+                          clock=lambda: monotonic_us() + skew, keep_latencies=True)
+            b = JamClient(on_note=lambda *n: received["b"].append(n), keep_latencies=True)
+            await a.connect("127.0.0.1", port)
+            await b.connect("127.0.0.1", port)
+            a.send_note(7, 90, "major")
+            for _ in range(100):
+                if received["b"]:
+                    break
+                await asyncio.sleep(0.01)
+            await a.close()
+            await b.close()
+            await server.close()
+            return a, b, received, skew
+
+        a, b, received, skew = asyncio.run(session())
+        assert received["b"] == [(a.client_id, 7, 90, "major")]
+        assert received["a"] == []
+        assert abs(a.sync.offset + skew) < 5000
+        # Rejoué après le délai du tampon de gigue, pas avant
+        assert b.latencies[0] >= b.jitter.min_delay_us
+        assert b.latencies[0] < b.jitter.min_delay_us + 50000
+
+    def test_backpressure_and_server_disconnect(self):
+        """Teste l'abandon des notes vers un client saturé et la fin de session côté client."""
+        async def session():
+            # Plafond négatif : tout client est considéré comme saturé
+            server = JamServer(max_buffer=-1)
+            port = await server.start("127.0.0.1", 0)
+            disconnected = asyncio.Event()
+            a = JamClient(on_note=lambda *n: None)
+            b = JamClient(on_note=lambda *n: None, on_disconnect=disconnected.set)
+            await a.connect("127.0.0.1", port)
+            await b.connect("127.0.0.1", port)
+            a.send_note(3)
+            for _ in range(100):
+                if server.dropped:
+                    break
+                await asyncio.sleep(0.01)
+            await server.close()
+            await asyncio.wait_for(disconnected.wait(), 2.0)
+            await asyncio.sleep(0)
+            tasks_done = all(task.done() for task in b._tasks)
+            await a.close()
+            await b.close()
+            return server, b, tasks_done
+
+        server, b, tasks_done = asyncio.run(session())
+        assert server.dropped == 1 and server.relayed == 0
+        assert b.arrived == 0
+        assert tasks_done and b._writer is None
+
+    def test_invalid_notes_are_dropped(self):
+        """Teste qu'une note hors bornes est écartée par le serveur et par le client."""
+        packet = MESSAGES[MSG_NOTE]
+
+        async def session():
+            server = JamServer()
+            port = await server.start("127.0.0.1", 0)
+            received = []
+            a = JamClient(on_note=lambda *n: None)
+            b = JamClient(on_note=lambda *n: received.append(n))
+            await a.connect("127.0.0.1", port)
+            await b.connect("127.0.0.1", port)
+            a._writer.write(packet.pack(MSG_NOTE, 0, 200, 100, 0, 0))
+            a._writer.write(packet.pack(MSG_NOTE, 0, 3, 100, 250, 0))
+            a.send_note(3)
+            for _ in range(100):
+                if received:
+                    break
+                await asyncio.sleep(0.01)
+            # Côté client : un paquet invalide reçu directement n'arrête pas le rejeu
+            b._reader.feed_data(packet.pack(MSG_NOTE, 1, 3, 100, 250, 0))
+            a.send_note(4)
+            for _ in range(100):
+                if len(received) == 2:
+                    break
+                await asyncio.sleep(0.01)
+            await a.close()
+            await b.close()
+            await server.close()
+            return server, b, received
+
+        server, b, received = asyncio.run(session())
+        assert server.rejected == 2 and server.relayed == 2
+        assert b.rejected == 1
+        assert [n[1] for n in received] == [3, 4]
+
+    def test_local_benchmark_delivers_everything(self):
+        """Teste le banc d'essai avec plusieurs clients simulés."""
+        report = asyncio.run(benchmark(clients=4, notes=20, rate=500.0, jitter_delay_ms=5))
+        assert report["delivered"] == report["expected"] == 4 * 3 * 20
+        assert report["latency_mean_ms"] >= 5
+
+
+class TestRenderService:
+    """Tests du service HTTP de rendu."""
+
+    def test_content_key_covers_engine_and_master_bus(self, monkeypatch):
+        """Teste que la fréquence du moteur et le bus maître entrent dans la clé de cache."""
+        events, fmt, tail = parse_score(json.dumps({"notes": [{"t": 0, "key": 3}]}).encode(),
+                                        "application/json", {})
+        key = RenderService.content_key(events, fmt, tail)
+        assert RenderService.content_key(events, fmt, tail) == key
+        monkeypatch.setattr(audio_core, "sample_rate", audio_core.sample_rate + 1)
+        assert RenderService.content_key(events, fmt, tail) != key
+        monkeypatch.undo()
+        for name, value in (("LIMITER_ENABLED", not config.LIMITER_ENABLED),
+                            ("LIMITER_THRESHOLD_DB", config.LIMITER_THRESHOLD_DB - 3),
+                            ("REVERB_WET", config.REVERB_WET + 0.2),
+                            ("REVERB_IR", "salle.wav")):
+            monkeypatch.setattr(config, name, value)
+            assert RenderService.content_key(events, fmt, tail) != key
+            monkeypatch.undo()
+
+    def test_batch_matches_individual_renders(self):
+        """Teste qu'un lot rend chaque partition comme un rendu séparé."""
+        import soundfile as sf
+        import io
+        scores = [
+            {"notes": [{"t": 0, "key": 3}, {"t": 120, "key": 9, "velocity": 60}], "tail": 0.2},
+            {"scale": "major", "notes": [{"t": 50, "key": 0, "velocity": 100}]},
+        ]
+        parsed = [parse_score(json.dumps(score).encode(), "application/json", {}) for score in scores]
+        blobs = render_batch([(pack_events(events), fmt, tail) for events, fmt, tail in parsed])
+        for (events, _, tail), blob in zip(parsed, blobs):
+            audio, rate = sf.read(io.BytesIO(blob), dtype="float32")
+            expected = render_events(events, audio_core, tail=tail)
+            assert rate == audio_core.sample_rate
+            assert len(audio) == len(expected)
+            assert np.allclose(audio, expected, atol=1e-3)
+
+    def test_http_auth_batching_and_cache(self):
+        """Teste l'authentification, le regroupement en lots et le cache par empreinte."""
+        async def session(db):
+            service = RenderService(db, workers=1, batch_window=0.05, prewarm_scales=("pentatonic",),
+                                    auth_ttl=0.2)
+            port = await service.start("127.0.0.1", 0)
+            auth = {"Authorization": basic_auth("alice", "secret"), "Content-Type": "application/json"}
+
+            async def post(body, headers):
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                response = await http_request(reader, writer, "POST", "/render", body, headers)
+                writer.close()
+                return response
+
+            bodies = [json.dumps({"notes": [{"t": 0, "key": k}]}).encode() for k in range(5)]
+            denied = await post(bodies[0], {"Content-Type": "application/json"})
+            first = await asyncio.gather(*(post(body, auth) for body in bodies))
+            again = await post(bodies[2], auth)
+            invalid = await post(b'{"notes": [{"t": 0, "key": 40}]}', auth)
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            listing = await http_request(reader, writer, "GET", "/recordings", headers=auth)
+            writer.close()
+            # Mot de passe changé : l'ancien est refusé dès l'expiration du cache
+            conn = db.get_connection()
+            with conn:
+                conn.execute("UPDATE users SET password_hash = ? WHERE username = 'alice'",
+                             (db.hash_password("nouveau"),))
+            conn.close()
+            await asyncio.sleep(0.25)
+            expired = await post(bodies[2], auth)
+            stats = service.stats()
+            await service.close()
+            return denied, first, again, invalid, listing, expired, stats
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db = Database(os.path.join(tmpdir, "test.db"))
+            db.create_user("alice", "secret")
+            user_id = db.verify_user("alice", "secret")
+            db.save_recording(user_id, "take.flac", 1.5, "Prise")
+            denied, first, again, invalid, listing, expired, stats = asyncio.run(session(db))
+
+        assert denied[0] == 401
+        assert all(status == 200 and headers["x-cache"] == "miss" for status, headers, _ in first)
+        assert first[0][2][:4] == b"RIFF"
+        assert again[0] == 200 and again[1]["x-cache"] == "hit" and again[2] == first[2][2]
+        assert invalid[0] == 400
+        assert [rec["name"] for rec in json.loads(listing[2])] == ["Prise"]
+        assert expired[0] == 401
+        # Les cinq requêtes simultanées ont été rendues en un seul lot
+        assert stats["renders"] == 5 and stats["batches"] == 1 and stats["cache_hits"] == 1
+
+
+def _shared_bank_worker(args):
+    """Processus du pool : s'attache à la banque et lit un sample (test)."""
+    descriptor, frequency = args
+    core = AudioCore(bank_dir=None)
+    core.attach_bank(descriptor)
+    sample = core.get_voice(frequency)
+    return float(np.sum(sample)), core.cache_stats()["misses"]
+
+
+class TestSharedBank:
+    """Tests de la banque de samples en mémoire partagée."""
+
+    def test_publish_attach_and_reuse(self):
+        """Teste la publication, l'attache sans copie et la réutilisation par empreinte."""
+        import pickle
+        publisher = AudioCore(bank_dir=None)
+        frequencies = [n.frequency for n in publisher.build_balafon_scale("pentatonic")]
+        descriptor = publisher.publish_bank(frequencies)
+        try:
+            assert len(pickle.dumps(descriptor)) < 4096
+            reader = AudioCore(bank_dir=None)
+            reader.attach_bank(descriptor)
+            sample = reader.get_voice(frequencies[5], layer=1)
+            assert not sample.flags.writeable and not sample.flags.owndata
+            assert np.array_equal(sample, reader.generate_sample(frequencies[5], 0.45, gain=1.0, brightness=0.7))
+            assert reader.cache_stats()["misses"] == 0
+
+            # Même banque en cours de publication ailleurs : attendue, puis reprise sans rendu
+            header = np.ndarray(2, dtype=np.int64, buffer=publisher._published[descriptor.key].buf)
+            header[0] = -1
+            done = threading.Timer(0.1, header.__setitem__, (0, descriptor.frames))
+            done.start()
+            other = AudioCore(bank_dir=None)
+            assert other.publish_bank(frequencies) == descriptor
+            done.join()
+            del header
+            assert other.cache_stats()["bank_renders"] == 0
+            # Un seul segment ouvert, gardé pour être fermé à la libération
+            assert list(other._attached) == [descriptor.key]
+            assert other.cache_stats()["bank_attaches"] == 1
+            other.release_shared_banks()
+            reader.release_shared_banks()
+        finally:
+            publisher.release_shared_banks()
+        with pytest.raises(FileNotFoundError):
+            AudioCore(bank_dir=None).attach_bank(descriptor)
+
+    def test_pool_workers_attach(self):
+        """Teste l'attache depuis des processus de rendu."""
+        from concurrent.futures import ProcessPoolExecutor
+        publisher = AudioCore(bank_dir=None)
+        frequencies = [n.frequency for n in publisher.build_balafon_scale("major")]
+        descriptor = publisher.publish_bank(frequencies)
+        try:
+            with ProcessPoolExecutor(2) as pool:
+                results = list(pool.map(_shared_bank_worker, [(descriptor, f) for f in frequencies[:4]]))
+            for frequency, (total, misses) in zip(frequencies, results):
+                assert misses == 0
+                assert np.isclose(total, float(np.sum(publisher.get_voice(frequency))))
+        finally:
+            publisher.release_shared_banks()
+
+
+class TestLibrary:
+    """Tests du stockage compressé et de l'export."""
+
+    def test_flac_recording_is_smaller(self):
+        """Teste que le stockage FLAC est plus léger que le WAV."""
+        import soundfile as sf
+        with tempfile.TemporaryDirectory() as tmpdir:
+            notes = audio_core.build_balafon_scale("pentatonic")[:8]
+            take = np.concatenate([audio_core.generate_sample(n.frequency) for n in notes])
+            wav = os.path.join(tmpdir, "take.wav")
+            flac = os.path.join(tmpdir, "take.flac")
+            assert audio_core.save_recording(take, wav)
+            assert audio_core.save_recording(take, flac)
+            assert sf.info(flac).format == "FLAC"
+            assert os.path.getsize(flac) < os.path.getsize(wav)
+
+    def test_transcode_formats(self):
+        """Teste le transcodage en flux vers chaque format."""
+        import soundfile as sf
+        with tempfile.TemporaryDirectory() as tmpdir:
+            src = os.path.join(tmpdir, "src.flac")
+            audio_core.save_recording(audio_core.generate_sample(440.0, duration=1.0), src)
+            for fmt in ("wav", "flac", "ogg"):
+                dst = os.path.join(tmpdir, f"out.{fmt}")
+                assert transcode(src, dst, fmt)
+                assert sf.info(dst).frames == sf.info(src).frames
+
+    def test_export_pool_progress(self):
+        """Teste la progression agrégée du pool d'export."""
+        import threading
+        with tempfile.TemporaryDirectory() as tmpdir:
+            jobs = []
+            for i in range(3):
+                src = os.path.join(tmpdir, f"src{i}.flac")
+                audio_core.save_recording(audio_core.generate_sample(440.0, duration=0.5), src)
+                # Longueur en cache pour la première, lue par le pool pour les autres
+                frames = len(audio_core.generate_sample(440.0, duration=0.5)) if i == 0 else None
+                jobs.append(ExportJob(src, os.path.join(tmpdir, f"dst{i}.wav"), "wav", frames))
+
+            reports = []
+            finished = threading.Event()
+            results = []
+            pool = ExportPool(workers=2)
+            pool.submit(jobs, lambda done, total: reports.append((done, total)),
+                        lambda res: (results.extend(res), finished.set()))
+            assert finished.wait(10)
+            pool.shutdown()
+            assert all(ok for _, ok in results)
+            total = 3 * len(audio_core.generate_sample(440.0, duration=0.5))
+            assert max(done for done, _ in reports) == total
+            assert all(done <= t <= total for done, t in reports) and reports[-1][1] == total
+
+    def test_safe_file_stem(self):
+        """Teste la neutralisation des noms saisis avant de les utiliser comme fichiers."""
+        assert safe_file_stem("Prise du soir") == "Prise du soir"
+        assert safe_file_stem("../../etc/passwd") == "_.._etc_passwd"
+        assert safe_file_stem("a/b\\c:d*e?f") == "a_b_c_d_e_f"
+        assert safe_file_stem("..") == safe_file_stem("") == "enregistrement"
+        assert safe_file_stem("con") == "_con" and safe_file_stem("COM1.txt") == "_COM1.txt"
+        assert len(safe_file_stem("x" * 500)) == 100
+
+
+class TestPeakPyramid:
+    """Tests de la pyramide de crêtes multi-résolution."""
+
+    def test_query_bounds_signal(self):
+        """Teste que min/max encadrent le signal à tous les zooms."""
+        x = np.sin(np.linspace(0, 300, 200003)).astype(np.float32)
+        pyramid = PeakPyramid.from_blocks(x[i:i + 7000] for i in range(0, len(x), 7000))
+        assert pyramid.frames == len(x)
+        assert len(pyramid.levels[-1]) == 1
+        for start, end, columns in [(0, len(x), 300), (1000, 2000, 50), (5000, 150000, 120)]:
+            mins, maxs, _ = pyramid.query(start, end, columns)
+            edges = np.linspace(start, end, columns + 1).astype(int)
+            true_max = np.array([x[a:b].max() for a, b in zip(edges[:-1], edges[1:])])
+            true_min = np.array([x[a:b].min() for a, b in zip(edges[:-1], edges[1:])])
+            assert np.all(maxs >= true_max - 1e-6)
+            assert np.all(mins <= true_min + 1e-6)
+
+    def test_blob_roundtrip(self, tmp_path):
+        """Teste la sérialisation et le stockage en base."""
+        pyramid = PeakPyramid.from_blocks([audio_core.generate_sample(440.0)])
+        db = Database(str(tmp_path / "test.db"))
+        db.create_user("user", "pass")
+        rec_id = db.save_recording(1, "rec.flac", 0.45)
+        db.save_waveform(rec_id, pyramid.to_bytes())
+        restored = PeakPyramid.from_bytes(db.get_waveforms(1)[rec_id])
+        assert restored.frames == pyramid.frames
+        assert all(np.array_equal(a, b) for a, b in zip(restored.levels, pyramid.levels))
+
+
+class TestLoudness:
+    """Tests de la mesure de sonie EBU R128 et de la normalisation."""
+
+    def test_reference_tone(self):
+        """Teste la pondération K et la sonie d'un sinus de référence, quel que soit le découpage."""
+        sos = k_weighting_sos(48000)
+        assert np.allclose(sos[0], [1.53512485958697, -2.69169618940638, 1.19839281085285,
+                                    1.0, -1.69065929318241, 0.73248077421585])
+        assert np.allclose(sos[1, 4:], [-1.99004745483398, 0.99007225036621])
+
+        # Sinus 1 kHz à -20 dBFS crête : -23.01 LUFS en mono
+        t = np.arange(48000 * 5) / 48000
+        x = (0.1 * np.sin(2 * np.pi * 997 * t)).astype(np.float32)
+        whole = LoudnessMeter.measure([x], 48000)
+        blocks = LoudnessMeter.measure((x[i:i + 1000] for i in range(0, len(x), 1000)), 48000)
+        assert abs(whole["loudness"] - (-23.01)) < 0.05
+        assert blocks["loudness"] == pytest.approx(whole["loudness"], abs=1e-6)
+
+        # Le silence est écarté par le seuil absolu (seuls les blocs de transition comptent)
+        padded = np.concatenate([np.zeros(48000 * 5, dtype=np.float32), x])
+        assert LoudnessMeter.measure([padded], 48000)["loudness"] == pytest.approx(whole["loudness"], abs=0.2)
+        # Une prise silencieuse reçoit une sentinelle pour ne pas être remesurée
+        assert LoudnessMeter.measure([np.zeros(48000, dtype=np.float32)], 48000)["loudness"] == SILENT_LOUDNESS
+        assert normalization_gain(SILENT_LOUDNESS, None) == 1.0
+
+    def test_true_peak_and_gain(self):
+        """Teste la crête vraie entre échantillons et le plafond du gain."""
+        # Sinus à fs/4 déphasé de 45° : échantillons à 0.707 de la crête réelle
+        n = np.arange(48000)
+        x = (0.5 * np.sin(np.pi / 2 * n + np.pi / 4)).astype(np.float32)
+        result = LoudnessMeter.measure([x], 48000)
+        assert 20 * np.log10(np.abs(x).max()) < -9.0
+        assert result["true_peak"] == pytest.approx(20 * np.log10(0.5), abs=0.1)
+
+        assert normalization_gain(-26.0, -12.0, target=-16.0) == pytest.approx(10 ** (10 / 20))
+        assert normalization_gain(-26.0, -3.0, target=-16.0, ceiling=-1.0) == pytest.approx(10 ** (2 / 20))
+        assert normalization_gain(None, None) == 1.0
+
+
+class TestRecordingMetadata:
+    """Tests du cache de métadonnées et du scan d'intégrité."""
+
+    def test_metadata_saved_with_recording(self, tmp_path):
+        """Teste le remplissage des métadonnées à la sauvegarde."""
+        path = str(tmp_path / "take.flac")
+        audio_core.save_recording(audio_core.generate_sample(440.0), path)
+        db = Database(str(tmp_path / "test.db"))
+        db.create_user("user", "pass")
+        rec_id = db.save_recording(1, path, 0.45, "Take", metadata=probe_file(path))
+        rec = db.get_recordings(1)[0]
+        assert rec['id'] == rec_id
+        assert rec['sample_rate'] == audio_core.sample_rate
+        assert rec['frames'] == len(audio_core.generate_sample(440.0))
+        assert rec['codec'].startswith("FLAC")
+        assert rec['file_size'] == os.path.getsize(path)
+        assert len(rec['content_hash']) == 64
+
+    def test_scan_reconciles_directory(self, tmp_path):
+        """Teste la détection des fichiers manquants, orphelins et modifiés."""
+        rec_dir = tmp_path / "recordings"
+        rec_dir.mkdir()
+        db = Database(str(tmp_path / "test.db"))
+        db.create_user("user", "pass")
+        paths = []
+        for i in range(3):
+            path = str(rec_dir / f"take{i}.flac")
+            audio_core.save_recording(audio_core.generate_sample(440.0), path)
+            db.save_recording(1, path, 0.45, metadata=probe_file(path))
+            paths.append(path)
+        audio_core.save_recording(audio_core.generate_sample(880.0), str(rec_dir / "orphan.flac"))
+        os.remove(paths[0])
+        audio_core.save_recording(audio_core.generate_sample(440.0, duration=1.0), paths[1])
+
+        report = scan_library(db, str(rec_dir))
+        by_file = {rec['filename']: rec for rec in db.get_recordings(1)}
+        assert report.missing == [by_file[paths[0]]['id']]
+        assert report.refreshed == [by_file[paths[1]]['id']]
+        assert report.orphans == [str(rec_dir / "orphan.flac")]
+        assert by_file[paths[0]]['missing'] == 1
+        assert abs(by_file[paths[1]]['duration'] - 1.0) < 0.01
+        # Les prises jamais mesurées le sont pendant le scan, une seule fois
+        assert sorted(report.measured) == sorted(by_file[p]['id'] for p in paths[1:])
+        assert by_file[paths[2]]['loudness'] is not None
+        second = scan_library(db, str(rec_dir))
+        assert second.refreshed == [] and second.measured == []
+
+    def test_scan_marks_silent_takes_measured(self, tmp_path):
+        """Teste que la sentinelle de silence évite de remesurer une prise muette."""
+        rec_dir = tmp_path / "recordings"
+        rec_dir.mkdir()
+        db = Database(str(tmp_path / "test.db"))
+        db.create_user("user", "pass")
+        path = str(rec_dir / "silence.flac")
+        audio_core.save_recording(np.zeros(audio_core.sample_rate, dtype=np.float32), path)
+        db.save_recording(1, path, 1.0, metadata=probe_file(path))
+
+        assert len(scan_library(db, str(rec_dir)).measured) == 1
+        assert db.get_recordings(1)[0]['loudness'] == SILENT_LOUDNESS
+        assert scan_library(db, str(rec_dir)).measured == []
+
+
+class TestPerformanceEvents:
+    """Tests du stockage des prises en séquences d'événements."""
+
+    def test_pack_roundtrip_is_compact(self):
+        """Teste la sérialisation compacte des événements."""
+        recorder = PerformanceRecorder()
+        for i in range(100):
+            recorder.add(i % 22, "major", velocity=90, onset_us=i * 250000)
+        events = recorder.events()
+        blob = pack_events(events)
+        assert len(blob) == 100 * EVENT_DTYPE.itemsize
+        assert np.array_equal(unpack_events(blob), events)
+
+    def test_render_places_notes_at_onsets(self):
+        """Teste que le mixeur hors ligne place chaque note à sa frame."""
+        core = AudioCore(bank_dir=None)
+        recorder = PerformanceRecorder()
+        recorder.add(0, onset_us=0)
+        recorder.add(5, onset_us=500000)
+        audio = render_events(recorder.events(), core)
+
+        notes = core.build_balafon_scale("pentatonic")
+        first = core.get_cached_sample(notes[0].frequency) * core.volume
+        second = core.get_cached_sample(notes[5].frequency) * core.volume
+        onset = core.sample_rate // 2
+        assert len(audio) == onset + len(second)
+        assert np.allclose(audio[:len(first)], first, atol=1e-6)
+        assert np.allclose(audio[onset:], second, atol=1e-6)
+
+    def test_performance_stored_in_db(self, tmp_path):
+        """Teste la table performance_events (BLOB par enregistrement)."""
+        db = Database(str(tmp_path / "test.db"))
+        db.create_user("user", "pass")
+        rec_id = db.save_recording(1, "rec.flac", 1.0)
+        recorder = PerformanceRecorder()
+        recorder.add(3, onset_us=1000)
+        db.save_performance(rec_id, pack_events(recorder.events()), 1, AudioCore.ENGINE_VERSION)
+        assert np.array_equal(unpack_events(db.get_performance(rec_id)), recorder.events())
+        db.delete_recordings([rec_id])
+        assert db.get_performance(rec_id) is None
+
+
+class TestMidi:
+    """Tests de l'import/export MIDI."""
+
+    def test_export_import_roundtrip(self, tmp_path):
+        """Teste qu'une performance survit à un aller-retour MIDI."""
+        recorder = PerformanceRecorder()
+        for i, key in enumerate([0, 4, 9, 21, 13]):
+            recorder.add(key, velocity=60 + i, onset_us=i * 333000)
+        events = recorder.events()
+        path = str(tmp_path / "take.mid")
+        assert write_midi(events, path, audio_core)
+
+        imported = import_midi(path, audio_core, "pentatonic")
+        assert np.array_equal(imported["key"], events["key"])
+        assert np.array_equal(imported["velocity"], events["velocity"])
+        assert np.all(np.abs(imported["onset_us"] - events["onset_us"]) < 1100)
+
+    def test_repeated_note_is_not_cut_short(self, tmp_path):
+        """Teste qu'une note rejouée pendant sa durée n'est pas éteinte par la précédente."""
+        recorder = PerformanceRecorder()
+        recorder.add(4, duration=1.0, onset_us=0)
+        recorder.add(4, duration=1.0, onset_us=250000)
+        path = tmp_path / "repeat.mid"
+        assert write_midi(recorder.events(), str(path), audio_core)
+
+        data = path.read_bytes()
+        pos, end = 22 + 7, len(data) - 4  # après l'en-tête, le tempo ; avant la fin de piste
+        tick, messages = 0, []
+        while pos < end:
+            delta, pos = _read_vlq(data, pos)
+            tick += delta
+            messages.append((tick, data[pos] & 0xF0))
+            pos += 3
+        # on, off coupé à la nouvelle frappe, on, off à pleine durée
+        assert [status for _, status in messages] == [0x90, 0x80, 0x90, 0x80]
+        assert messages[1][0] == messages[2][0]
+        assert messages[3][0] > messages[2][0]
+
+    def test_streaming_parser_format1(self, tmp_path):
+        """Teste la fusion des pistes, le running status et les changements de tempo."""
+        def track(body: bytes) -> bytes:
+            return b"MTrk" + len(body).to_bytes(4, "big") + body
+        # Piste de tempo : 120 BPM puis 60 BPM au tick 480
+        tempo = track(b"\x00\xff\x51\x03\x07\xa1\x20"
+                      b"\x83\x60\xff\x51\x03\x0f\x42\x40"
+                      b"\x00\xff\x2f\x00")
+        # Notes en running status : tick 0, 480, 960
+        notes = track(b"\x00\x90\x3c\x40"
+                      b"\x83\x60\x3e\x40"
+                      b"\x83\x60\x40\x40"
+                      b"\x00\x40\x00"
+                      b"\x00\xff\x2f\x00")
+        path = tmp_path / "song.mid"
+        path.write_bytes(b"MThd" + (6).to_bytes(4, "big") + b"\x00\x01\x00\x02\x01\xe0"
+                         + tempo + notes)
+        parsed = list(iter_midi_notes(str(path)))
+        assert [n.note for n in parsed] == [60, 62, 64]
+        assert [n.time_us for n in parsed] == [0, 500000, 1500000]
+
+    def test_nearest_note_quantization(self):
+        """Teste la projection sur la lame la plus proche."""
+        notes = audio_core.build_balafon_scale("pentatonic")
+        # Do4 = 60 -> lame 0 ; Fa4 = 65 -> lame 2 (Mi) ; Fa#4 = 66 -> lame 3 (Sol)
+        assert list(nearest_keys([60, 65, 66, 20, 127], notes)) == [0, 2, 3, 0, 21]
+
+
+class TestInputDevices:
+    """Tests des couches de vélocité et du thread d'entrée MIDI."""
+
+    def test_velocity_layers(self):
+        """Teste que les frappes douces sont plus sourdes, et mises en banque."""
+        core = AudioCore(bank_dir=None)
+        assert [core.velocity_layer(v) for v in (1, 48, 49, 96, 127)] == [0, 0, 1, 1, 2]
+
+        def harmonic_ratio(sample):
+            spectrum = np.abs(np.fft.rfft(sample))
+            freqs = np.fft.rfftfreq(len(sample), 1 / core.sample_rate)
+            return spectrum[np.argmin(np.abs(freqs - 880))] / spectrum[np.argmin(np.abs(freqs - 440))]
+
+        soft = core.get_cached_sample(440.0, layer=0)
+        loud = core.get_cached_sample(440.0, layer=2)
+        assert harmonic_ratio(soft) < harmonic_ratio(loud)
+        assert np.array_equal(loud, core.get_cached_sample(440.0))
+
+        core.load_bank([440.0, 880.0])
+        assert core.cache_stats()["entries"] == 2 * len(AudioCore.VELOCITY_LAYERS)
+
+    def test_loopback_input_thread(self):
+        """Teste le routage note MIDI -> lame et les statistiques de latence."""
+        notes = audio_core.build_balafon_scale("pentatonic")
+        received = []
+        done = threading.Event()
+
+        def on_note(key, velocity, timestamp_ns):
+            received.append((key, velocity))
+            if len(received) == 2:
+                done.set()
+
+        engine = InputEngine(audio_core, notes, on_note=on_note)
+        pad = LoopbackBackend("pad")
+        engine.add_source(pad)
+        engine.start()
+        try:
+            pad.note_on(60, 30)
+            pad.note_off(60)
+            pad.note_on(64, 110)
+            assert done.wait(2.0)
+        finally:
+            engine.stop()
+
+        assert received == [(0, 30), (2, 110)]
+        stats = engine.stats()["pad"]
+        assert stats["events"] == 2
+        assert 0.0 <= stats["mean_ms"] <= stats["max_ms"]
+
 
 class TestDatabase:
     """Tests de la base de données."""
@@ -79,6 +1208,21 @@ class TestDatabase:
         assert user_id is not None
         assert temp_db.verify_user("testuser", "wrongpass") is None
 
+    def test_bulk_delete_and_rename(self, temp_db):
+        """Teste les opérations groupées en une transaction."""
+        temp_db.create_user("testuser", "pass")
+        ids = [temp_db.save_recording(1, f"rec{i}.flac", 1.0) for i in range(5)]
+        for rec_id in ids:
+            temp_db.save_waveform(rec_id, b"pyramid")
+
+        assert temp_db.rename_recordings([(ids[0], "Premier"), (ids[1], "Second")])
+        names = {rec['id']: rec['name'] for rec in temp_db.get_recordings(1)}
+        assert names[ids[0]] == "Premier" and names[ids[1]] == "Second"
+
+        assert temp_db.delete_recordings(ids[:3])
+        assert sorted(rec['id'] for rec in temp_db.get_recordings(1)) == ids[3:]
+        assert sorted(temp_db.get_waveforms(1)) == ids[3:]
+
     def test_save_recording(self, temp_db):
         """Teste la sauvegarde de métadonnées."""
         user_id = temp_db.create_user("testuser", "pass") and 1
@@ -87,6 +1231,69 @@ class TestDatabase:
         recs = temp_db.get_recordings(user_id)
         assert len(recs) > 0
 
+    def test_search_follows_edits(self, temp_db):
+        """L'index plein texte suit les ajouts, renommages, étiquettes et suppressions."""
+        assert temp_db.fts
+        temp_db.create_user("testuser", "pass")
+        first = temp_db.save_recording(1, "a.flac", 1.0, "Balafon du matin")
+        second = temp_db.save_recording(1, "b.flac", 1.0, "Improvisation")
+
+        def ids(query):
+            return [rec['id'] for rec in temp_db.search_recordings(1, query)[0]]
+
+        assert ids("bala") == [first]
+        assert ids("matin") == [first]
+        assert temp_db.rename_recordings([(second, "Répétition générale")])
+        assert ids("repetition") == [second]  # accents ignorés
+        assert ids("impro") == []
+
+        assert temp_db.set_recording_details(second, ["live", "Pentatonique"], "Prise avec le quartet")
+        assert ids("tag:penta") == [second]
+        assert ids("tag:matin") == []
+        assert ids("quartet live") == [second]
+        assert ids('"') == ids("") == [second, first]
+
+        assert temp_db.delete_recordings([second])
+        assert ids("quartet") == []
+
+    def test_search_pagination_speed(self, temp_db):
+        """Recherche paginée rapide même pour un mot présent partout (bench_search.py pour le détail)."""
+        temp_db.create_user("testuser", "pass")
+        conn = temp_db.get_connection()
+        with conn:
+            conn.executemany(
+                "INSERT INTO recordings (user_id, filename, duration, name, tags) VALUES (1, ?, 1.0, ?, ?)",
+                [(f"rec{i}.flac", f"Prise {i}", "gamme" if i % 10 == 0 else "")
+                 for i in range(20000)]
+            )
+        conn.close()
+
+        rows, more = temp_db.search_recordings(1, "tag:gamme", limit=200)
+        assert len(rows) == 200 and more
+        page, more = temp_db.search_recordings(1, "tag:gamme", limit=200, offset=200)
+        assert len(page) == 200 and more
+        assert not {r['id'] for r in rows} & {r['id'] for r in page}
+        # Les candidats classés sont les correspondances les plus récentes
+        if temp_db.fts:
+            assert min(r['id'] for r in rows + page) > 20000 - FTS_CANDIDATES * 10
+
+        # Médiane sur une table remplie : le mot « prise » correspond à toutes les lignes
+        latencies = []
+        for _ in range(10):
+            start = time.perf_counter()
+            temp_db.search_recordings(1, "prise", limit=50, offset=100)
+            latencies.append(time.perf_counter() - start)
+        assert np.median(latencies) < 0.05
+
+    def test_search_fallback_escapes_like_wildcards(self, temp_db):
+        """Teste que % et _ saisis sont cherchés littéralement sans FTS5."""
+        temp_db.create_user("testuser", "pass")
+        for name in ("remix 100%", "remix 1000", "a_b", "axb"):
+            temp_db.save_recording(1, f"{name}.flac", 1.0, name)
+        temp_db.fts = False
+        assert [r['name'] for r in temp_db.search_recordings(1, "100%")[0]] == ["remix 100%"]
+        assert [r['name'] for r in temp_db.search_recordings(1, "a_b")[0]] == ["a_b"]
+
 
 class TestIntegration:
     """Tests d'intégration complets."""
@@ -1,16 +1,18 @@
 """Interface utilisateur moderne - Style React avec PyQt5.
 
 Design moderne, responsive et élégant avec visualisations professionnelles.
-Optimisé: Oscilloscope supprimé, Spectre conservé, Onglet Paramètres ajouté.
+Optimisé: Spectre conservé, Onglet Paramètres ajouté, Oscilloscope natif (QPainter)
+alimenté par la sortie du mixeur.
 Nouveau: Onglet Enregistrements pour lire les fichiers WAV sauvegardés.
 """
 
 import sys
 import os
 import json
+import threading
+import time
 import numpy as np
 import sounddevice as sd
-import soundfile as sf
 from typing import Optional
 from pathlib import Path
 
@@ -20,17 +22,29 @@ from PyQt5.QtWidgets import (
     QComboBox, QScrollArea, QListWidget, QListWidgetItem, QCheckBox,
     QSpinBox, QTabWidget, QDoubleSpinBox
 )
-from PyQt5.QtCore import Qt, QTimer, QSize, pyqtSignal, QObject, QThread
+from PyQt5.QtCore import Qt, QTimer, QSize, pyqtSignal, QObject, QThread, QLineF, QRect, QRectF, QEvent
 from PyQt5.QtGui import (
     QFont, QPalette, QColor, QIcon, QBrush, QLinearGradient,
-    QKeySequence
+    QKeySequence, QPainter, QPixmap, QPen, QPolygonF, QImage, qRgb
 )
 
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-
-from core import audio_core, Note
-from database import Database
+import config
+from analysis import (
+    LogSpectrumMapper, LoudnessMeter, PeakPyramid, SpectrogramRing, StreamingSTFT, normalization_gain,
+    quantize_db, spectrogram_columns
+)
+from core import AudioCore, audio_core
+from database import Database, split_tags
+from dsp import RingBuffer, find_trigger, minmax_decimate
+from input_devices import InputEngine, RtMidiBackend
+from jam import JamClient
+from library import (
+    EXPORT_FORMATS, ExportJob, ExportPool, probe_file, recording_path, safe_file_stem, scan_library
+)
+from looper import Looper
+from midi_io import import_midi, write_midi
+from performance import PerformanceRecorder, pack_events, render_events, unpack_events
+from sequencer import Sequencer
 
 # ============================================================================
 # PALETTES MODERNES
@@ -227,141 +241,680 @@ def get_stylesheet(theme: dict) -> str:
 # COMPOSANTS RÉUTILISABLES
 # ============================================================================
 
-class ModernKey(QPushButton):
-    """Lame du balafon avec dimensions réalistes."""
+class BalafonKeyboard(QWidget):
+    """Les 22 lames du balafon, dessinées par un seul widget.
+
+    Chaque état de lame (repos, survol, active) est rendu une fois dans un
+    QPixmap par largeur et par thème ; un appui ne coûte qu'un `update()`
+    du rectangle de la lame et un changement de thème un seul repaint.
+    Les surbrillances expirent via un timer partagé.
+    """
 
-    key_pressed = pyqtSignal(float)
+    key_pressed = pyqtSignal(int)
 
-    def __init__(self, note: Note, key_width: int = 45):
-        super().__init__()
-        self.note = note
-        self.key_width = key_width
-        self.is_active = False
-        self.setFixedSize(key_width, 180)
+    HIGHLIGHT_MS = 150
+    KEY_HEIGHT = 180
+    SPACING = 2
+    PER_ROW = 11
+
+    def __init__(self, notes: list, theme: dict, parent=None):
+        super().__init__(parent)
+        self.notes = notes
+        self.theme = theme
+        self._pixmaps = {}
+        self._active = {}   # indice -> échéance (s, time.monotonic)
+        self._hover = None
+        self._rects = []
+        self.setMouseTracking(True)
         self.setCursor(Qt.PointingHandCursor)
-        self.clicked.connect(self._on_click)
-        
-        # Style initial
-        self.update_style(False)
-
-    def _on_click(self):
-        """Déclenche la note et le signal."""
-        audio_core.play_async(self.note.frequency)
-        self.key_pressed.emit(self.note.frequency)
-        self.activate()
-
-    def activate(self):
-        """Active la lame (subrillance)."""
-        if not self.is_active:
-            self.is_active = True
-            self.update_style(True)
-            QTimer.singleShot(150, self.deactivate)
-
-    def deactivate(self):
-        """Désactive la lame."""
-        if self.is_active:
-            self.is_active = False
-            self.update_style(False)
-
-    def update_style(self, active: bool):
-        """Met à jour le style visuel."""
-        theme = COLORS["dark"]
-        color = theme['accent_light'] if active else "#8B6F47"
-        glow = f"box-shadow: 0 0 16px {theme['accent']};" if active else ""
-        
-        self.setStyleSheet(f"""
-            QPushButton {{
-                background-color: {color};
-                border: 2px solid #2e1f14;
-                border-radius: 6px;
-                {glow}
-            }}
-            QPushButton:hover {{
-                background-color: #9d7f52;
-            }}
-        """)
+        # Écrans tactiles : plusieurs lames frappées simultanément
+        self.setAttribute(Qt.WA_AcceptTouchEvents)
+
+        self._expire_timer = QTimer(self)
+        self._expire_timer.setSingleShot(True)
+        self._expire_timer.timeout.connect(self._expire)
+        self._layout_keys()
+
+    @staticmethod
+    def key_width(idx: int) -> int:
+        """Largeur d'une lame : plus large au centre du clavier."""
+        return max(30, 50 - abs(idx - 11))
+
+    def _layout_keys(self):
+        self._rects = []
+        for i in range(len(self.notes)):
+            row, col = divmod(i, self.PER_ROW)
+            x = sum(self.key_width(j) + self.SPACING for j in range(row * self.PER_ROW, i))
+            y = row * (self.KEY_HEIGHT + self.SPACING)
+            self._rects.append(QRect(x, y, self.key_width(i), self.KEY_HEIGHT))
+        bounds = QRect()
+        for rect in self._rects:
+            bounds = bounds.united(rect)
+        self.setMinimumSize(bounds.width(), bounds.height())
+
+    def sizeHint(self) -> QSize:
+        return self.minimumSize()
+
+    def _pixmap(self, state: str, width: int) -> QPixmap:
+        """Rendu (mis en cache) d'une lame dans un état donné."""
+        key = (state, width)
+        pixmap = self._pixmaps.get(key)
+        if pixmap is None:
+            colors = {
+                "idle": self.theme['wood'],
+                "hover": "#9d7f52",
+                "active": self.theme['accent_light'],
+            }
+            pixmap = QPixmap(width, self.KEY_HEIGHT)
+            pixmap.fill(Qt.transparent)
+            painter = QPainter(pixmap)
+            painter.setRenderHint(QPainter.Antialiasing)
+            if state == "active":
+                painter.setPen(QPen(QColor(self.theme['accent']), 3))
+            else:
+                painter.setPen(QPen(QColor("#2e1f14"), 2))
+            painter.setBrush(QColor(colors[state]))
+            painter.drawRoundedRect(QRectF(1.5, 1.5, width - 3, self.KEY_HEIGHT - 3), 6, 6)
+            painter.end()
+            self._pixmaps[key] = pixmap
+        return pixmap
 
+    def set_theme(self, theme: dict):
+        """Change de thème : les rendus sont recalculés au prochain repaint."""
+        self.theme = theme
+        self._pixmaps.clear()
+        self.update()
+
+    def set_notes(self, notes: list):
+        self.notes = notes
+        self._layout_keys()
+        self.update()
+
+    def is_active(self, idx: int) -> bool:
+        return idx in self._active
+
+    def activate(self, idx: int):
+        """Met une lame en surbrillance pendant HIGHLIGHT_MS."""
+        if not 0 <= idx < len(self._rects):
+            return
+        self._active[idx] = time.monotonic() + self.HIGHLIGHT_MS / 1000
+        self.update(self._rects[idx])
+        if not self._expire_timer.isActive():
+            self._expire_timer.start(self.HIGHLIGHT_MS)
+
+    def _expire(self):
+        """Éteint les lames échues et se réarme sur la prochaine échéance."""
+        now = time.monotonic()
+        for idx in [i for i, deadline in self._active.items() if deadline <= now]:
+            del self._active[idx]
+            self.update(self._rects[idx])
+        if self._active:
+            delay = min(self._active.values()) - now
+            self._expire_timer.start(max(1, int(delay * 1000)))
+
+    def key_at(self, pos) -> Optional[int]:
+        for i, rect in enumerate(self._rects):
+            if rect.contains(pos):
+                return i
+        return None
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        dirty = event.rect()
+        for i, rect in enumerate(self._rects):
+            if not rect.intersects(dirty):
+                continue
+            if i in self._active:
+                state = "active"
+            elif i == self._hover:
+                state = "hover"
+            else:
+                state = "idle"
+            painter.drawPixmap(rect.topLeft(), self._pixmap(state, rect.width()))
+        painter.end()
+
+    def event(self, event):
+        if event.type() in (QEvent.TouchBegin, QEvent.TouchUpdate):
+            for point in event.touchPoints():
+                if point.state() & Qt.TouchPointPressed:
+                    idx = self.key_at(point.pos().toPoint())
+                    if idx is not None:
+                        self.key_pressed.emit(idx)
+            event.accept()
+            return True
+        if event.type() in (QEvent.TouchEnd, QEvent.TouchCancel):
+            event.accept()
+            return True
+        return super().event(event)
+
+    def mousePressEvent(self, event):
+        idx = self.key_at(event.pos())
+        if idx is not None:
+            self.key_pressed.emit(idx)
+
+    def mouseMoveEvent(self, event):
+        idx = self.key_at(event.pos())
+        if idx != self._hover:
+            for old in (self._hover, idx):
+                if old is not None:
+                    self.update(self._rects[old])
+            self._hover = idx
+
+    def leaveEvent(self, event):
+        if self._hover is not None:
+            self.update(self._rects[self._hover])
+            self._hover = None
+
+
+class NativeSpectrumWidget(QWidget):
+    """Analyseur de spectre dessiné directement au QPainter.
+
+    Fréquences en échelle logarithmique, magnitudes en dB, une colonne par
+    pixel. La projection bins -> colonnes est précalculée par taille de
+    FFT et largeur ; le spectre de chaque note est mis en cache. Les pics
+    sont maintenus puis redescendent à `PEAK_DECAY_DB_PER_S`.
+    """
 
-class SpectrumWidget(FigureCanvas):
-    """Analyseur de spectre FFT moderne et optimisé."""
+    PEAK_DECAY_DB_PER_S = 30.0
+    FREQ_TICKS = (100, 200, 500, 1000, 2000, 5000)
 
-    def __init__(self, parent=None):
-        self.fig = Figure(figsize=(5, 3), dpi=100, facecolor='#0f1419')
-        super().__init__(self.fig)
-        self.setParent(parent)
+    def __init__(self, theme: dict, parent=None):
+        super().__init__(parent)
+        self.theme = theme
+        self.f_min = config.SPECTRUM_MIN_FREQ
+        self.f_max = config.SPECTRUM_RANGE
+        self.db_floor = config.SPECTRUM_DB_FLOOR
         self.setMinimumHeight(250)
-        
-        self.ax = self.fig.add_subplot(111)
-        self.ax.set_facecolor('#1a1f2e')
-        self.ax.set_title('Spectre Fréquentiel', color='#f1f5f9', fontsize=12, fontweight='bold')
-        self.ax.set_xlabel('Fréquence (Hz)', color='#94a3b8')
-        self.ax.set_ylabel('Magnitude', color='#94a3b8')
-        self.ax.grid(True, color='#334155', alpha=0.3, linestyle='--')
-        self.ax.set_xlim(0, 2000)
-        self.ax.set_ylim(0, 1.2)
-        
-        for spine in self.ax.spines.values():
-            spine.set_color('#334155')
-        self.ax.tick_params(colors='#94a3b8')
+
+        self._mappers = {}
+        self._spectra = {}
+        self._frequency = None
+        self._columns = 0
+        self._levels = np.zeros(0)
+        self._peaks = np.zeros(0)
+        self._curve = QPolygonF()
+        self._peak_line = QPolygonF()
+        self._curve_points = np.zeros((0, 2))
+        self._peak_points = np.zeros((0, 2))
+        self._last_tick = time.monotonic()
+
+        self.decay_timer = QTimer(self)
+        self.decay_timer.setInterval(config.FRAME_INTERVAL_MS)
+        self.decay_timer.timeout.connect(self._decay_peaks)
+
+    @staticmethod
+    def _polygon(points: int):
+        """QPolygonF préalloué et sa vue NumPy (n, 2) en float64."""
+        polygon = QPolygonF(points)
+        pointer = polygon.data()
+        pointer.setsize(points * 2 * 8)
+        return polygon, np.frombuffer(pointer, dtype=np.float64).reshape(-1, 2)
+
+    def _mapper(self, n_fft: int) -> LogSpectrumMapper:
+        key = (n_fft, audio_core.sample_rate, self._columns)
+        mapper = self._mappers.get(key)
+        if mapper is None:
+            mapper = LogSpectrumMapper(n_fft, audio_core.sample_rate, self.f_min, self.f_max,
+                                       self._columns, self.db_floor)
+            self._mappers[key] = mapper
+        return mapper
+
+    def _note_levels(self, frequency: float) -> np.ndarray:
+        """Niveaux (dB) par colonne du spectre d'une note, mis en cache."""
+        key = (round(frequency, 2), round(audio_core.duration, 3), self._columns, audio_core.sample_rate)
+        levels = self._spectra.get(key)
+        if levels is None:
+            sample = audio_core.get_cached_sample(frequency)
+            levels = self._mapper(len(sample))(np.abs(np.fft.rfft(sample)))
+            self._spectra[key] = levels
+        return levels
+
+    def resizeEvent(self, event):
+        self._columns = max(2, self.width())
+        self._curve, self._curve_points = self._polygon(self._columns + 2)
+        self._peak_line, self._peak_points = self._polygon(self._columns)
+        self._curve_points[:self._columns, 0] = np.arange(self._columns)
+        self._peak_points[:, 0] = np.arange(self._columns)
+        self._levels = np.full(self._columns, self.db_floor)
+        self._peaks = self._levels.copy()
+        if self._frequency is not None:
+            self._levels = self._note_levels(self._frequency)
+            self._peaks = self._levels.copy()
+        self._update_points()
+        super().resizeEvent(event)
+
+    def _y(self, levels: np.ndarray) -> np.ndarray:
+        return (levels / self.db_floor) * (self.height() - 1)
+
+    def _update_points(self):
+        height = self.height()
+        self._curve_points[:self._columns, 1] = self._y(self._levels)
+        self._curve_points[self._columns] = (self._columns - 1, height)
+        self._curve_points[self._columns + 1] = (0, height)
+        self._peak_points[:, 1] = self._y(self._peaks)
 
     def update_spectrum(self, frequency: float):
-        """Met à jour le spectre en temps réel."""
+        """Affiche le spectre de la note jouée."""
+        if self._columns == 0:
+            self._frequency = frequency
+            return
         try:
-            self.ax.clear()
-            self.ax.set_facecolor('#1a1f2e')
-            
-            sample = audio_core.get_cached_sample(frequency)
-            freqs, mags = audio_core.analyze_spectrum(sample)
-            
-            self.ax.bar(freqs, mags, width=10, color='#10b981', alpha=0.8, edgecolor='#059669')
-            
-            self.ax.set_xlim(0, 2000)
-            self.ax.set_ylim(0, 1.2)
-            self.ax.set_title('Spectre Fréquentiel', color='#f1f5f9')
-            self.ax.set_xlabel('Fréquence (Hz)', color='#94a3b8')
-            self.ax.set_ylabel('Magnitude', color='#94a3b8')
-            self.ax.grid(True, color='#334155', alpha=0.3)
-            self.ax.tick_params(colors='#94a3b8')
-            
-            for spine in self.ax.spines.values():
-                spine.set_color('#334155')
-            
-            self.fig.tight_layout()
-            self.draw()
+            self._frequency = frequency
+            self._levels = self._note_levels(frequency)
+            self._peaks = np.maximum(self._peaks, self._levels)
+            self._update_points()
+            self._last_tick = time.monotonic()
+            if not self.decay_timer.isActive():
+                self.decay_timer.start()
+            self.update()
         except Exception as e:
             print(f"Erreur spectrum: {e}")
-    
+
+    def _decay_peaks(self):
+        """Fait redescendre les pics maintenus vers le niveau courant."""
+        now = time.monotonic()
+        decay = self.PEAK_DECAY_DB_PER_S * (now - self._last_tick)
+        self._last_tick = now
+        self._peaks = np.maximum(self._peaks - decay, self._levels)
+        if np.array_equal(self._peaks, self._levels):
+            self.decay_timer.stop()
+        self._update_points()
+        self.update()
+
     def set_theme(self, theme: dict):
-        """Change le thème du spectre."""
-        self.fig.patch.set_facecolor(theme['bg'])
-        self.ax.set_facecolor(theme['surface'])
-        self.ax.set_title('Spectre Fréquentiel', color=theme['text'])
-        self.ax.tick_params(colors=theme['text_muted'])
-        self.draw()
+        """Change le thème du spectre (un seul repaint)."""
+        self.theme = theme
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        width, height = self.width(), self.height()
+        painter.fillRect(self.rect(), QColor(self.theme['surface']))
+
+        # Grille : une ligne tous les 12 dB, repères de fréquence
+        grid = QColor(self.theme['text_muted'])
+        grid.setAlphaF(config.GRID_ALPHA)
+        painter.setPen(grid)
+        for db in range(-12, int(self.db_floor), -12):
+            y = db / self.db_floor * (height - 1)
+            painter.drawLine(QLineF(0, y, width, y))
+        span = np.log(self.f_max / self.f_min)
+        for tick in self.FREQ_TICKS:
+            if self.f_min < tick < self.f_max:
+                x = np.log(tick / self.f_min) / span * self._columns
+                painter.setPen(grid)
+                painter.drawLine(QLineF(x, 0, x, height))
+                painter.setPen(QColor(self.theme['text_muted']))
+                label = f"{tick // 1000}k" if tick >= 1000 else str(tick)
+                painter.drawText(int(x) + 3, height - 4, label)
+
+        fill = QColor(self.theme['success'])
+        fill.setAlphaF(0.6)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(fill)
+        painter.drawPolygon(self._curve)
+
+        painter.setPen(QPen(QColor(self.theme['warning']), 1))
+        painter.drawPolyline(self._peak_line)
+        painter.end()
+
+
+def create_spectrum_widget(theme: dict) -> QWidget:
+    """Spectre selon `config.SPECTRUM_BACKEND` ; matplotlib n'est importé qu'à la demande."""
+    if config.SPECTRUM_BACKEND == "matplotlib":
+        try:
+            from spectrum_mpl import SpectrumWidget
+            return SpectrumWidget()
+        except ImportError as e:
+            print(f"matplotlib indisponible, spectre natif utilisé: {e}")
+    return NativeSpectrumWidget(theme)
+
+
+class OscilloscopeWidget(QWidget):
+    """Forme d'onde en direct, lue dans la copie de sortie du mixeur.
+
+    La fenêtre est calée sur un front montant (image stable), réduite en
+    paires min/max à la largeur du widget puis tracée d'un seul
+    `drawPolyline` depuis un QPolygonF préalloué, rempli sans copie.
+    """
+
+    def __init__(self, tap: RingBuffer, theme: dict, samples: int = config.OSCILLOSCOPE_SAMPLES, parent=None):
+        super().__init__(parent)
+        self.tap = tap
+        self.theme = theme
+        self.samples = samples
+        self.trigger_level = 0.0
+        # Fenêtre affichée + marge de recherche du déclenchement
+        self._buffer = np.zeros(2 * samples, dtype=np.float32)
+        self._polygon = QPolygonF()
+        self._points = np.zeros((0, 2))
+        self._last_written = -1
+        self.setMinimumHeight(120)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(config.FRAME_INTERVAL_MS)
+        self.timer.timeout.connect(self.refresh)
+
+    def _allocate(self, columns: int):
+        """Préalloue le polygone (deux points par colonne) et sa vue NumPy."""
+        self._polygon = QPolygonF(2 * columns)
+        pointer = self._polygon.data()
+        pointer.setsize(2 * columns * 2 * 8)
+        self._points = np.frombuffer(pointer, dtype=np.float64).reshape(-1, 2)
+        self._points[0::2, 0] = np.arange(columns)
+        self._points[1::2, 0] = np.arange(columns)
+        self._points[:, 1] = self.height() / 2
+        self._last_written = -1
+
+    def resizeEvent(self, event):
+        self._allocate(max(1, self.width()))
+        super().resizeEvent(event)
+
+    def showEvent(self, event):
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def set_theme(self, theme: dict):
+        self.theme = theme
+        self.update()
+
+    def refresh(self):
+        """Lit le tampon et recalcule la trace (rien si aucun nouveau bloc)."""
+        written = self.tap.written
+        if written == self._last_written or len(self._points) == 0:
+            return
+        self._last_written = written
+        self.tap.latest(len(self._buffer), out=self._buffer)
+        start = find_trigger(self._buffer, self.trigger_level, search=self.samples)
+        mins, maxs = minmax_decimate(self._buffer[start:start + self.samples], len(self._points) // 2)
+        middle = self.height() / 2
+        scale = middle * 0.9
+        # Écrêtage de l'affichage à pleine échelle
+        self._points[0::2, 1] = middle - np.clip(maxs, -1.0, 1.0) * scale
+        self._points[1::2, 1] = middle - np.clip(mins, -1.0, 1.0) * scale
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        width, height = self.width(), self.height()
+        painter.fillRect(self.rect(), QColor(self.theme['surface']))
+
+        grid = QColor(self.theme['text_muted'])
+        grid.setAlphaF(config.GRID_ALPHA)
+        painter.setPen(grid)
+        for i in range(1, 10):
+            x = width * i / 10
+            painter.drawLine(QLineF(x, 0, x, height))
+        for i in range(1, 4):
+            y = height * i / 4
+            painter.drawLine(QLineF(0, y, width, y))
+
+        painter.setPen(QPen(QColor(self.theme['accent_light']), 1))
+        painter.drawPolyline(self._polygon)
+        painter.end()
+
+
+def spectrogram_palette() -> list:
+    """Palette 256 couleurs du spectrogramme (noir -> violet -> orange -> jaune)."""
+    anchors = np.array([
+        [0, 0, 4], [40, 11, 84], [140, 41, 129], [222, 73, 104], [254, 159, 109], [252, 253, 191]
+    ])
+    positions = np.linspace(0, 255, len(anchors))
+    levels = np.arange(256)
+    rgb = np.stack([np.interp(levels, positions, anchors[:, c]) for c in range(3)], axis=1)
+    return [qRgb(int(r), int(g), int(b)) for r, g, b in rgb]
+
+
+SPECTROGRAM_PALETTE = spectrogram_palette()
+
+
+class SpectrogramWidget(QWidget):
+    """Spectrogramme défilant : une colonne par trame STFT.
+
+    Les colonnes sont écrites dans un tampon circulaire uint8 préalloué,
+    enveloppé sans copie par une QImage indexée (palette précalculée).
+    En direct, l'audio vient de la copie de sortie du mixeur ; hors ligne,
+    une prise est lue en flux dans un thread et s'affiche au fil du calcul.
+    """
+
+    chunk_ready = pyqtSignal(object, int)  # colonnes uint8, génération
+
+    def __init__(self, rows: int = config.SPECTROGRAM_ROWS,
+                 columns: int = config.SPECTROGRAM_COLUMNS, parent=None):
+        super().__init__(parent)
+        self.ring = SpectrogramRing(rows, columns)
+        self._image = QImage(self.ring.image.data, columns, rows, columns, QImage.Format_Indexed8)
+        self._image.setColorTable(SPECTROGRAM_PALETTE)
+        self.scrolling = True
+        self.n_fft = config.SPECTROGRAM_FFT
+        self.db_floor = config.SPECTROGRAM_DB_FLOOR
+        self._tap = None
+        self._stft = None
+        self._mapper = None
+        self._last_written = 0
+        self._generation = 0
+        self.setMinimumHeight(120)
+
+        self.chunk_ready.connect(self._on_chunk)
+        self.timer = QTimer(self)
+        self.timer.setInterval(config.FRAME_INTERVAL_MS)
+        self.timer.timeout.connect(self._poll_tap)
+
+    # ------------------------------------------------------------------
+    # Direct (sortie du mixeur)
+    # ------------------------------------------------------------------
+
+    def attach_tap(self, tap: RingBuffer, sample_rate: int, hop: int = 512):
+        """Affiche en direct la sortie copiée dans `tap`."""
+        self._tap = tap
+        self._stft = StreamingSTFT(self.n_fft, hop)
+        self._mapper = LogSpectrumMapper(self.n_fft, sample_rate, config.SPECTRUM_MIN_FREQ,
+                                         sample_rate / 2, self.ring.rows, self.db_floor)
+        self._last_written = tap.written
+        self.scrolling = True
+        if self.isVisible():
+            self.timer.start()
+
+    def showEvent(self, event):
+        if self._tap is not None and self.scrolling:
+            # Ignore l'audio joué pendant que la vue était cachée
+            self._last_written = self._tap.written
+            self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def _poll_tap(self):
+        written = self._tap.written
+        new = min(written - self._last_written, self._tap.capacity)
+        self._last_written = written
+        if new <= 0:
+            return
+        magnitudes = self._stft.process(self._tap.latest(new))
+        if len(magnitudes):
+            self.ring.push(quantize_db(self._mapper(magnitudes, self._stft.full_scale), self.db_floor))
+            self.update()
+
+    # ------------------------------------------------------------------
+    # Hors ligne (prise enregistrée)
+    # ------------------------------------------------------------------
+
+    def load_file(self, path: str):
+        """Calcule le spectrogramme complet d'une prise, progressivement."""
+        self.timer.stop()
+        self.scrolling = False
+        self._generation += 1
+        generation = self._generation
+        self.ring.clear()
+        self.update()
+
+        def _render():
+            try:
+                for chunk in spectrogram_columns(path, self.ring.rows, self.ring.columns,
+                                                 self.n_fft, config.SPECTRUM_MIN_FREQ, self.db_floor):
+                    if generation != self._generation:
+                        return  # Une autre prise a été sélectionnée
+                    self.chunk_ready.emit(chunk, generation)
+            except Exception as e:
+                print(f"Erreur spectrogramme {path}: {e}")
+
+        threading.Thread(target=_render, daemon=True).start()
+
+    def _on_chunk(self, chunk: np.ndarray, generation: int):
+        if generation == self._generation:
+            self.ring.push(chunk)
+            self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        width, height = self.width(), self.height()
+        columns = self.ring.columns
+        if self.scrolling:
+            # Colonne la plus ancienne à gauche : deux tranches de l'image
+            split = columns - self.ring.position
+            x = width * split / columns
+            painter.drawImage(QRectF(0, 0, x, height), self._image,
+                              QRectF(self.ring.position, 0, split, self.ring.rows))
+            painter.drawImage(QRectF(x, 0, width - x, height), self._image,
+                              QRectF(0, 0, self.ring.position, self.ring.rows))
+        else:
+            painter.drawImage(QRectF(0, 0, width, height), self._image)
+        painter.end()
+
+
+class ExportSignals(QObject):
+    """Relaie la progression des exports vers le thread de l'interface."""
+
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(list)
 
 
 # ============================================================================
 # LECTEUR D'ENREGISTREMENTS
 # ============================================================================
 
+def draw_waveform(painter: QPainter, pyramid: PeakPyramid, start: int, end: int,
+                  width: int, height: int, color: str):
+    """Dessine min/max (trait plein) et RMS (trait clair) depuis la pyramide."""
+    mins, maxs, rms = pyramid.query(start, end, width)
+    mid = height / 2
+    painter.setPen(QColor(color))
+    painter.drawLines([QLineF(x, mid - maxs[x] * mid, x, mid - mins[x] * mid) for x in range(width)])
+    painter.setPen(QColor("#818cf8"))
+    painter.drawLines([QLineF(x, mid - rms[x] * mid, x, mid + rms[x] * mid) for x in range(width)])
+
+
+def waveform_icon(pyramid: PeakPyramid, width: int = 96, height: int = 24) -> QIcon:
+    """Vignette de forme d'onde pour la liste des enregistrements."""
+    pixmap = QPixmap(width, height)
+    pixmap.fill(Qt.transparent)
+    painter = QPainter(pixmap)
+    draw_waveform(painter, pyramid, 0, pyramid.frames, width, height, "#6366f1")
+    painter.end()
+    return QIcon(pixmap)
+
+
+class WaveformWidget(QWidget):
+    """Scrubber zoomable dessiné depuis la pyramide, sans lire l'audio."""
+
+    seek_requested = pyqtSignal(float)  # secondes
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pyramid = None
+        self.view_start = 0
+        self.view_end = 0
+        self.position = 0
+        self.setMinimumHeight(80)
+        self.setCursor(Qt.PointingHandCursor)
+
+    def set_pyramid(self, pyramid: Optional[PeakPyramid]):
+        """Affiche une nouvelle pyramide (vue complète)."""
+        self.pyramid = pyramid
+        self.view_start = 0
+        self.view_end = pyramid.frames if pyramid else 0
+        self.position = 0
+        self.update()
+
+    def set_position(self, seconds: float):
+        """Déplace la tête de lecture."""
+        if self.pyramid is not None:
+            self.position = int(seconds * self.pyramid.sample_rate)
+            self.update()
+
+    def _frame_at(self, x: float) -> int:
+        span = self.view_end - self.view_start
+        return int(self.view_start + x / max(1, self.width()) * span)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor("#1a1f2e"))
+        if self.pyramid is None or self.view_end <= self.view_start:
+            painter.end()
+            return
+        width, height = self.width(), self.height()
+        draw_waveform(painter, self.pyramid, self.view_start, self.view_end, width, height, "#6366f1")
+        if self.view_start <= self.position <= self.view_end:
+            x = (self.position - self.view_start) / (self.view_end - self.view_start) * width
+            painter.setPen(QColor("#10b981"))
+            painter.drawLine(QLineF(x, 0, x, height))
+        painter.end()
+
+    def wheelEvent(self, event):
+        """Zoom autour du curseur."""
+        if self.pyramid is None:
+            return
+        anchor = self._frame_at(event.pos().x())
+        factor = 0.8 if event.angleDelta().y() > 0 else 1.25
+        span = (self.view_end - self.view_start) * factor
+        span = max(self.width(), min(span, self.pyramid.frames))
+        ratio = (anchor - self.view_start) / max(1, self.view_end - self.view_start)
+        start = int(anchor - ratio * span)
+        start = max(0, min(start, self.pyramid.frames - int(span)))
+        self.view_start, self.view_end = start, start + int(span)
+        self.update()
+
+    def mousePressEvent(self, event):
+        """Demande un déplacement de la lecture."""
+        if self.pyramid is not None:
+            self.seek_requested.emit(self._frame_at(event.pos().x()) / self.pyramid.sample_rate)
+
+
 class RecordingPlayerWidget(QWidget):
     """Widget pour lire les enregistrements sauvegardés."""
     
+    scan_finished = pyqtSignal(object)
+    loudness_measured = pyqtSignal(int, object)  # id, {loudness, true_peak}
+    
     def __init__(self, user_id: int, db: Database, parent=None):
         super().__init__(parent)
         self.user_id = user_id
         self.db = db
-        self.current_playback = None
+        self._stream = None
+        self.playback_gain = 1.0
         self.is_playing = False
         self.recordings_list = []
+        self.recordings_by_id = {}
+        self.page = 0
+        self.has_next_page = False
+        self.selected_recording = None
+        self.waveforms = {}
         self.current_recording_data = None
         self.current_position = 0
-        self.sample_rate = 44100
-        self.playback_start_time = None
-        self.playback_start_pos = 0
+        self.sample_rate = audio_core.sample_rate
         
         self.init_ui()
         self.load_recordings()
+        self.scan_finished.connect(self.on_scan_finished)
+        self.loudness_measured.connect(self.on_loudness_measured)
+        self._measuring = set()
+        self.run_integrity_scan()
         
     def init_ui(self):
         """Construit l'interface du lecteur."""
@@ -372,11 +925,48 @@ class RecordingPlayerWidget(QWidget):
         title.setFont(QFont("Segoe UI", 11, QFont.Bold))
         layout.addWidget(title)
         
+        # Recherche (nom, étiquettes, notes), lancée une fois la frappe terminée
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Rechercher (tag:nom pour une etiquette)")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(config.SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.apply_search)
+        self.search_edit.textChanged.connect(lambda _: self.search_timer.start())
+        layout.addWidget(self.search_edit)
+        
         # Liste des enregistrements
         self.recordings_widget = QListWidget()
+        self.recordings_widget.setSelectionMode(QListWidget.ExtendedSelection)
+        self.recordings_widget.setIconSize(QSize(96, 24))
         self.recordings_widget.itemClicked.connect(self.on_recording_selected)
         layout.addWidget(self.recordings_widget)
         
+        # Pagination
+        pages_layout = QHBoxLayout()
+        self.prev_page_btn = QPushButton("Precedent")
+        self.prev_page_btn.clicked.connect(lambda: self.change_page(-1))
+        pages_layout.addWidget(self.prev_page_btn)
+        self.page_label = QLabel()
+        self.page_label.setAlignment(Qt.AlignCenter)
+        pages_layout.addWidget(self.page_label, 1)
+        self.next_page_btn = QPushButton("Suivant")
+        self.next_page_btn.clicked.connect(lambda: self.change_page(1))
+        pages_layout.addWidget(self.next_page_btn)
+        layout.addLayout(pages_layout)
+        
+        # Forme d'onde zoomable (molette) servant de scrubber
+        self.waveform = WaveformWidget()
+        self.waveform.seek_requested.connect(
+            lambda seconds: self.seek_position(int(seconds * self.sample_rate))
+        )
+        layout.addWidget(self.waveform)
+        
+        # Spectrogramme de la prise, calculé en flux
+        self.spectrogram = SpectrogramWidget()
+        layout.addWidget(self.spectrogram)
+        
         # Contrôles de lecture
         controls_layout = QHBoxLayout()
         
@@ -390,12 +980,28 @@ class RecordingPlayerWidget(QWidget):
         self.stop_btn.setMinimumHeight(35)
         controls_layout.addWidget(self.stop_btn)
         
+        rename_btn = QPushButton("Renommer")
+        rename_btn.clicked.connect(self.rename_selected)
+        rename_btn.setMinimumHeight(35)
+        controls_layout.addWidget(rename_btn)
+        
+        tags_btn = QPushButton("Etiquettes")
+        tags_btn.clicked.connect(self.edit_details)
+        tags_btn.setMinimumHeight(35)
+        controls_layout.addWidget(tags_btn)
+        
         delete_btn = QPushButton("Supprimer")
         delete_btn.setObjectName("danger")
         delete_btn.clicked.connect(self.delete_selected)
         delete_btn.setMinimumHeight(35)
         controls_layout.addWidget(delete_btn)
         
+        self.normalize_check = QCheckBox("Normaliser")
+        self.normalize_check.setToolTip(f"Lecture a {config.LOUDNESS_TARGET:.0f} LUFS")
+        self.normalize_check.setChecked(config.PLAYBACK_NORMALIZE)
+        self.normalize_check.toggled.connect(self.on_normalize_toggled)
+        controls_layout.addWidget(self.normalize_check)
+        
         layout.addLayout(controls_layout)
         
         # Barre de progression
@@ -414,182 +1020,503 @@ class RecordingPlayerWidget(QWidget):
         self.progress_timer.timeout.connect(self.update_progress)
         
     def load_recordings(self):
-        """Charge la liste des enregistrements depuis la DB."""
+        """Charge la page courante des enregistrements (filtrés par la recherche)."""
         self.recordings_widget.clear()
-        self.recordings_list = self.db.get_recordings(self.user_id)
+        page_size = config.SEARCH_PAGE_SIZE
+        rows, self.has_next_page = self.db.search_recordings(
+            self.user_id, self.search_edit.text(), page_size, self.page * page_size
+        )
+        if not rows and self.page > 0:
+            # Page vidée (suppressions) : revenir à la précédente
+            self.page -= 1
+            return self.load_recordings()
+        self.recordings_list = [dict(rec) for rec in rows]
+        self.recordings_by_id = {rec['id']: rec for rec in self.recordings_list}
+        self.waveforms = {
+            rec_id: PeakPyramid.from_bytes(blob)
+            for rec_id, blob in self.db.get_waveforms(self.user_id, self.recordings_by_id).items()
+        }
+        self.prev_page_btn.setEnabled(self.page > 0)
+        self.next_page_btn.setEnabled(self.has_next_page)
+        self.page_label.setText(f"Page {self.page + 1}")
         
         for rec in self.recordings_list:
-            # Afficher le nom personnalisé si disponible, sinon le filename
-            try:
-                rec_name = rec['name'] if rec['name'] else rec['filename'].split('/')[-1]
-            except (KeyError, TypeError):
-                rec_name = rec['filename'].split('/')[-1]
-            
-            # Ajouter l'extension .wav au nom
-            if not rec_name.endswith('.wav'):
-                rec_name += '.wav'
-            
-            duration = rec['duration']
-            item_text = f"{rec_name} ({duration:.1f}s)"
-            item = QListWidgetItem(item_text)
+            item = QListWidgetItem(self.item_text(rec))
             # Stocker l'ID du recording pour une récupération fiable
             item.setData(Qt.UserRole, rec['id'])
+            if rec['id'] in self.waveforms:
+                item.setIcon(waveform_icon(self.waveforms[rec['id']]))
             self.recordings_widget.addItem(item)
     
+    @staticmethod
+    def item_text(rec: dict) -> str:
+        """Libellé d'un enregistrement dans la liste."""
+        # Afficher le nom personnalisé si disponible, sinon le filename
+        try:
+            rec_name = rec['name'] if rec['name'] else rec['filename'].split('/')[-1]
+        except (KeyError, TypeError):
+            rec_name = rec['filename'].split('/')[-1]
+        
+        # Ajouter l'extension du fichier au nom
+        extension = Path(rec['filename']).suffix
+        if not rec_name.endswith(extension):
+            rec_name += extension
+        
+        item_text = f"{rec_name} ({rec['duration']:.1f}s)"
+        if rec.get('tags'):
+            item_text += f" [{rec['tags']}]"
+        if rec['missing']:
+            item_text += " — introuvable"
+        return item_text
+    
+    def get_waveform(self, rec_id: int, path: str) -> Optional[PeakPyramid]:
+        """Pyramide d'un enregistrement, calculée une fois pour les anciennes prises."""
+        pyramid = self.waveforms.get(rec_id)
+        if pyramid is None and os.path.exists(path):
+            pyramid = PeakPyramid.from_file(path)
+            if pyramid is not None:
+                self.db.save_waveform(rec_id, pyramid.to_bytes())
+                self.waveforms[rec_id] = pyramid
+        return pyramid
+    
+    def apply_search(self):
+        """Relance la recherche depuis la première page."""
+        self.page = 0
+        self.load_recordings()
+    
+    def change_page(self, delta: int):
+        if delta > 0 and not self.has_next_page:
+            return
+        self.page = max(0, self.page + delta)
+        self.load_recordings()
+    
     def on_recording_selected(self, item):
-        """Sélectionne un enregistrement."""
+        """Sélectionne un enregistrement (métadonnées en cache, sans décodage)."""
         try:
-            # Récupérer l'ID du recording stocké dans l'item
-            rec_id = item.data(Qt.UserRole)
-            rec_filename = None
-            
-            # Chercher le recording par ID (plus fiable que par filename)
-            for rec in self.recordings_list:
-                if rec['id'] == rec_id:
-                    rec_filename = rec['filename']
-                    break
-            
-            if rec_filename:
-                # Vérifier si le fichier existe
-                if os.path.exists(rec_filename):
-                    self.current_recording_data, self.sample_rate = sf.read(rec_filename)
-                    self.progress_slider.setMaximum(len(self.current_recording_data))
-                    self.current_position = 0
-                    self.info_label.setText(f"Charge: {item.text()}")
-                else:
-                    # Essayer avec le chemin absolu
-                    abs_path = os.path.abspath(rec_filename)
-                    if os.path.exists(abs_path):
-                        self.current_recording_data, self.sample_rate = sf.read(abs_path)
-                        self.progress_slider.setMaximum(len(self.current_recording_data))
-                        self.current_position = 0
-                        self.info_label.setText(f"Charge: {item.text()}")
-                    else:
-                        self.info_label.setText(f"Fichier introuvable: {rec_filename}")
-            else:
+            rec = self.recordings_by_id.get(item.data(Qt.UserRole))
+            if rec is None:
                 self.info_label.setText("Enregistrement non trouvé dans la base")
+                return
+            if rec['missing']:
+                self.info_label.setText(f"Fichier introuvable: {rec['filename']}")
+                return
+            if rec['frames'] is None:
+                # Ancienne prise jamais sondée : remplir le cache une fois
+                metadata = probe_file(rec['filename'])
+                if metadata is None:
+                    self.info_label.setText(f"Fichier illisible: {rec['filename']}")
+                    return
+                self.db.update_recordings_metadata([(rec['id'], metadata)])
+                rec.update(metadata)
+            
+            # L'audio n'est décodé qu'au lancement de la lecture
+            self.stop_playback()
+            self.selected_recording = rec
+            self.current_recording_data = None
+            self.sample_rate = audio_core.sample_rate
+            frames = int(rec['frames'] * self.sample_rate / rec['sample_rate'])
+            self.progress_slider.setMaximum(frames)
+            self.current_position = 0
+            self.waveform.set_pyramid(self.get_waveform(rec['id'], rec['filename']))
+            self.spectrogram.load_file(rec['filename'])
+            self.info_label.setText(
+                f"Charge: {item.text()} — {rec['sample_rate']} Hz, {rec['codec']}"
+            )
         except Exception as e:
             self.info_label.setText(f"Erreur: {str(e)}")
     
+    def run_integrity_scan(self):
+        """Réconcilie la base et le dossier des prises en arrière-plan."""
+        def _scan():
+            try:
+                self.scan_finished.emit(scan_library(self.db))
+            except Exception as e:
+                print(f"Erreur scan bibliothèque: {e}")
+        
+        threading.Thread(target=_scan, daemon=True).start()
+    
+    def on_scan_finished(self, report):
+        """Affiche le bilan du scan et rafraîchit la liste si nécessaire."""
+        if report.clean:
+            return
+        self.load_recordings()
+        self.info_label.setText(
+            f"Bibliotheque: {len(report.missing)} manquant(s), "
+            f"{len(report.orphans)} orphelin(s), {len(report.refreshed)} mis a jour, "
+            f"{len(report.measured)} mesure(s)"
+        )
+    
     def play_selected(self):
-        """Démarre la lecture."""
-        if self.current_recording_data is None:
+        """Démarre la lecture (gain de normalisation appliqué dans le callback)."""
+        if self.selected_recording is None:
             self.info_label.setText("Selectionnez un enregistrement d'abord")
             return
         
         try:
-            if self.is_playing:
-                sd.stop()
-            
-            self.is_playing = True
-            self.play_btn.setStyleSheet("background-color: #ef4444;")
-            self.progress_timer.start(50)
+            if self.current_recording_data is None:
+                self.current_recording_data = audio_core.load_recording(
+                    self.selected_recording['filename']
+                )
+                if self.current_recording_data is None:
+                    self.info_label.setText("Impossible de lire le fichier")
+                    return
             
-            # Enregistrer le temps et la position de départ
-            import time
-            self.playback_start_time = time.time()
-            self.playback_start_pos = 0
+            self.close_stream()
+            self.playback_gain = self.normalization_gain(self.selected_recording)
+            self.current_position = 0
             self.progress_slider.setValue(0)
             
-            # Lecture non-bloquante
-            self.current_playback = sd.play(
-                self.current_recording_data,
-                self.sample_rate
+            data = self.current_recording_data
+            self._stream = sd.OutputStream(
+                samplerate=self.sample_rate,
+                channels=1 if data.ndim == 1 else data.shape[1],
+                dtype='float32',
+                callback=self._playback_callback,
             )
-            self.info_label.setText("Lecture en cours...")
+            self._stream.start()
+            self.is_playing = True
+            self.play_btn.setStyleSheet("background-color: #ef4444;")
+            self.progress_timer.start(50)
+            self.info_label.setText(f"Lecture en cours... (gain {20 * np.log10(self.playback_gain):+.1f} dB)")
         except Exception as e:
+            self._stream = None
             self.info_label.setText(f"Erreur lecture: {str(e)}")
     
+    def normalization_gain(self, rec: dict) -> float:
+        """Gain de lecture ramenant la prise à la sonie visée (1.0 si désactivé).
+        
+        Une prise jamais mesurée (normalement rattrapée par le scan de la
+        bibliothèque) est lue à gain unité pendant qu'un thread la mesure ;
+        la normalisation s'applique dès la lecture suivante.
+        """
+        if not self.normalize_check.isChecked():
+            return 1.0
+        if rec.get('loudness') is None:
+            self.measure_loudness(rec)
+            return 1.0
+        return normalization_gain(rec['loudness'], rec['true_peak'],
+                                  config.LOUDNESS_TARGET, config.TRUE_PEAK_CEILING)
+    
+    def measure_loudness(self, rec: dict):
+        """Mesure la sonie d'une prise en arrière-plan et la stocke en base."""
+        if rec['id'] in self._measuring:
+            return
+        self._measuring.add(rec['id'])
+        recording_id, filename = rec['id'], rec['filename']
+        
+        def _measure():
+            loudness = LoudnessMeter.measure_file(filename)
+            if loudness is not None:
+                self.db.update_recordings_metadata([(recording_id, loudness)])
+            self.loudness_measured.emit(recording_id, loudness)
+        
+        threading.Thread(target=_measure, daemon=True).start()
+    
+    def on_loudness_measured(self, recording_id: int, loudness):
+        """Reporte une mesure de sonie sur la prise en mémoire."""
+        self._measuring.discard(recording_id)
+        if loudness is None:
+            return
+        rec = self.recordings_by_id.get(recording_id)
+        if rec is not None:
+            rec.update(loudness)
+        if self.selected_recording is not None and self.selected_recording['id'] == recording_id:
+            self.selected_recording.update(loudness)
+    
+    def on_normalize_toggled(self, checked: bool):
+        """Applique ou retire la normalisation pendant la lecture."""
+        if self.selected_recording is not None and self.current_recording_data is not None:
+            self.playback_gain = self.normalization_gain(self.selected_recording)
+    
+    def _playback_callback(self, outdata, frames, time_info, status):
+        """Callback du flux de lecture : copie la suite de la prise, au gain courant."""
+        data = self.current_recording_data
+        position = self.current_position
+        chunk = data[position:position + frames]
+        if chunk.ndim == 1:
+            chunk = chunk[:, None]
+        np.multiply(chunk, np.float32(self.playback_gain), out=outdata[:len(chunk)])
+        outdata[len(chunk):] = 0
+        self.current_position = position + len(chunk)
+        if len(chunk) < frames:
+            raise sd.CallbackStop()
+    
+    def close_stream(self):
+        """Ferme le flux de lecture s'il est ouvert."""
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            try:
+                stream.stop()
+                stream.close()
+            except Exception as e:
+                print(f"Erreur fermeture lecture: {e}")
+    
     def stop_playback(self):
         """Arrête la lecture."""
         try:
             if self.is_playing:
-                sd.stop()
+                self.close_stream()
                 self.is_playing = False
                 self.progress_timer.stop()
                 self.play_btn.setStyleSheet("")
                 self.current_position = 0
                 self.progress_slider.setValue(0)
-                self.playback_start_time = None
                 self.info_label.setText("Lecture arretee")
         except Exception as e:
             self.info_label.setText(f"Erreur: {str(e)}")
     
     def update_progress(self):
-        """Met à jour la barre de progression."""
+        """Met à jour la barre de progression (position tenue par le callback)."""
         if self.is_playing and self.current_recording_data is not None:
             try:
-                import time
-                # Calculer la position en fonction du temps écoulé
-                if self.playback_start_time is not None:
-                    elapsed_time = time.time() - self.playback_start_time
-                    current_frame = int(elapsed_time * self.sample_rate)
-                    total_frames = len(self.current_recording_data)
-                    
-                    # Vérifier si la lecture est terminée
-                    if current_frame >= total_frames:
-                        self.stop_playback()
-                    else:
-                        self.progress_slider.blockSignals(True)
-                        self.progress_slider.setValue(current_frame)
-                        self.progress_slider.blockSignals(False)
+                current_frame = self.current_position
+                # Vérifier si la lecture est terminée
+                if current_frame >= len(self.current_recording_data) or not self._stream.active:
+                    self.stop_playback()
+                else:
+                    self.progress_slider.blockSignals(True)
+                    self.progress_slider.setValue(current_frame)
+                    self.progress_slider.blockSignals(False)
+                    self.waveform.set_position(current_frame / self.sample_rate)
             except Exception as e:
                 print(f"Erreur update_progress: {e}")
     
     def seek_position(self, position: int):
-        """Change la position de lecture."""
-        if self.is_playing and self.current_recording_data is not None:
-            self.current_position = position
+        """Change la position de lecture (reprise par le callback au bloc suivant)."""
+        if self.selected_recording is None:
+            return
+        position = max(0, min(position, self.progress_slider.maximum() - 1))
+        self.current_position = position
+        self.progress_slider.blockSignals(True)
+        self.progress_slider.setValue(position)
+        self.progress_slider.blockSignals(False)
+        self.waveform.set_position(position / self.sample_rate)
     
     def delete_selected(self):
-        """Supprime l'enregistrement sélectionné."""
-        item = self.recordings_widget.currentItem()
-        if not item:
+        """Supprime les enregistrements sélectionnés (une transaction, une confirmation)."""
+        items = self.recordings_widget.selectedItems()
+        if not items:
             self.info_label.setText("Selectionnez un enregistrement")
             return
         
-        # Récupérer l'ID depuis les données stockées
-        rec_id = item.data(Qt.UserRole)
-        if rec_id is None:
-            self.info_label.setText("Erreur: ID enregistrement non trouvé")
+        recs = [self.recordings_by_id[item.data(Qt.UserRole)]
+                for item in items if item.data(Qt.UserRole) in self.recordings_by_id]
+        if not recs:
+            self.info_label.setText("Enregistrement non trouvé")
             return
         
+        question = ("Supprimer cet enregistrement?" if len(recs) == 1
+                    else f"Supprimer ces {len(recs)} enregistrements?")
         reply = QMessageBox.question(
             self,
             "Confirmation",
-            "Supprimer cet enregistrement?",
+            question,
             QMessageBox.Yes | QMessageBox.No
         )
+        if reply != QMessageBox.Yes:
+            return
         
-        if reply == QMessageBox.Yes:
+        try:
+            ids = {rec['id'] for rec in recs}
+            if not self.db.delete_recordings(ids):
+                self.info_label.setText("Erreur suppression")
+                return
+            
+            # Mise à jour incrémentale de la liste (sans rechargement complet)
+            for row in sorted((self.recordings_widget.row(item) for item in items), reverse=True):
+                self.recordings_widget.takeItem(row)
+            self.recordings_list = [rec for rec in self.recordings_list if rec['id'] not in ids]
+            for rec_id in ids:
+                self.recordings_by_id.pop(rec_id, None)
+                self.waveforms.pop(rec_id, None)
+            if self.selected_recording is not None and self.selected_recording['id'] in ids:
+                self.stop_playback()
+                self.current_recording_data = None
+                self.selected_recording = None
+                self.waveform.set_pyramid(None)
+            
+            # Suppression des fichiers physiques hors du thread de l'interface
+            filenames = [rec['filename'] for rec in recs]
+            threading.Thread(target=self._remove_files, args=(filenames,), daemon=True).start()
+            self.info_label.setText(f"{len(recs)} enregistrement(s) supprime(s)")
+        except Exception as e:
+            self.info_label.setText(f"Erreur suppression: {str(e)}")
+    
+    @staticmethod
+    def _remove_files(filenames: list):
+        """Supprime des fichiers d'enregistrement (thread de fond)."""
+        for filename in filenames:
             try:
-                # Trouver et supprimer le fichier + DB
-                rec = None
-                for r in self.recordings_list:
-                    if r['id'] == rec_id:
-                        rec = r
-                        break
-                
-                if rec:
-                    # Supprimer le fichier physique
-                    if os.path.exists(rec['filename']):
-                        os.remove(rec['filename'])
-                    
-                    # Supprimer la base de données
-                    self.db.delete_recording(rec['id'])
-                    
-                    self.load_recordings()
-                    self.info_label.setText("Enregistrement supprime")
-                    self.current_recording_data = None
-                else:
-                    self.info_label.setText("Enregistrement non trouvé")
-            except Exception as e:
-                self.info_label.setText(f"Erreur suppression: {str(e)}")
+                if os.path.exists(filename):
+                    os.remove(filename)
+            except OSError as e:
+                print(f"Erreur suppression fichier {filename}: {e}")
+    
+    def rename_selected(self):
+        """Renomme les enregistrements sélectionnés (numérotés si plusieurs)."""
+        from PyQt5.QtWidgets import QInputDialog
+        
+        items = self.recordings_widget.selectedItems()
+        if not items:
+            self.info_label.setText("Selectionnez un enregistrement")
+            return
+        
+        name, ok = QInputDialog.getText(self, "Renommer", "Nouveau nom:")
+        name = name.strip()
+        if not ok or not name:
+            return
+        
+        renames = []
+        for index, item in enumerate(items, start=1):
+            rec_id = item.data(Qt.UserRole)
+            renames.append((rec_id, name if len(items) == 1 else f"{name} {index}"))
+        
+        if not self.db.rename_recordings(renames):
+            self.info_label.setText("Erreur renommage")
+            return
+        
+        for item, (rec_id, new_name) in zip(items, renames):
+            rec = self.recordings_by_id.get(rec_id)
+            if rec is not None:
+                rec['name'] = new_name
+                item.setText(self.item_text(rec))
+        self.info_label.setText(f"{len(renames)} enregistrement(s) renomme(s)")
+    
+    def edit_details(self):
+        """Modifie les étiquettes et les notes de l'enregistrement sélectionné."""
+        from PyQt5.QtWidgets import QInputDialog
+        
+        items = self.recordings_widget.selectedItems()
+        if not items:
+            self.info_label.setText("Selectionnez un enregistrement")
+            return
+        rec = self.recordings_by_id.get(items[0].data(Qt.UserRole))
+        if rec is None:
+            return
+        
+        tags, ok = QInputDialog.getText(
+            self, "Etiquettes", "Etiquettes (separees par des virgules):", text=rec.get('tags') or ""
+        )
+        if not ok:
+            return
+        notes, ok = QInputDialog.getMultiLineText(self, "Notes", "Notes:", rec.get('notes') or "")
+        if not ok:
+            return
+        
+        tags = split_tags(tags)
+        if not self.db.set_recording_details(rec['id'], tags, notes):
+            self.info_label.setText("Erreur etiquettes")
+            return
+        rec['tags'] = ", ".join(dict.fromkeys(tags))
+        rec['notes'] = notes
+        items[0].setText(self.item_text(rec))
+        self.info_label.setText("Etiquettes enregistrees")
 
 # ============================================================================
 # FENÊTRES
 # ============================================================================
 
+class LooperWidget(QWidget):
+    """Onglet du looper : longueur de boucle, couches, overdub et mixage."""
+
+    mixdown_requested = pyqtSignal()
+
+    def __init__(self, looper: Looper, loop_origin, parent=None):
+        super().__init__(parent)
+        self.looper = looper
+        # Fonction (mesures) -> (frames, frame d'origine), calée sur le métronome
+        self.loop_origin = loop_origin
+        layout = QVBoxLayout(self)
+        
+        header = QHBoxLayout()
+        bars_label = QLabel("Mesures:")
+        bars_label.setFont(QFont("Segoe UI", 10, QFont.Bold))
+        self.bars_spinbox = QSpinBox()
+        self.bars_spinbox.setRange(1, 16)
+        self.bars_spinbox.setValue(config.LOOPER_BARS)
+        set_btn = QPushButton("Nouvelle boucle")
+        set_btn.clicked.connect(self.reset_loop)
+        self.record_btn = QPushButton("Enregistrer une couche")
+        self.record_btn.clicked.connect(lambda: self.record())
+        mixdown_btn = QPushButton("Mixer")
+        mixdown_btn.setObjectName("secondary")
+        mixdown_btn.clicked.connect(self.mixdown_requested.emit)
+        for widget in (bars_label, self.bars_spinbox, set_btn, self.record_btn, mixdown_btn):
+            header.addWidget(widget)
+        layout.addLayout(header)
+        
+        # Une ligne préconstruite par couche : rien n'est créé pendant le jeu
+        grid = QGridLayout()
+        self.rows = []
+        for i in range(looper.max_layers):
+            label = QLabel(f"Couche {i + 1}")
+            mute = QCheckBox("Muet")
+            mute.stateChanged.connect(lambda state, i=i: self.looper.set_muted(i, state == Qt.Checked))
+            gain = QSlider(Qt.Horizontal)
+            gain.setRange(0, 100)
+            gain.setValue(100)
+            gain.valueChanged.connect(lambda value, i=i: self.looper.set_gain(i, value / 100.0))
+            overdub = QPushButton("Overdub")
+            overdub.clicked.connect(lambda _, i=i: self.record(i))
+            clear = QPushButton("Effacer")
+            clear.setObjectName("danger")
+            clear.clicked.connect(lambda _, i=i: self.clear(i))
+            for column, widget in enumerate((label, mute, gain, overdub, clear)):
+                grid.addWidget(widget, i, column)
+            self.rows.append((label, mute, gain, overdub, clear))
+        scroll_content = QWidget()
+        scroll_content.setLayout(grid)
+        scroll = QScrollArea()
+        scroll.setWidgetResizable(True)
+        scroll.setWidget(scroll_content)
+        layout.addWidget(scroll, 1)
+        
+        self.status_label = QLabel()
+        self.status_label.setStyleSheet("color: #94a3b8; font-size: 9pt;")
+        layout.addWidget(self.status_label)
+        
+        # L'enregistrement s'arrête seul après un tour (thread audio)
+        self.status_timer = QTimer(self)
+        self.status_timer.setInterval(200)
+        self.status_timer.timeout.connect(self.refresh)
+        self.refresh()
+
+    def reset_loop(self):
+        """Recrée la boucle (couches effacées) sur la prochaine mesure."""
+        frames, origin = self.loop_origin(self.bars_spinbox.value())
+        self.looper.set_length(frames, origin)
+        self.refresh()
+
+    def record(self, layer: Optional[int] = None):
+        if self.looper.record(layer) is None:
+            QMessageBox.warning(self, "Erreur", "Toutes les couches sont utilisees")
+            return
+        audio_core.mixer.start()
+        self.status_timer.start()
+        self.refresh()
+
+    def clear(self, layer: int):
+        self.looper.clear(layer)
+        self.refresh()
+
+    def refresh(self):
+        """Met à jour l'état des couches (utilisée, en enregistrement)."""
+        recording = self.looper.recording_layer
+        for i, (label, mute, gain, overdub, clear) in enumerate(self.rows):
+            used = bool(self.looper.used[i])
+            label.setText(f"Couche {i + 1}" + (" (REC)" if i == recording else ""))
+            for widget in (mute, gain, overdub, clear):
+                widget.setEnabled(used)
+        stats = self.looper.stats()
+        self.status_label.setText(
+            f"{stats['loop_frames'] / self.looper.sample_rate:.2f} s, "
+            f"{stats['layers']}/{self.looper.max_layers} couches, "
+            f"{stats['memory_bytes'] / 1e6:.1f} Mo"
+        )
+        if recording is None:
+            self.status_timer.stop()
+
+
 class LoginWindow(QWidget):
     """Fenêtre de connexion moderne."""
 
@@ -697,6 +1624,11 @@ class LoginWindow(QWidget):
 class MainWindow(QWidget):
     """Fenêtre principale du balafon - Interface React-like."""
 
+    # Note jouée depuis un contrôleur (lame, vélocité, horodatage ns)
+    external_note = pyqtSignal(int, int, object)
+    jam_note = pyqtSignal(int, int, int, str)
+    jam_disconnected = pyqtSignal()
+
     def __init__(self, db: Database, user_id: int, username: str):
         super().__init__()
         self.db = db
@@ -705,9 +1637,47 @@ class MainWindow(QWidget):
         self.theme = "dark"  # String pour le thème actuel
         
         self.recording = False
-        self.record_buffer = np.zeros((0,))
-        self.balafon_notes = audio_core.build_balafon_scale("pentatonic")
-        self.key_buttons = []
+        self.performance = PerformanceRecorder()
+        self.scale_style = "pentatonic"
+        self.balafon_notes = audio_core.build_balafon_scale(self.scale_style)
+        audio_core.negotiate_device()
+        audio_core.load_bank([n.frequency for n in self.balafon_notes])
+        
+        # Entrée clavier : table pré-calculée code Qt -> indice de lame
+        self.key_map = {getattr(Qt, f"Key_{char}"): idx for char, idx in config.KEYBOARD_MAP.items()}
+        # Mises à jour visuelles regroupées sur le prochain rafraîchissement
+        self._pending_keys = []
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.setInterval(config.FRAME_INTERVAL_MS)
+        self.frame_timer.timeout.connect(self.flush_key_visuals)
+        
+        # Contrôleurs MIDI : le thread d'entrée déclenche le son lui-même,
+        # l'interface ne reçoit que la note pour l'affichage et la prise
+        self.external_note.connect(self.on_external_note)
+        self.inputs = InputEngine(audio_core, self.balafon_notes, on_note=self.external_note.emit)
+        if config.MIDI_INPUT_ENABLED:
+            for port in range(len(RtMidiBackend.list_ports())):
+                try:
+                    self.inputs.add_source(RtMidiBackend(port))
+                except Exception as e:
+                    print(f"Erreur ouverture port MIDI {port}: {e}")
+        self.inputs.start()
+        
+        # Séquenceur (métronome) : clics placés à la frame près par le mixeur
+        self.sequencer = Sequencer(audio_core, config.METRONOME_BPM,
+                                   config.SEQUENCER_LOOKAHEAD, config.SEQUENCER_INTERVAL)
+        self._metronome_id = None
+        
+        # Session à plusieurs : les notes des autres sont rendues localement
+        self.jam: Optional[JamClient] = None
+        self.jam_note.connect(self.on_jam_note)
+        self.jam_disconnected.connect(self.on_jam_disconnected)
+        
+        # Looper : couches préallouées, sommées par le mixeur
+        frames, origin = self.loop_origin(config.LOOPER_BARS)
+        self.looper = Looper(audio_core.sample_rate, frames, config.LOOPER_MAX_LAYERS, origin)
+        audio_core.mixer.looper = self.looper
         
         self.setWindowTitle(f"Symphony — Balafon ({username})")
         self.setGeometry(50, 50, 1400, 900)
@@ -771,6 +1741,10 @@ class MainWindow(QWidget):
         save_btn.clicked.connect(self.save_recording)
         layout.addWidget(save_btn)
 
+        import_btn = QPushButton("Importer MIDI")
+        import_btn.clicked.connect(self.import_midi_file)
+        layout.addWidget(import_btn)
+
         logout_btn = QPushButton("Deconnexion")
         logout_btn.setObjectName("secondary")
         logout_btn.clicked.connect(self.close)
@@ -790,28 +1764,15 @@ class MainWindow(QWidget):
         title.setFont(QFont("Segoe UI", 13, QFont.Bold))
         card_layout.addWidget(title)
 
-        # Grille des lames
-        keys_grid = QGridLayout()
-        keys_grid.setSpacing(2)
-
-        self.key_buttons = []
-        for i, note in enumerate(self.balafon_notes):
-            # Varier la largeur selon la position
-            distance = abs(i - 11)
-            key_width = max(30, 50 - distance)
-            
-            btn = ModernKey(note, key_width)
-            btn.key_pressed.connect(self.on_key_pressed)
-            self.key_buttons.append(btn)
-
-            row = i // 11
-            col = i % 11
-            keys_grid.addWidget(btn, row, col)
+        # Clavier des lames (un seul widget dessiné)
+        self.keyboard = BalafonKeyboard(self.balafon_notes, COLORS[self.theme])
+        self.keyboard.key_pressed.connect(self.trigger_key)
 
         scroll = QScrollArea()
         scroll.setWidgetResizable(True)
         scroll_widget = QWidget()
-        scroll_widget.setLayout(keys_grid)
+        keys_layout = QHBoxLayout(scroll_widget)
+        keys_layout.addWidget(self.keyboard, 0, Qt.AlignCenter)
         scroll.setWidget(scroll_widget)
 
         card_layout.addWidget(scroll)
@@ -832,10 +1793,28 @@ class MainWindow(QWidget):
         spec_label.setFont(QFont("Segoe UI", 12, QFont.Bold))
         spec_layout.addWidget(spec_label)
 
-        self.spectrum = SpectrumWidget()
+        self.spectrum = create_spectrum_widget(COLORS[self.theme])
         spec_layout.addWidget(self.spectrum)
 
         layout.addWidget(spec_card, 1)
+
+        # Oscilloscope et spectrogramme (sortie du mixeur)
+        scope_card = QFrame()
+        scope_card.setObjectName("card")
+        scope_layout = QVBoxLayout(scope_card)
+
+        # Un seul tampon partagé, assez long pour quelques images manquées
+        tap = audio_core.mixer.enable_tap(max(4 * config.OSCILLOSCOPE_SAMPLES, audio_core.sample_rate // 2))
+        self.oscilloscope = OscilloscopeWidget(tap, COLORS[self.theme])
+        self.live_spectrogram = SpectrogramWidget()
+        self.live_spectrogram.attach_tap(tap, audio_core.sample_rate)
+
+        scope_tabs = QTabWidget()
+        scope_tabs.addTab(self.oscilloscope, "Oscilloscope")
+        scope_tabs.addTab(self.live_spectrogram, "Spectrogramme")
+        scope_layout.addWidget(scope_tabs)
+
+        layout.addWidget(scope_card, 1)
         
         # Paramètres
         settings_card = QFrame()
@@ -849,7 +1828,7 @@ class MainWindow(QWidget):
         # Onglets de paramètres
         tabs = QTabWidget()
         
-        # Onglet Duree (sans volume)
+        # Onglet Son (durée et volume)
         duration_widget = QWidget()
         duration_layout = QVBoxLayout()
         
@@ -858,8 +1837,13 @@ class MainWindow(QWidget):
         self.duration_spinbox = QDoubleSpinBox()
         self.duration_spinbox.setMinimum(0.1)
         self.duration_spinbox.setMaximum(2.0)
-        self.duration_spinbox.setValue(0.45)
+        self.duration_spinbox.setValue(audio_core.duration)
         self.duration_spinbox.setSingleStep(0.1)
+        self.duration_spinbox.valueChanged.connect(self.set_duration)
+        self.duration_timer = QTimer(self)
+        self.duration_timer.setSingleShot(True)
+        self.duration_timer.setInterval(config.DURATION_DEBOUNCE_MS)
+        self.duration_timer.timeout.connect(self.prewarm_duration_bank)
         self.duration_spinbox.setMinimumHeight(40)
         self.duration_spinbox.setStyleSheet("""
             QDoubleSpinBox {
@@ -876,9 +1860,98 @@ class MainWindow(QWidget):
         duration_info.setStyleSheet("color: #94a3b8; font-size: 10pt;")
         duration_layout.addWidget(duration_info)
         
+        duration_layout.addSpacing(20)
+        
+        volume_label = QLabel("Volume:")
+        volume_label.setFont(QFont("Segoe UI", 10, QFont.Bold))
+        self.volume_slider = QSlider(Qt.Horizontal)
+        self.volume_slider.setRange(0, 100)
+        self.volume_slider.setValue(int(audio_core.volume * 100))
+        self.volume_slider.valueChanged.connect(self.set_volume)
+        duration_layout.addWidget(volume_label)
+        duration_layout.addWidget(self.volume_slider)
+        
+        duration_layout.addSpacing(20)
+        
+        reverb_label = QLabel("Reverberation:")
+        reverb_label.setFont(QFont("Segoe UI", 10, QFont.Bold))
+        self.reverb_combo = QComboBox()
+        self.reverb_combo.addItem("Salle (synthetique)", None)
+        if os.path.isdir(config.IMPULSE_RESPONSES_DIR):
+            for entry in sorted(os.scandir(config.IMPULSE_RESPONSES_DIR), key=lambda e: e.name):
+                if entry.is_file() and entry.name.lower().endswith((".wav", ".flac", ".ogg")):
+                    self.reverb_combo.addItem(Path(entry.name).stem, entry.path)
+        self.reverb_combo.currentIndexChanged.connect(lambda _: self.set_reverb())
+        self.reverb_slider = QSlider(Qt.Horizontal)
+        self.reverb_slider.setRange(0, 100)
+        self.reverb_slider.setValue(int(config.REVERB_WET * 100))
+        self.reverb_slider.valueChanged.connect(lambda _: self.set_reverb())
+        duration_layout.addWidget(reverb_label)
+        duration_layout.addWidget(self.reverb_combo)
+        duration_layout.addWidget(self.reverb_slider)
+        
         duration_layout.addStretch()
         duration_widget.setLayout(duration_layout)
-        tabs.addTab(duration_widget, "Duree")
+        tabs.addTab(duration_widget, "Son")
+        
+        # Onglet Métronome
+        metronome_widget = QWidget()
+        metronome_layout = QVBoxLayout()
+        
+        self.metronome_check = QCheckBox("Metronome actif")
+        self.metronome_check.setFont(QFont("Segoe UI", 10))
+        self.metronome_check.stateChanged.connect(self.toggle_metronome)
+        metronome_layout.addWidget(self.metronome_check)
+        
+        metronome_layout.addSpacing(15)
+        
+        bpm_label = QLabel("Tempo (BPM):")
+        bpm_label.setFont(QFont("Segoe UI", 10, QFont.Bold))
+        self.bpm_spinbox = QSpinBox()
+        self.bpm_spinbox.setRange(40, 240)
+        self.bpm_spinbox.setValue(config.METRONOME_BPM)
+        self.bpm_spinbox.valueChanged.connect(self.set_tempo)
+        metronome_layout.addWidget(bpm_label)
+        metronome_layout.addWidget(self.bpm_spinbox)
+        
+        beats_label = QLabel("Temps par mesure:")
+        beats_label.setFont(QFont("Segoe UI", 10, QFont.Bold))
+        self.beats_spinbox = QSpinBox()
+        self.beats_spinbox.setRange(1, 12)
+        self.beats_spinbox.setValue(config.METRONOME_BEATS_PER_BAR)
+        self.beats_spinbox.valueChanged.connect(lambda _: self.restart_metronome())
+        metronome_layout.addWidget(beats_label)
+        metronome_layout.addWidget(self.beats_spinbox)
+        
+        metronome_layout.addStretch()
+        metronome_widget.setLayout(metronome_layout)
+        tabs.addTab(metronome_widget, "Metronome")
+        
+        # Onglet Session
+        jam_widget = QWidget()
+        jam_layout = QVBoxLayout()
+        
+        host_label = QLabel("Serveur de session:")
+        host_label.setFont(QFont("Segoe UI", 10, QFont.Bold))
+        self.jam_host_input = QLineEdit("127.0.0.1")
+        self.jam_port_spinbox = QSpinBox()
+        self.jam_port_spinbox.setRange(1, 65535)
+        self.jam_port_spinbox.setValue(config.JAM_PORT)
+        self.jam_button = QPushButton("Rejoindre")
+        self.jam_button.clicked.connect(self.toggle_jam)
+        self.jam_status = QLabel("Hors session")
+        self.jam_status.setStyleSheet("color: #94a3b8; font-size: 9pt;")
+        for widget in (host_label, self.jam_host_input, self.jam_port_spinbox, self.jam_button, self.jam_status):
+            jam_layout.addWidget(widget)
+        
+        jam_layout.addStretch()
+        jam_widget.setLayout(jam_layout)
+        tabs.addTab(jam_widget, "Session")
+        
+        # Onglet Boucle
+        self.looper_panel = LooperWidget(self.looper, self.loop_origin)
+        self.looper_panel.mixdown_requested.connect(self.save_loop_mixdown)
+        tabs.addTab(self.looper_panel, "Boucle")
         
         # Onglet Apparence
         appearance_widget = QWidget()
@@ -929,24 +2002,66 @@ class MainWindow(QWidget):
             "Majeure": "major",
             "Chromatique": "chromatic",
         }
-        self.balafon_notes = audio_core.build_balafon_scale(style_map[text])
-        
-        # Mettre à jour les boutons
-        for btn, note in zip(self.key_buttons, self.balafon_notes):
-            btn.note = note
+        self.scale_style = style_map[text]
+        self.balafon_notes = audio_core.build_balafon_scale(self.scale_style)
+        audio_core.load_bank([n.frequency for n in self.balafon_notes])
+        
+        self.keyboard.set_notes(self.balafon_notes)
+        self.inputs.set_notes(self.balafon_notes)
+
+    def trigger_key(self, idx: int):
+        """Joue une lame : le son part immédiatement, l'affichage suit.
+
+        Le déclenchement est déposé dans la file sans verrou du mixeur avant
+        tout travail graphique ; surbrillance et spectre sont appliqués au
+        prochain rafraîchissement, une seule fois pour toutes les frappes
+        reçues entre-temps.
+        """
+        if not 0 <= idx < len(self.balafon_notes):
+            return
+        audio_core.play_async(self.balafon_notes[idx].frequency)
+        self._note_played(idx)
 
-    def on_key_pressed(self, frequency: float):
-        """Gère la pression d'une touche."""
-        sample = audio_core.get_cached_sample(frequency)
-        self.spectrum.update_spectrum(frequency)
+    def on_external_note(self, idx: int, velocity: int, timestamp_ns: int):
+        """Note d'un contrôleur, déjà jouée par le thread d'entrée."""
+        self._note_played(idx, velocity, timestamp_ns)
 
+    def _note_played(self, idx: int, velocity: int = AudioCore.MAX_VELOCITY,
+                     timestamp_ns: Optional[int] = None):
+        """Capture la note dans la prise et planifie son affichage."""
         if self.recording:
-            self.record_buffer = np.concatenate((self.record_buffer, sample))
+            # La prise est capturée comme une séquence d'événements horodatés
+            self.performance.add(idx, self.scale_style, velocity=velocity,
+                                 duration=audio_core.duration, timestamp_ns=timestamp_ns)
+
+        if self.jam is not None:
+            self.jam.send_note_threadsafe(idx, velocity, self.scale_style)
+
+        self._pending_keys.append(idx)
+        if not self.frame_timer.isActive():
+            self.frame_timer.start()
+
+    def on_jam_note(self, sender: int, idx: int, velocity: int, scale: str):
+        """Note d'un autre musicien, déjà jouée par le client de session."""
+        if scale == self.scale_style:
+            self._pending_keys.append(idx)
+            if not self.frame_timer.isActive():
+                self.frame_timer.start()
+
+    def flush_key_visuals(self):
+        """Applique les mises à jour visuelles en attente."""
+        keys, self._pending_keys = self._pending_keys, []
+        if not keys:
+            return
+        for idx in set(keys):
+            self.keyboard.activate(idx)
+        # Seule la dernière note jouée est affichée dans le spectre
+        self.spectrum.update_spectrum(self.balafon_notes[keys[-1]].frequency)
 
     def start_record(self):
         """Démarre l'enregistrement."""
         self.recording = True
-        self.record_buffer = np.zeros((0,))
+        self.performance = PerformanceRecorder()
         self.record_btn.setStyleSheet("background-color: #ef4444;")
 
     def stop_record(self):
@@ -954,7 +2069,7 @@ class MainWindow(QWidget):
         self.recording = False
         self.record_btn.setStyleSheet("")
         
-        if self.record_buffer.size == 0:
+        if len(self.performance) == 0:
             QMessageBox.warning(self, "Erreur", "Rien à enregistrer")
             return
         
@@ -998,27 +2113,49 @@ class MainWindow(QWidget):
         result = dialog.exec_()
         return input_field.text(), result == QDialog.Accepted
 
-    def save_recording_with_name(self, name: str):
+    @staticmethod
+    def analyze_blocks(blocks) -> tuple:
+        """Pyramide de crêtes (vignettes) et sonie d'une prise, en une seule passe."""
+        pyramid = PeakPyramid(sample_rate=audio_core.sample_rate)
+        meter = LoudnessMeter(audio_core.sample_rate)
+        for block in blocks:
+            pyramid.add_block(block)
+            meter.add_block(block)
+        return pyramid.finish(), meter.finish()
+
+    def save_recording_with_name(self, name: str, events: Optional[np.ndarray] = None):
         """Sauvegarde l'enregistrement avec un nom personnalisé."""
-        if self.record_buffer.size == 0:
+        if events is None:
+            events = self.performance.events()
+        if len(events) == 0:
             QMessageBox.warning(self, "Erreur", "Rien à enregistrer")
             return
+        # Rendu hors ligne des événements, à leurs instants exacts
+        record_buffer = render_events(events, audio_core)
 
-        os.makedirs("recordings", exist_ok=True)
+        os.makedirs(config.RECORDINGS_DIR, exist_ok=True)
         timestamp = int(__import__('time').time())
-        filename = f"rec_{self.user_id}_{timestamp}.wav"
-        filepath = os.path.join("recordings", filename)
+        filepath = recording_path(self.user_id, timestamp)
 
-        if audio_core.save_recording(self.record_buffer, filepath):
+        if audio_core.save_recording(record_buffer, filepath):
             # Calculer la durée
-            duration = len(self.record_buffer) / 44100.0
+            duration = len(record_buffer) / float(audio_core.sample_rate)
+            # Pyramide de crêtes et sonie calculées en une passe
+            block = 65536
+            pyramid, loudness = self.analyze_blocks(
+                record_buffer[i:i + block] for i in range(0, len(record_buffer), block)
+            )
             # Sauvegarder dans la DB avec le nom personnalisé
-            self.db.save_recording(self.user_id, filepath, duration, name)
+            rec_id = self.db.save_recording(
+                self.user_id, filepath, duration, name, metadata={**(probe_file(filepath) or {}), **loudness}
+            )
+            self.db.save_waveform(rec_id, pyramid.to_bytes())
+            self.db.save_performance(rec_id, pack_events(events), len(events), audio_core.ENGINE_VERSION)
             # Recharger la liste des enregistrements
             if hasattr(self, 'recordings_player'):
                 self.recordings_player.load_recordings()
             QMessageBox.information(self, "Succès", f"Enregistrement '{name}' sauvegardé!")
-            self.record_buffer = np.zeros((0,))
+            self.performance = PerformanceRecorder()
         else:
             QMessageBox.warning(self, "Erreur", "Impossible de sauvegarder")
 
@@ -1028,7 +2165,8 @@ class MainWindow(QWidget):
             QMessageBox.warning(self, "Erreur", "Lecteur non disponible")
             return
         
-        recordings = self.recordings_player.recordings_list
+        # Tous les enregistrements, pas seulement la page affichée
+        recordings = [dict(rec) for rec in self.db.get_recordings(self.user_id)]
         if not recordings:
             QMessageBox.warning(self, "Erreur", "Aucun enregistrement disponible")
             return
@@ -1041,21 +2179,23 @@ class MainWindow(QWidget):
         
         layout = QVBoxLayout(dialog)
         
-        label = QLabel("Sélectionner l'enregistrement à exporter:")
+        label = QLabel("Sélectionner les enregistrements à exporter:")
         label.setFont(QFont("Segoe UI", 10, QFont.Bold))
         layout.addWidget(label)
         
-        # Liste de sélection
+        # Liste de sélection (multiple)
         list_widget = QListWidget()
+        list_widget.setSelectionMode(QListWidget.ExtendedSelection)
         for rec in recordings:
             try:
                 rec_name = rec['name'] if rec['name'] else rec['filename'].split('/')[-1]
             except (KeyError, TypeError):
                 rec_name = rec['filename'].split('/')[-1]
             
-            # Ajouter l'extension .wav si absent
-            if not rec_name.endswith('.wav'):
-                rec_name += '.wav'
+            # Ajouter l'extension du fichier si absente
+            extension = Path(rec['filename']).suffix
+            if not rec_name.endswith(extension):
+                rec_name += extension
             
             item_text = f"{rec_name} ({rec['duration']:.1f}s)"
             item = QListWidgetItem(item_text)
@@ -1063,24 +2203,29 @@ class MainWindow(QWidget):
             list_widget.addItem(item)
         layout.addWidget(list_widget)
         
+        # Format de sortie
+        format_layout = QHBoxLayout()
+        format_layout.addWidget(QLabel("Format :"))
+        format_combo = QComboBox()
+        format_combo.addItems([fmt.upper() for fmt in EXPORT_FORMATS] + ["MIDI"])
+        format_layout.addWidget(format_combo)
+        layout.addLayout(format_layout)
+        
         # Boutons
         btn_layout = QHBoxLayout()
         export_btn = QPushButton("Exporter")
         cancel_btn = QPushButton("Annuler")
         
         def on_export():
-            selected = list_widget.currentItem()
-            if not selected:
+            selected_ids = {item.data(Qt.UserRole) for item in list_widget.selectedItems()}
+            if not selected_ids:
                 QMessageBox.warning(dialog, "Erreur", "Sélectionnez un enregistrement")
                 return
             
-            # Récupérer l'enregistrement
-            rec_id = selected.data(Qt.UserRole)
-            for rec in recordings:
-                if rec['id'] == rec_id:
-                    self.export_to_file(rec)
-                    dialog.accept()
-                    break
+            selected = [rec for rec in recordings if rec['id'] in selected_ids]
+            fmt = format_combo.currentText().lower()
+            dialog.accept()
+            self.export_recordings(selected, fmt)
         
         export_btn.clicked.connect(on_export)
         cancel_btn.clicked.connect(dialog.reject)
@@ -1091,46 +2236,234 @@ class MainWindow(QWidget):
         
         dialog.exec_()
 
-    def export_to_file(self, recording: dict):
-        """Exporte un enregistrement sélectionné sur le disque local."""
+    def export_recordings(self, recordings: list, fmt: str):
+        """Transcode les enregistrements sélectionnés en arrière-plan."""
+        from PyQt5.QtWidgets import QFileDialog, QProgressDialog
+        
+        if fmt == "midi":
+            self.export_midi(recordings)
+            return
+        
+        if len(recordings) == 1:
+            # Un seul fichier : choisir son nom
+            rec = recordings[0]
+            default_name = f"{safe_file_stem(rec['name'] or Path(rec['filename']).stem)}.{fmt}"
+            filepath = QFileDialog.getSaveFileName(
+                self,
+                "Sauvegarder l'enregistrement",
+                os.path.join(os.path.expanduser("~"), default_name),
+                f"Fichiers {fmt.upper()} (*.{fmt});;Tous les fichiers (*.*)"
+            )[0]
+            if not filepath:
+                return
+            jobs = [ExportJob(rec['filename'], filepath, fmt, rec.get('frames'))]
+        else:
+            # Plusieurs fichiers : choisir un dossier
+            directory = QFileDialog.getExistingDirectory(
+                self, "Dossier d'export", os.path.expanduser("~")
+            )
+            if not directory:
+                return
+            jobs = [
+                ExportJob(
+                    rec['filename'],
+                    os.path.join(directory, f"{safe_file_stem(rec['name'] or Path(rec['filename']).stem)}_{rec['id']}.{fmt}"),
+                    fmt,
+                    rec.get('frames')
+                )
+                for rec in recordings
+            ]
+        
+        progress_dialog = QProgressDialog("Export en cours...", None, 0, 1000, self)
+        progress_dialog.setWindowTitle("Export")
+        progress_dialog.setMinimumDuration(0)
+        progress_dialog.setValue(0)
+        
+        # Les callbacks arrivent des threads du pool : passer par des signaux Qt
+        signals = ExportSignals(self)
+        signals.progress.connect(
+            lambda done, total: progress_dialog.setValue(int(1000 * done / total) if total else 0)
+        )
+        signals.finished.connect(lambda results: self._on_export_finished(results, progress_dialog))
+        
+        if not hasattr(self, 'export_pool'):
+            self.export_pool = ExportPool()
+        self.export_pool.submit(jobs, signals.progress.emit, signals.finished.emit)
+
+    def export_midi(self, recordings: list):
+        """Exporte les performances (événements) des enregistrements en MIDI."""
         from PyQt5.QtWidgets import QFileDialog
         
-        # Ouvrir le sélecteur de fichier
-        filepath = QFileDialog.getSaveFileName(
-            self,
-            "Sauvegarder l'enregistrement",
-            os.path.expanduser("~"),
-            "Fichiers WAV (*.wav);;Tous les fichiers (*.*)"
-        )[0]
+        directory = QFileDialog.getExistingDirectory(self, "Dossier d'export MIDI", os.path.expanduser("~"))
+        if not directory:
+            return
+        
+        exported, skipped = [], []
+        for rec in recordings:
+            blob = self.db.get_performance(rec['id'])
+            if blob is None:
+                skipped.append(rec['name'] or rec['filename'])
+                continue
+            path = os.path.join(directory, f"{safe_file_stem(rec['name'] or Path(rec['filename']).stem)}_{rec['id']}.mid")
+            if write_midi(unpack_events(blob), path, audio_core):
+                exported.append(path)
+        
+        message = f"{len(exported)} fichier(s) MIDI exporté(s)"
+        if skipped:
+            message += "\nSans événements (prises audio seules):\n" + "\n".join(skipped)
+        QMessageBox.information(self, "Export MIDI", message)
+
+    def import_midi_file(self):
+        """Importe un fichier MIDI, le rend sur l'échelle courante et l'enregistre."""
+        from PyQt5.QtWidgets import QFileDialog
         
-        if not filepath:
+        path = QFileDialog.getOpenFileName(
+            self, "Importer un fichier MIDI", os.path.expanduser("~"),
+            "Fichiers MIDI (*.mid *.midi);;Tous les fichiers (*.*)"
+        )[0]
+        if not path:
             return
         
         try:
-            import shutil
-            # Copier le fichier d'enregistrement vers la destination
-            shutil.copy2(recording['filename'], filepath)
-            QMessageBox.information(self, "Succès", f"Enregistrement exporté:\n{filepath}")
+            events = import_midi(path, audio_core, self.scale_style)
         except Exception as e:
-            QMessageBox.warning(self, "Erreur", f"Erreur lors de l'export:\n{str(e)}")
+            QMessageBox.warning(self, "Erreur", f"Fichier MIDI illisible:\n{str(e)}")
+            return
+        if len(events) == 0:
+            QMessageBox.warning(self, "Erreur", "Aucune note dans ce fichier")
+            return
+        
+        self.save_recording_with_name(Path(path).stem, events)
+
+    def _on_export_finished(self, results: list, progress_dialog):
+        """Affiche le bilan de l'export."""
+        progress_dialog.setValue(progress_dialog.maximum())
+        progress_dialog.close()
+        failed = [job.src for job, ok in results if not ok]
+        if failed:
+            QMessageBox.warning(self, "Erreur", "Échec de l'export:\n" + "\n".join(failed))
+        else:
+            exported = "\n".join(job.dst for job, _ in results)
+            QMessageBox.information(self, "Succès", f"Enregistrement(s) exporté(s):\n{exported}")
     
     def set_volume(self, value: int):
-        """Ajuste le volume (0-100)."""
-        # La valeur sera utilisée lors du prochain rendu audio
-        pass
+        """Ajuste le volume (0-100), appliqué en temps réel par le mixeur."""
+        audio_core.set_volume(value / 100.0)
+    
+    def set_reverb(self):
+        """Applique la réverbération choisie (réponse impulsionnelle et dosage)."""
+        try:
+            audio_core.set_reverb(self.reverb_slider.value() / 100.0, self.reverb_combo.currentData())
+        except Exception as e:
+            QMessageBox.warning(self, "Erreur", f"Reponse impulsionnelle illisible:\n{str(e)}")
+    
+    def toggle_metronome(self, state: int):
+        """Démarre ou arrête les clics du métronome."""
+        if self._metronome_id is not None:
+            self.sequencer.remove_source(self._metronome_id)
+            self._metronome_id = None
+        if state == Qt.Checked:
+            self._metronome_id = self.sequencer.metronome(self.beats_spinbox.value(), config.METRONOME_GAIN)
+            self.sequencer.start()
+    
+    def restart_metronome(self):
+        """Reprend le métronome (changement de mesure) s'il est actif."""
+        if self._metronome_id is not None:
+            self.toggle_metronome(Qt.Checked)
+    
+    def set_tempo(self, bpm: int):
+        """Change le tempo, sans décalage des temps déjà planifiés."""
+        self.sequencer.set_tempo(bpm)
+    
+    def toggle_jam(self):
+        """Rejoint ou quitte la session réseau."""
+        if self.jam is not None:
+            self.jam.stop()
+            self.jam = None
+            self.jam_button.setText("Rejoindre")
+            self.jam_status.setText("Hors session")
+            return
+        client = JamClient(audio_core, on_note=self.jam_note.emit, on_disconnect=self.jam_disconnected.emit)
+        try:
+            client.start(self.jam_host_input.text().strip(), self.jam_port_spinbox.value())
+        except Exception as e:
+            QMessageBox.warning(self, "Erreur", f"Connexion impossible:\n{str(e)}")
+            return
+        self.jam = client
+        self.jam_button.setText("Quitter")
+        stats = client.stats()
+        self.jam_status.setText(
+            f"Musicien {stats['client_id']}, aller-retour {stats['rtt_us'] / 1000:.1f} ms"
+        )
+    
+    def on_jam_disconnected(self):
+        """Le serveur a fermé la session : revenir hors session."""
+        if self.jam is None:
+            return
+        self.jam.stop()
+        self.jam = None
+        self.jam_button.setText("Rejoindre")
+        self.jam_status.setText("Session interrompue par le serveur")
+    
+    def loop_origin(self, bars: int) -> tuple:
+        """Longueur (frames) d'une boucle de `bars` mesures et début de la prochaine mesure."""
+        tempo = self.sequencer.tempo
+        beats_per_bar = self.beats_spinbox.value() if hasattr(self, 'beats_spinbox') else config.METRONOME_BEATS_PER_BAR
+        frames = int(round(bars * beats_per_bar * tempo.frames_per_beat(tempo.bpm)))
+        next_bar = np.ceil(tempo.beat_at(self.sequencer.start_frame()) / beats_per_bar) * beats_per_bar
+        return frames, tempo.frame_at(next_bar)
+    
+    def save_loop_mixdown(self):
+        """Mixe la boucle dans une nouvelle prise (écriture en flux)."""
+        if not self.looper.used.any():
+            QMessageBox.warning(self, "Erreur", "Aucune couche a mixer")
+            return
+        if self.looper.writing:
+            QMessageBox.warning(self, "Erreur", "Enregistrement de la boucle en cours")
+            return
+        os.makedirs(config.RECORDINGS_DIR, exist_ok=True)
+        fmt = config.RECORDING_FORMAT
+        filepath = recording_path(self.user_id, int(time.time()), fmt)
+        cycles = config.LOOPER_MIXDOWN_CYCLES
+        # Vignette et sonie calculées sur les blocs mêmes écrits dans le fichier
+        pyramid = PeakPyramid(sample_rate=audio_core.sample_rate)
+        meter = LoudnessMeter(audio_core.sample_rate)
+        
+        def analyze(block):
+            pyramid.add_block(block)
+            meter.add_block(block)
+        
+        if not self.looper.mixdown(filepath, cycles, fmt, on_block=analyze, mixer=audio_core.mixer):
+            QMessageBox.warning(self, "Erreur", "Impossible de sauvegarder")
+            return
+        duration = cycles * self.looper.loop_frames / float(audio_core.sample_rate)
+        rec_id = self.db.save_recording(self.user_id, filepath, duration, "Boucle",
+                                        metadata={**(probe_file(filepath) or {}), **meter.finish()})
+        self.db.save_waveform(rec_id, pyramid.finish().to_bytes())
+        if hasattr(self, 'recordings_player'):
+            self.recordings_player.load_recordings()
+        QMessageBox.information(self, "Succès", "Boucle mixée et sauvegardée!")
+    
+    def set_duration(self, value: float):
+        """Ajuste la durée des notes ; la banque est préchargée une fois la saisie terminée."""
+        audio_core.set_duration(value)
+        self.duration_timer.start()
+    
+    def prewarm_duration_bank(self):
+        audio_core.prewarm_bank([n.frequency for n in self.balafon_notes])
     
     def switch_theme(self, theme_name: str):
         """Bascule entre les thèmes sombre et clair."""
         self.theme = "dark" if theme_name == "Sombre" else "light"
         self.apply_theme()
         
-        # Mettre à jour les touches du balafon
-        for key in self.key_buttons:
-            key.update_style(key.is_active)
+        # Mettre à jour les lames (un seul repaint)
+        self.keyboard.set_theme(COLORS[self.theme])
         
         # Mettre à jour le spectre
         if hasattr(self, 'spectrum'):
             self.spectrum.set_theme(COLORS[self.theme])
+        self.oscilloscope.set_theme(COLORS[self.theme])
     
     def toggle_fullscreen(self, state: int):
         """Active/désactive le mode plein écran."""
@@ -1139,24 +2472,27 @@ class MainWindow(QWidget):
         else:
             self.showNormal()
 
+    def closeEvent(self, event):
+        """Ferme les entrées MIDI, le séquenceur, la lecture et la session avec la fenêtre."""
+        self.inputs.stop()
+        self.sequencer.stop()
+        if hasattr(self, 'recordings_player'):
+            self.recordings_player.stop_playback()
+        if self.jam is not None:
+            self.jam.stop()
+            self.jam = None
+        super().closeEvent(event)
+
     def keyPressEvent(self, event):
         """Gère les touches clavier."""
         if event.isAutoRepeat():
             return
 
-        key_char = event.text().upper()
-        key_map = {
-            'A': 0, 'Z': 1, 'E': 2, 'R': 3, 'T': 4, 'Y': 5, 'U': 6, 'I': 7, 'O': 8, 'P': 9,
-            'Q': 10, 'S': 11, 'D': 12, 'F': 13, 'G': 14, 'H': 15, 'J': 16, 'K': 17, 'L': 18,
-            'M': 19, 'W': 20, 'X': 21,
-        }
-
-        if key_char in key_map:
-            idx = key_map[key_char]
-            if idx < len(self.key_buttons):
-                self.key_buttons[idx].activate()
-                audio_core.play_async(self.balafon_notes[idx].frequency)
-                self.on_key_pressed(self.balafon_notes[idx].frequency)
+        idx = self.key_map.get(event.key())
+        if idx is not None:
+            self.trigger_key(idx)
+        else:
+            super().keyPressEvent(event)
 
 
 def main():